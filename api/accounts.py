@@ -1,20 +1,32 @@
 """
 Accounts API - Счета и балансы
 """
-from fastapi import APIRouter, Depends, HTTPException, Header, Query, Path
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Path, Request
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, func, tuple_
 from typing import Optional, List
-from datetime import datetime
+from datetime import datetime, timezone
 from pydantic import BaseModel
 from decimal import Decimal
 import uuid
+import base64
+import binascii
+import csv
+import io
+import json
+from urllib.parse import quote
 
 from ..database import get_db
-from ..models import Account, Client, Transaction, BankCapital, Merchant, Card
+from .dependencies import get_read_db
+from ..responses import fast_json
+from ..models import Account, Client, Transaction, Merchant, Card
 from ..services.auth_service import require_any_token, require_client
 from ..services.consent_service import ConsentService
+from ..services.ledger import LedgerService
+from ..services.capital import CapitalService
+from ..services.dimensions import dimension_cache
 from sqlalchemy.orm import selectinload
 
 
@@ -117,7 +129,7 @@ async def get_accounts(
     accounts = result.scalars().all()
     
     # Формируем ответ
-    return {
+    return fast_json({
         "data": {
             "account": [
                 {
@@ -145,7 +157,7 @@ async def get_accounts(
         "meta": {
             "totalPages": 1
         }
-    }
+    })
 
 
 @router.get("/{account_id}", summary="2. Получить детали счета")
@@ -265,7 +277,10 @@ async def get_balances(
                 "message": "Требуется согласие клиента для доступа к балансу"
             })
     
-    return {
+    # Баланс горячего счета включает еще не перенесенные зачисления
+    balance = account.balance + await LedgerService.pending_credits(db, account.id)
+    
+    return fast_json({
         "data": {
             "balance": [
                 {
@@ -273,7 +288,7 @@ async def get_balances(
                     "type": "InterimAvailable",
                     "dateTime": datetime.utcnow().isoformat() + "Z",
                     "amount": {
-                        "amount": str(account.balance),
+                        "amount": str(balance),
                         "currency": account.currency
                     },
                     "creditDebitIndicator": "Credit"
@@ -283,14 +298,14 @@ async def get_balances(
                     "type": "InterimBooked",
                     "dateTime": datetime.utcnow().isoformat() + "Z",
                     "amount": {
-                        "amount": str(account.balance),
+                        "amount": str(balance),
                         "currency": account.currency
                     },
                     "creditDebitIndicator": "Credit"
                 }
             ]
         }
-    }
+    })
 
 
 @router.get("/{account_id}/transactions", summary="4. Получить историю транзакций")
@@ -298,166 +313,366 @@ async def get_transactions(
     account_id: str = Path(..., example="acc-1010", description="ID счета"),
     from_booking_date_time: Optional[str] = Query(None, example="2025-01-01T00:00:00Z"),
     to_booking_date_time: Optional[str] = Query(None, example="2025-12-31T23:59:59Z"),
-    page: int = Query(1, example=1),
+    cursor: Optional[str] = Query(None, description="Курсор страницы из links.next / links.prev"),
+    page: int = Query(1, example=1, description="Номер страницы (устарело, используйте cursor)"),
     limit: int = Query(50, ge=1, le=100, example=50),
+    include_total: bool = Query(False, description="Посчитать totalRecords/totalPages (COUNT по всем транзакциям счета)"),
     x_consent_id: Optional[str] = Header(None, alias="x-consent-id", example="consent-69e75facabba", description="ID согласия (получите через POST /account-consents/request). Обязателен для межбанковых запросов"),
     x_requesting_bank: Optional[str] = Header(None, alias="x-requesting-bank", example="team200", description="ID вашей команды (от организаторов). Укажите для запроса данных из другого банка"),
     token_data: dict = Depends(require_any_token),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Получение списка транзакций по счету
     
-    **Пагинация:**
-    - `page` — номер страницы (по умолчанию: 1)
-    - `limit` — количество транзакций на странице (по умолчанию: 50, макс: 500)
+    **Пагинация (курсорная):**
+    - `limit` — количество транзакций на странице (по умолчанию: 50, макс: 100)
+    - `cursor` — непрозрачный курсор из `links.next` / `links.prev`
+    - `include_total` — вернуть `totalRecords` и `totalPages` (дополнительный COUNT)
+    
+    **Фильтр по дате проводки:**
+    - `from_booking_date_time`, `to_booking_date_time` — ISO 8601 (включительно), например `2025-01-01T00:00:00Z`
+    
+    Транзакции отсортированы от новых к старым. Любая страница стоит столько же,
+    сколько первая. Параметр `page` поддерживается для совместимости, но для
+    глубоких страниц медленный.
     
     **Примеры:**
     - `GET /accounts/acc-1/transactions` — первые 50 транзакций
-    - `GET /accounts/acc-1/transactions?page=2&limit=100` — следующие 100 транзакций
-    - `GET /accounts/acc-1/transactions?limit=200` — первые 200 транзакций
+    - `GET /accounts/acc-1/transactions?limit=100&cursor=...` — следующие 100 транзакций (курсор из `links.next`)
+    - `GET /accounts/acc-1/transactions?include_total=true` — первые 50 транзакций и общее количество
     """
     acc_id = int(account_id.replace("acc-", ""))
     
     # Проверка согласия для межбанковых запросов
-    if x_requesting_bank and token_data.get("type") != "client":
-        # Найти счет чтобы получить client_id
-        temp_result = await db.execute(select(Account).where(Account.id == acc_id))
-        temp_account = temp_result.scalar_one_or_none()
-        if not temp_account:
-            raise HTTPException(404, "Account not found")
-        
-        client_result = await db.execute(select(Client).where(Client.id == temp_account.client_id))
-        client = client_result.scalar_one_or_none()
-        if not client:
-            raise HTTPException(404, "Client not found")
-        
-        # Проверить согласие
-        consent = await ConsentService.check_consent(
-            db=db,
-            client_person_id=client.person_id,
-            requesting_bank=x_requesting_bank,
-            permissions=["ReadTransactionsDetail"],
-            consent_id=x_consent_id
-        )
-        
-        if not consent:
-            raise HTTPException(403, {
-                "error": "CONSENT_REQUIRED",
-                "message": "Требуется согласие клиента для доступа к транзакциям"
-            })
+    await _check_transactions_consent(db, acc_id, token_data, x_requesting_bank, x_consent_id)
     
     # Валидация параметров
     if page < 1:
         page = 1
-    if limit < 1:
-        limit = 50
-    if limit > 500:
-        limit = 500
-    
-    # Offset для пагинации
-    offset = (page - 1) * limit
     
-    query = select(Transaction).where(Transaction.account_id == acc_id)
+    filtered = _transactions_query(acc_id, from_booking_date_time, to_booking_date_time)
+    query = filtered
     
-    # Фильтры по датам (опционально)
-    if from_booking_date_time:
-        # TODO: parse date
-        pass
+    # Порядок страниц: (booking_date, id) по убыванию - индекс idx_transactions_account_booking
+    newest_first = (Transaction.booking_date.desc(), Transaction.id.desc())
+    oldest_first = (Transaction.booking_date.asc(), Transaction.id.asc())
+    position = tuple_(Transaction.booking_date, Transaction.id)
     
-    # Подсчет общего количества
-    from sqlalchemy import func
-    count_query = select(func.count()).select_from(Transaction).where(Transaction.account_id == acc_id)
-    total_result = await db.execute(count_query)
-    total_count = total_result.scalar()
+    direction = "next"
+    if cursor:
+        try:
+            direction, cursor_date, cursor_id = _decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(400, "Invalid cursor")
+        
+        if direction == "next":
+            query = query.where(position < tuple_(cursor_date, cursor_id)).order_by(*newest_first)
+        else:
+            query = query.where(position > tuple_(cursor_date, cursor_id)).order_by(*oldest_first)
+    else:
+        query = query.order_by(*newest_first)
+        if page > 1:
+            # Совместимость со старой постраничной навигацией
+            query = query.offset((page - 1) * limit)
+    
+    # Получение транзакций (+1 - есть ли еще страница); merchant и card - из кэша справочников
+    result = await db.execute(query.limit(limit + 1))
+    transactions = list(result.scalars().all())
+    
+    has_more = len(transactions) > limit
+    transactions = transactions[:limit]
+    if direction == "prev":
+        transactions.reverse()
+    
+    # Есть ли страницы до и после текущей
+    if direction == "next":
+        has_next = has_more
+        has_prev = bool(cursor) or page > 1
+    else:
+        has_next = True
+        has_prev = has_more
     
-    # Получение транзакций с пагинацией + загрузка связанных merchant и card
-    result = await db.execute(
-        query
-        .options(
-            selectinload(Transaction.merchant),
-            selectinload(Transaction.card)
-        )
-        .order_by(Transaction.transaction_date.desc())
-        .limit(limit)
-        .offset(offset)
-    )
-    transactions = result.scalars().all()
+    # Формирование ссылок для пагинации (с теми же фильтрами)
+    base_url = f"/accounts/{account_id}/transactions?limit={limit}"
+    if from_booking_date_time:
+        base_url += f"&from_booking_date_time={quote(from_booking_date_time)}"
+    if to_booking_date_time:
+        base_url += f"&to_booking_date_time={quote(to_booking_date_time)}"
     
-    # Формирование ссылок для пагинации
-    base_url = f"/accounts/{account_id}/transactions"
     links = {
-        "self": f"{base_url}?page={page}&limit={limit}"
+        "self": base_url + (f"&cursor={cursor}" if cursor else (f"&page={page}" if page > 1 else ""))
     }
     
-    # Добавляем ссылку на следующую страницу если есть еще транзакции
-    if offset + limit < total_count:
-        links["next"] = f"{base_url}?page={page + 1}&limit={limit}"
+    if transactions:
+        if has_next:
+            last = transactions[-1]
+            links["next"] = f"{base_url}&cursor={_encode_cursor('next', last)}"
+        if has_prev:
+            first = transactions[0]
+            links["prev"] = f"{base_url}&cursor={_encode_cursor('prev', first)}"
     
-    # Добавляем ссылку на предыдущую страницу если не первая страница
-    if page > 1:
-        links["prev"] = f"{base_url}?page={page - 1}&limit={limit}"
+    meta = {
+        "pageSize": limit
+    }
+    if include_total:
+        count_query = select(func.count()).select_from(filtered.subquery())
+        total_count = (await db.execute(count_query)).scalar()
+        meta["totalRecords"] = total_count
+        meta["totalPages"] = (total_count + limit - 1) // limit
     
-    return {
+    merchants = await dimension_cache.merchants(db, (tx.merchant_id for tx in transactions))
+    cards = await dimension_cache.cards(db, acc_id, (tx.card_id for tx in transactions))
+    
+    return fast_json({
         "data": {
             "transaction": [
-                {
-                    "accountId": f"acc-{acc_id}",
-                    "transactionId": tx.transaction_id,
-                    "amount": {
-                        "amount": str(abs(tx.amount)),
-                        "currency": tx.currency or "RUB"
-                    },
-                    "creditDebitIndicator": "Credit" if tx.direction == "credit" else "Debit",
-                    "status": tx.status or "Booked",
-                    "bookingDateTime": tx.transaction_date.isoformat() + "Z",
-                    "valueDateTime": tx.transaction_date.isoformat() + "Z",
-                    "transactionInformation": tx.description or "",
-                    "bankTransactionCode": {
-                        "code": tx.bank_transaction_code or ("ReceivedCreditTransfer" if tx.direction == "credit" else "IssuedDebitTransfer")
-                    },
-                    
-                    # === НОВЫЕ ПОЛЯ: Мерчант и MCC код ===
-                    "merchant": {
-                        "merchantId": tx.merchant.merchant_id,
-                        "name": tx.merchant.name,
-                        "mccCode": tx.merchant.mcc_code,
-                        "category": tx.merchant.category,
-                        "city": tx.merchant.city,
-                        "country": tx.merchant.country,
-                        "address": tx.merchant.address
-                    } if tx.merchant else None,
-                    
-                    # === География транзакции ===
-                    "transactionLocation": {
-                        "city": tx.transaction_city,
-                        "country": tx.transaction_country
-                    } if tx.transaction_city or tx.transaction_country else None,
-                    
-                    # === Информация о карте ===
-                    "card": {
-                        "cardId": tx.card.card_id,
-                        "cardNumber": "****" + tx.card.card_number[-4:],
-                        "cardType": tx.card.card_type,
-                        "cardName": tx.card.card_name
-                    } if tx.card else None,
-                    
-                    # === Устаревшие поля (для обратной совместимости) ===
-                    "counterparty": tx.counterparty
-                }
+                _serialize_transaction(tx, acc_id, merchants.get(tx.merchant_id), cards.get(tx.card_id))
                 for tx in transactions
             ]
         },
         "links": links,
-        "meta": {
-            "totalPages": (total_count + limit - 1) // limit,
-            "totalRecords": total_count,
-            "currentPage": page,
-            "pageSize": limit
-        }
+        "meta": meta
+    })
+
+
+# Транзакций в одной пачке выгрузки (строк на fetch серверного курсора)
+TRANSACTIONS_EXPORT_CHUNK = 1000
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8"
+}
+
+CSV_COLUMNS = [
+    "transactionId", "bookingDateTime", "valueDateTime", "amount", "currency",
+    "creditDebitIndicator", "status", "transactionInformation", "bankTransactionCode",
+    "merchantName", "mccCode", "cardNumber", "counterparty"
+]
+
+
+@router.get("/{account_id}/transactions/export", summary="Выгрузить всю историю транзакций")
+async def export_transactions(
+    request: Request,
+    account_id: str = Path(..., example="acc-1010", description="ID счета"),
+    format: str = Query("ndjson", description="ndjson или csv"),
+    from_booking_date_time: Optional[str] = Query(None, example="2025-01-01T00:00:00Z"),
+    to_booking_date_time: Optional[str] = Query(None, example="2025-12-31T23:59:59Z"),
+    x_consent_id: Optional[str] = Header(None, alias="x-consent-id", description="ID согласия. Обязателен для межбанковых запросов"),
+    x_requesting_bank: Optional[str] = Header(None, alias="x-requesting-bank", description="ID вашей команды. Укажите для запроса данных из другого банка"),
+    token_data: dict = Depends(require_any_token),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Потоковая выгрузка всей истории транзакций счета
+    
+    Вместо постраничного обхода `/transactions`: согласие проверяется один раз,
+    затем вся (отфильтрованная) история отдается одним потоком от новых к старым.
+    
+    - `format=ndjson` — одна транзакция (как в `/transactions`) на строку
+    - `format=csv` — плоская таблица с заголовком
+    - `from_booking_date_time`, `to_booking_date_time` — как в `/transactions`
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(400, f"Invalid format: {format}. Supported: {', '.join(EXPORT_FORMATS)}")
+    
+    acc_id = int(account_id.replace("acc-", ""))
+    
+    # Согласие - один раз на весь поток
+    await _check_transactions_consent(db, acc_id, token_data, x_requesting_bank, x_consent_id)
+    
+    query = (
+        _transactions_query(acc_id, from_booking_date_time, to_booking_date_time)
+        .order_by(Transaction.booking_date.desc(), Transaction.id.desc())
+    )
+    
+    headers = {}
+    if format == "csv":
+        headers["Content-Disposition"] = f'attachment; filename="{account_id}-transactions.csv"'
+    
+    return StreamingResponse(
+        _stream_transactions(query, acc_id, format, request.state.read_session_factory),
+        media_type=EXPORT_FORMATS[format],
+        headers=headers
+    )
+
+
+async def _stream_transactions(query, acc_id: int, format: str, session_factory):
+    """
+    Строки выгрузки пачками по TRANSACTIONS_EXPORT_CHUNK
+    
+    Серверный курсор (stream_scalars + yield_per): в памяти только текущая пачка.
+    Своя сессия (той же БД, что выбрал get_read_db) - сессия зависимости
+    закрывается до отправки тела ответа. merchant и card - из кэша справочников.
+    """
+    async with session_factory() as session:
+        result = await session.stream_scalars(
+            query.execution_options(yield_per=TRANSACTIONS_EXPORT_CHUNK)
+        )
+        
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if format == "csv":
+            writer.writerow(CSV_COLUMNS)
+        
+        async for chunk in result.partitions():
+            merchants = await dimension_cache.merchants(session, (tx.merchant_id for tx in chunk))
+            cards = await dimension_cache.cards(session, acc_id, (tx.card_id for tx in chunk))
+            
+            for tx in chunk:
+                item = _serialize_transaction(tx, acc_id, merchants.get(tx.merchant_id), cards.get(tx.card_id))
+                if format == "csv":
+                    writer.writerow(_csv_row(item))
+                else:
+                    buffer.write(json.dumps(item, ensure_ascii=False) + "\n")
+            
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        
+        # Заголовок пустой CSV выгрузки
+        if buffer.tell():
+            yield buffer.getvalue()
+
+
+def _csv_row(item: dict) -> list:
+    """Транзакция (как в _serialize_transaction) одной строкой CSV (колонки CSV_COLUMNS)"""
+    return [
+        item["transactionId"],
+        item["bookingDateTime"],
+        item["valueDateTime"],
+        item["amount"]["amount"],
+        item["amount"]["currency"],
+        item["creditDebitIndicator"],
+        item["status"],
+        item["transactionInformation"],
+        item["bankTransactionCode"]["code"],
+        item["merchant"]["name"] if item["merchant"] else "",
+        item["merchant"]["mccCode"] if item["merchant"] else "",
+        item["card"]["cardNumber"] if item["card"] else "",
+        item["counterparty"] or ""
+    ]
+
+
+async def _check_transactions_consent(
+    db: AsyncSession,
+    acc_id: int,
+    token_data: dict,
+    x_requesting_bank: Optional[str],
+    x_consent_id: Optional[str]
+):
+    """Проверка согласия ReadTransactionsDetail для межбанковых запросов (403 если нет)"""
+    if not x_requesting_bank or token_data.get("type") == "client":
+        return
+    
+    # Найти счет чтобы получить client_id
+    temp_result = await db.execute(select(Account).where(Account.id == acc_id))
+    temp_account = temp_result.scalar_one_or_none()
+    if not temp_account:
+        raise HTTPException(404, "Account not found")
+    
+    client_result = await db.execute(select(Client).where(Client.id == temp_account.client_id))
+    client = client_result.scalar_one_or_none()
+    if not client:
+        raise HTTPException(404, "Client not found")
+    
+    # Проверить согласие
+    consent = await ConsentService.check_consent(
+        db=db,
+        client_person_id=client.person_id,
+        requesting_bank=x_requesting_bank,
+        permissions=["ReadTransactionsDetail"],
+        consent_id=x_consent_id
+    )
+    
+    if not consent:
+        raise HTTPException(403, {
+            "error": "CONSENT_REQUIRED",
+            "message": "Требуется согласие клиента для доступа к транзакциям"
+        })
+
+
+def _transactions_query(acc_id: int, from_booking_date_time: Optional[str], to_booking_date_time: Optional[str]):
+    """Транзакции счета с фильтром по дате проводки (границы включительно)"""
+    query = select(Transaction).where(Transaction.account_id == acc_id)
+    
+    if from_booking_date_time:
+        query = query.where(Transaction.booking_date >= _parse_booking_date(from_booking_date_time, "from_booking_date_time"))
+    if to_booking_date_time:
+        query = query.where(Transaction.booking_date <= _parse_booking_date(to_booking_date_time, "to_booking_date_time"))
+    
+    return query
+
+
+def _serialize_transaction(tx: Transaction, acc_id: int, merchant: Optional[dict], card: Optional[dict]) -> dict:
+    """Транзакция в формате ответа API (merchant и card - описания из dimension_cache)"""
+    return {
+        "accountId": f"acc-{acc_id}",
+        "transactionId": tx.transaction_id,
+        "amount": {
+            "amount": str(abs(tx.amount)),
+            "currency": tx.currency or "RUB"
+        },
+        "creditDebitIndicator": "Credit" if tx.direction == "credit" else "Debit",
+        "status": tx.status or "Booked",
+        "bookingDateTime": (tx.booking_date or tx.transaction_date).isoformat() + "Z",
+        "valueDateTime": tx.transaction_date.isoformat() + "Z",
+        "transactionInformation": tx.description or "",
+        "bankTransactionCode": {
+            "code": tx.bank_transaction_code or ("ReceivedCreditTransfer" if tx.direction == "credit" else "IssuedDebitTransfer")
+        },
+        
+        # === НОВЫЕ ПОЛЯ: Мерчант и MCC код ===
+        "merchant": merchant,
+        
+        # === География транзакции ===
+        "transactionLocation": {
+            "city": tx.transaction_city,
+            "country": tx.transaction_country
+        } if tx.transaction_city or tx.transaction_country else None,
+        
+        # === Информация о карте ===
+        "card": card,
+        
+        # === Устаревшие поля (для обратной совместимости) ===
+        "counterparty": tx.counterparty
     }
 
 
+def _parse_booking_date(value: str, param: str) -> datetime:
+    """ISO 8601 дата/время из query-параметра -> naive UTC (как хранится в БД)"""
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise HTTPException(400, f"Invalid {param}: expected ISO 8601, e.g. 2025-01-01T00:00:00Z")
+    
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _encode_cursor(direction: str, tx: Transaction) -> str:
+    """Непрозрачный курсор страницы транзакций: направление + позиция (booking_date, id)"""
+    # booking_date NOT NULL после миграции 1; до нее - та же дата, что в bookingDateTime
+    booking_date = tx.booking_date or tx.transaction_date
+    raw = f"{direction}|{booking_date.isoformat()}|{tx.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str):
+    """Разобрать курсор -> (direction, transaction_date, id); ValueError если курсор испорчен"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        direction, date_str, tx_id = raw.split("|")
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid cursor")
+    
+    if direction not in ("next", "prev"):
+        raise ValueError("Invalid cursor")
+    
+    return direction, datetime.fromisoformat(date_str), int(tx_id)
+
+
 class CreateAccountRequest(BaseModel):
     """Запрос на создание нового счета"""
     account_type: str
@@ -759,8 +974,6 @@ async def close_account_with_balance(
     if client.person_id != target_client_id:
         raise HTTPException(403, "Access denied")
     
-    balance = account.balance
-    
     if request.action == "transfer":
         # Перевести остаток на другой счет
         if not request.destination_account_id:
@@ -775,9 +988,10 @@ async def close_account_with_balance(
         if not dest_account:
             raise HTTPException(404, "Destination account not found")
         
-        # Перевести средства
-        dest_account.balance += balance
-        account.balance = Decimal("0")
+        # Перевести весь остаток (счета заблокированы - остаток не изменится до commit)
+        balances = await LedgerService.lock_accounts(db, [account.id, dest_account.id])
+        balance = balances[account.id] + await LedgerService.pending_credits(db, account.id)
+        await LedgerService.transfer(db, account.id, dest_account.id, balance)
         
         # Создать транзакции
         debit_tx = Transaction(
@@ -802,15 +1016,17 @@ async def close_account_with_balance(
         
     elif request.action == "donate":
         # Подарить банку (увеличить capital)
-        from ..config import config
+        # Списать весь остаток
+        balances = await LedgerService.lock_accounts(db, [account.id])
+        balance = balances[account.id] + await LedgerService.pending_credits(db, account.id)
+        await LedgerService.debit(db, account.id, balance)
         
-        capital_result = await db.execute(
-            select(BankCapital).where(BankCapital.bank_code == config.BANK_CODE)
+        CapitalService.record(
+            db,
+            balance,
+            reason=f"Donation on account closing: {account.account_number}",
+            reference=account.account_number
         )
-        capital = capital_result.scalar_one_or_none()
-        
-        if capital:
-            capital.capital += balance
         
         # Создать транзакцию списания
         donate_tx = Transaction(
@@ -822,8 +1038,6 @@ async def close_account_with_balance(
             description="Дарение средств банку при закрытии счета"
         )
         db.add(donate_tx)
-        
-        account.balance = Decimal("0")
     
     else:
         raise HTTPException(400, f"Invalid action: {request.action}")
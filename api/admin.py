@@ -2,52 +2,65 @@
 Admin API - для просмотра капитала и транзакций
 Iteration 3
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel
 from decimal import Decimal
-from datetime import datetime
-
-from database import get_db
-from models import BankCapital, InterbankTransfer, Payment, Account, BankSettings, KeyRateHistory, Team, ConsentRequest, Client, Consent
+from datetime import datetime, timedelta
+
+from database import get_db, pool_stats, replica_monitor
+from api.dependencies import get_read_db
+from models import InterbankTransfer, Payment, Account, BankSettings, KeyRateHistory, Team, ConsentRequest, Client, Consent, APICallRollup
+from services.http_clients import bank_http_clients
+from services.account_routing import account_directory
+from services.interbank_dispatcher import interbank_dispatcher
+from services.hot_accounts import hot_account_compactor
+from services.capital import capital_aggregator
+from services.dimensions import dimension_cache
+from services.bank_stats import bank_stats
+from services.events import event_bus
+from services.query_plans import check_query_plans
+from services.api_log_maintenance import api_log_maintenance
+from services.directory_sync import directory_sync
 
 router = APIRouter(prefix="/admin", tags=["Internal: Admin"], include_in_schema=False)
 
 
 @router.get("/capital")
-async def get_capital(
-    db: AsyncSession = Depends(get_db)
-):
+async def get_capital():
     """
     Получить капитал банка
     
-    Для админ панели
+    Для админ панели. Капитал из кэша (см. services/capital.py):
+    bank_capital + еще не перенесенные изменения журнала.
     """
-    result = await db.execute(select(BankCapital))
-    capitals = result.scalars().all()
+    snapshot = await capital_aggregator.snapshot()
     
     return {
         "banks": [
             {
-                "bank_code": cap.bank_code,
-                "capital": float(cap.capital),
-                "initial_capital": float(cap.initial_capital),
-                "change": float(cap.capital - cap.initial_capital),
-                "total_deposits": float(cap.total_deposits),
-                "total_loans": float(cap.total_loans),
-                "updated_at": cap.updated_at.isoformat()
+                "bank_code": cap["bank_code"],
+                "capital": float(cap["capital"]),
+                "initial_capital": float(cap["initial_capital"]),
+                "change": float(cap["capital"] - cap["initial_capital"]),
+                "total_deposits": float(cap["total_deposits"]),
+                "total_loans": float(cap["total_loans"]),
+                "pending_deltas": cap["pending_deltas"],
+                "updated_at": cap["updated_at"].isoformat() if cap["updated_at"] else None
             }
-            for cap in capitals
-        ]
+            for cap in snapshot["banks"]
+        ],
+        "age_seconds": snapshot["age_seconds"]
     }
 
 
 @router.get("/transfers")
 async def get_transfers(
     limit: int = 50,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Получить межбанковские переводы
@@ -79,7 +92,7 @@ async def get_transfers(
 @router.get("/payments")
 async def get_all_payments(
     limit: int = 50,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Получить все платежи банка
@@ -113,44 +126,235 @@ async def get_all_payments(
 
 
 @router.get("/stats")
-async def get_stats(
-    db: AsyncSession = Depends(get_db)
-):
+async def get_stats():
     """
     Общая статистика банка
+    
+    Счетчики - из периодически обновляемого bank_stats_mv (см. services/bank_stats.py),
+    свежесть - в `staleness`.
     """
-    # Капитал
-    capital_result = await db.execute(select(BankCapital).limit(1))
-    capital = capital_result.scalar_one_or_none()
+    # Капитал (из кэша)
+    snapshot = await capital_aggregator.snapshot()
+    capital = snapshot["banks"][0] if snapshot["banks"] else None
+    
+    stats = await bank_stats.snapshot()
+    total_balance = stats["total_balance"]
     
-    # Подсчет платежей
-    payments_count_result = await db.execute(
-        select(func.count(Payment.id))
+    return {
+        "capital": float(capital["capital"]) if capital else 0,
+        "initial_capital": float(capital["initial_capital"]) if capital else 0,
+        "accounts_count": stats["accounts_count"],
+        "clients_count": stats["clients_count"],
+        "total_balance": float(total_balance),
+        "payments_count": stats["payments_count"],
+        "pool_status": "balanced" if capital and abs(float(capital["capital"]) - float(total_balance)) < 1000 else "imbalanced",
+        "staleness": stats["staleness"]
+    }
+
+
+@router.get("/events")
+async def get_events():
+    """
+    Лента мониторинга (Server-Sent Events)
+    
+    События: `capital`, `stats` (при изменении), `payment` (новый платеж),
+    `payment_status`, `interbank_transfer`. Все подписчики получают одни и те же
+    сообщения от одного producer (см. services/events.py).
+    """
+    return StreamingResponse(
+        event_bus.stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # nginx: не буферизовать поток
+        }
     )
-    payments_count = payments_count_result.scalar()
+
+
+@router.get("/events/stats")
+async def get_events_stats():
+    """
+    Лента мониторинга: подписчики, опубликованные и вытесненные события
+    """
+    return event_bus.stats()
+
+
+@router.get("/db-pool")
+async def get_db_pool_stats():
+    """
+    Пул соединений с БД: занятые/свободные соединения, overflow, загрузка
+    """
+    return pool_stats()
+
+
+@router.get("/db-replica")
+async def get_db_replica_stats():
+    """
+    Реплика для чтения: отставание, куда идут чтения (replica / primary / read-your-writes)
+    """
+    return replica_monitor.stats()
+
+
+@router.get("/query-plans")
+async def get_query_plans():
+    """
+    Планы горячих запросов (EXPLAIN): ok=false, если какой-то из них - Seq Scan (нет индекса)
+    """
+    return await check_query_plans()
+
+
+@router.get("/api-calls")
+async def get_api_calls(
+    minutes: int = Query(60, ge=1, le=7 * 24 * 60),
+    caller_id: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Вызовы API за последние `minutes` минут по (caller_id, endpoint, method)
     
-    # Подсчет счетов
-    accounts_count_result = await db.execute(
-        select(func.count(Account.id))
+    Читает поминутные агрегаты (api_calls_rollup_minute), а не api_calls_log.
+    p50 - среднее минутных медиан с весом по числу вызовов, p95 - максимум
+    минутных p95 (оценка сверху): точные перцентили за период из агрегатов не получить.
+    """
+    calls = func.sum(APICallRollup.calls)
+    query = (
+        select(
+            APICallRollup.caller_id,
+            APICallRollup.endpoint,
+            APICallRollup.method,
+            calls.label("calls"),
+            func.coalesce(func.sum(APICallRollup.calls).filter(APICallRollup.status_code >= 400), 0).label("errors"),
+            (func.sum(APICallRollup.p50_ms * APICallRollup.calls) / func.nullif(calls, 0)).label("p50_ms"),
+            func.max(APICallRollup.p95_ms).label("p95_ms"),
+            func.max(APICallRollup.max_ms).label("max_ms")
+        )
+        .where(APICallRollup.bucket >= datetime.utcnow() - timedelta(minutes=minutes))
+        .group_by(APICallRollup.caller_id, APICallRollup.endpoint, APICallRollup.method)
+        .order_by(calls.desc())
+        .limit(limit)
     )
-    accounts_count = accounts_count_result.scalar()
+    if caller_id is not None:
+        query = query.where(APICallRollup.caller_id == caller_id)
     
-    # Общая сумма на счетах
-    total_balance_result = await db.execute(
-        select(func.sum(Account.balance))
+    result = await db.execute(query)
+    
+    return {
+        "minutes": minutes,
+        "calls": [
+            {
+                "caller_id": row.caller_id or None,
+                "endpoint": row.endpoint,
+                "method": row.method,
+                "calls": row.calls,
+                "errors": row.errors,
+                "p50_ms": int(row.p50_ms) if row.p50_ms is not None else None,
+                "p95_ms": row.p95_ms,
+                "max_ms": row.max_ms
+            }
+            for row in result.all()
+        ],
+        "rollup": api_log_maintenance.stats()
+    }
+
+
+@router.get("/api-calls/timeline")
+async def get_api_calls_timeline(
+    minutes: int = Query(60, ge=1, le=7 * 24 * 60),
+    caller_id: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Вызовы API по минутам: количество, ошибки (status >= 400), максимальный p95
+    """
+    query = (
+        select(
+            APICallRollup.bucket,
+            func.sum(APICallRollup.calls).label("calls"),
+            func.coalesce(func.sum(APICallRollup.calls).filter(APICallRollup.status_code >= 400), 0).label("errors"),
+            func.max(APICallRollup.p95_ms).label("p95_ms")
+        )
+        .where(APICallRollup.bucket >= datetime.utcnow() - timedelta(minutes=minutes))
+        .group_by(APICallRollup.bucket)
+        .order_by(APICallRollup.bucket)
     )
-    total_balance = total_balance_result.scalar() or 0
+    if caller_id is not None:
+        query = query.where(APICallRollup.caller_id == caller_id)
+    
+    result = await db.execute(query)
     
     return {
-        "capital": float(capital.capital) if capital else 0,
-        "initial_capital": float(capital.initial_capital) if capital else 0,
-        "accounts_count": accounts_count,
-        "total_balance": float(total_balance),
-        "payments_count": payments_count,
-        "pool_status": "balanced" if capital and abs(float(capital.capital) - float(total_balance)) < 1000 else "imbalanced"
+        "minutes": minutes,
+        "timeline": [
+            {
+                "minute": row.bucket.isoformat() + "Z",
+                "calls": row.calls,
+                "errors": row.errors,
+                "p95_ms": row.p95_ms
+            }
+            for row in result.all()
+        ]
+    }
+
+
+@router.get("/directory-sync")
+async def get_directory_sync_stats():
+    """
+    Отправка логов API в реестр: курсор, отставание (строк / секунд), ошибки
+    """
+    return directory_sync.stats()
+
+
+@router.get("/http-clients")
+async def get_http_clients_stats():
+    """
+    Метрики межбанковских HTTP клиентов: загрузка пулов, ошибки, ретраи, circuit breakers
+    """
+    return {
+        "clients": bank_http_clients.stats()
     }
 
 
+@router.get("/account-directory")
+async def get_account_directory_stats():
+    """
+    Справочник счетов других банков: размеры снапшотов, кэши, чем разрешались счета
+    """
+    return account_directory.stats()
+
+
+@router.get("/interbank-outbox")
+async def get_interbank_outbox_stats():
+    """
+    Outbox межбанковских переводов: записи по статусам и счетчики диспетчера
+    """
+    return await interbank_dispatcher.stats()
+
+
+@router.get("/hot-accounts")
+async def get_hot_accounts_stats():
+    """
+    Горячие счета: сколько отложенных зачислений перенесено в балансы
+    """
+    return hot_account_compactor.stats()
+
+
+@router.get("/capital-journal")
+async def get_capital_journal_stats():
+    """
+    Журнал изменений капитала: сколько изменений перенесено в bank_capital
+    """
+    return capital_aggregator.stats()
+
+
+@router.get("/dimension-cache")
+async def get_dimension_cache_stats():
+    """
+    Кэш мерчантов и карт для истории транзакций
+    """
+    return dimension_cache.stats()
+
+
 # === Key Rate Management ===
 
 @router.get("/key-rate")
@@ -290,7 +494,7 @@ async def update_bank_settings(
 
 
 @router.get("/teams")
-async def get_all_teams(db: AsyncSession = Depends(get_db)):
+async def get_all_teams(db: AsyncSession = Depends(get_read_db)):
     """
     Получить все зарегистрированные команды
     
@@ -397,7 +601,7 @@ async def delete_team(client_id: str, db: AsyncSession = Depends(get_db)):
 
 
 @router.get("/consents")
-async def get_all_consents(db: AsyncSession = Depends(get_db)):
+async def get_all_consents(db: AsyncSession = Depends(get_read_db)):
     """
     Получить все согласия
     
@@ -1,16 +1,20 @@
 """
 Banker API - Кабинет банкира
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, or_
 from pydantic import BaseModel
 from decimal import Decimal
 from datetime import datetime
+from typing import Optional
 import uuid
 
 from database import get_db
+from api.dependencies import get_read_db
 from models import Product, ConsentRequest, Client, Account, ProductAgreement
+from config import config
+from services.cache import TTLCache, MISSING
 
 router = APIRouter(prefix="/banker", tags=["Internal: Banker"], include_in_schema=False)
 
@@ -23,29 +27,8 @@ class ProductUpdate(BaseModel):
     is_active: bool = None
 
 
-@router.get("/clients")
-async def get_all_clients(db: AsyncSession = Depends(get_db)):
-    """Получить всех клиентов (для банкира)"""
-    result = await db.execute(select(Client).order_by(Client.created_at.desc()))
-    clients = result.scalars().all()
-    
-    return [
-        {
-            "id": c.id,
-            "person_id": c.person_id,
-            "client_type": c.client_type,
-            "full_name": c.full_name,
-            "segment": c.segment,
-            "birth_year": c.birth_year,
-            "monthly_income": float(c.monthly_income) if c.monthly_income else None,
-            "created_at": c.created_at.isoformat() if c.created_at else None
-        }
-        for c in clients
-    ]
-
-
 @router.get("/products")
-async def get_all_products(db: AsyncSession = Depends(get_db)):
+async def get_all_products(db: AsyncSession = Depends(get_read_db)):
     """Получить все продукты (для банкира)"""
     result = await db.execute(select(Product))
     products = result.scalars().all()
@@ -123,7 +106,7 @@ async def create_product(
 # === Consent Management ===
 
 @router.get("/consents/all")
-async def get_all_consents(db: AsyncSession = Depends(get_db)):
+async def get_all_consents(db: AsyncSession = Depends(get_read_db)):
     """
     Получить все запросы на согласия
     
@@ -157,7 +140,7 @@ async def get_all_consents(db: AsyncSession = Depends(get_db)):
 
 
 @router.get("/consents/pending")
-async def get_pending_consents(db: AsyncSession = Depends(get_db)):
+async def get_pending_consents(db: AsyncSession = Depends(get_read_db)):
     """
     Получить запросы ожидающие одобрения
     """
@@ -259,55 +242,150 @@ async def reject_consent(
 
 # === Client Management ===
 
+# Поля сортировки списка клиентов
+CLIENT_SORT_FIELDS = ("created_at", "full_name", "total_balance", "accounts_count", "agreements_count")
+
+# Кэш страниц списка клиентов для дашборда банкира
+_clients_cache = TTLCache(max_size=256, ttl=config.BANKER_CLIENTS_CACHE_TTL)
+
+
 @router.get("/clients")
-async def get_clients(db: AsyncSession = Depends(get_db)):
+async def get_clients(
+    page: int = Query(1, ge=1),
+    page_size: int = Query(25, ge=1, le=500),
+    sort: str = Query("created_at", description="created_at / full_name / total_balance / accounts_count / agreements_count"),
+    order: str = Query("desc", description="asc / desc"),
+    search: Optional[str] = Query(None, description="Поиск по имени или ID клиента"),
+    segment: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
     """
-    Получить список всех клиентов банка с агрегированными данными
+    Получить список клиентов банка с агрегированными данными
+    
+    Одним запросом: счета и договоры агрегируются сгруппированными подзапросами,
+    общее количество - оконной функцией. Страницы кэшируются на BANKER_CLIENTS_CACHE_TTL.
     """
-    result = await db.execute(select(Client))
-    clients = result.scalars().all()
-    
-    clients_data = []
-    for client in clients:
-        # Get client accounts count and total balance
-        accounts_result = await db.execute(
-            select(func.count(Account.id), func.sum(Account.balance))
-            .where(Account.client_id == client.id)
-            .where(Account.status == "active")
+    if sort not in CLIENT_SORT_FIELDS:
+        raise HTTPException(400, f"Invalid sort: {sort}. Supported: {', '.join(CLIENT_SORT_FIELDS)}")
+    if order not in ("asc", "desc"):
+        raise HTTPException(400, "Invalid order: use asc or desc")
+    
+    cache_key = (page, page_size, sort, order, search or "", segment or "")
+    cached = _clients_cache.get(cache_key)
+    if cached is not MISSING:
+        return cached
+    
+    accounts = (
+        select(
+            Account.client_id,
+            func.count(Account.id).label("accounts_count"),
+            func.sum(Account.balance).label("total_balance")
         )
-        accounts_count, total_balance = accounts_result.first()
-        
-        # Get product agreements count
-        agreements_result = await db.execute(
-            select(func.count(ProductAgreement.id))
-            .where(ProductAgreement.client_id == client.id)
-            .where(ProductAgreement.status == "active")
+        .where(Account.status == "active")
+        .group_by(Account.client_id)
+        .subquery()
+    )
+    agreements = (
+        select(
+            ProductAgreement.client_id,
+            func.count(ProductAgreement.id).label("agreements_count")
         )
-        agreements_count = agreements_result.scalar()
-        
-        clients_data.append({
-            "client_id": client.person_id,
-            "full_name": client.full_name,
-            "client_type": client.client_type,
-            "segment": client.segment,
-            "accounts_count": accounts_count or 0,
-            "total_balance": float(total_balance) if total_balance else 0,
-            "agreements_count": agreements_count or 0,
-            "created_at": client.created_at.isoformat()
-        })
+        .where(ProductAgreement.status == "active")
+        .group_by(ProductAgreement.client_id)
+        .subquery()
+    )
     
-    return {
-        "data": clients_data,
+    accounts_count = func.coalesce(accounts.c.accounts_count, 0)
+    total_balance = func.coalesce(accounts.c.total_balance, 0)
+    agreements_count = func.coalesce(agreements.c.agreements_count, 0)
+    
+    sort_columns = {
+        "created_at": Client.created_at,
+        "full_name": Client.full_name,
+        "total_balance": total_balance,
+        "accounts_count": accounts_count,
+        "agreements_count": agreements_count
+    }
+    sort_column = sort_columns[sort]
+    
+    query = (
+        select(
+            Client,
+            accounts_count,
+            total_balance,
+            agreements_count,
+            func.count().over().label("total")
+        )
+        .outerjoin(accounts, accounts.c.client_id == Client.id)
+        .outerjoin(agreements, agreements.c.client_id == Client.id)
+    )
+    
+    if search:
+        pattern = "%" + search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        query = query.where(or_(Client.full_name.ilike(pattern), Client.person_id.ilike(pattern)))
+    if segment:
+        query = query.where(Client.segment == segment)
+    
+    if order == "desc":
+        query = query.order_by(sort_column.desc().nulls_last(), Client.id.desc())
+    else:
+        query = query.order_by(sort_column.asc().nulls_last(), Client.id.asc())
+    
+    result = await db.execute(
+        query
+        .limit(page_size)
+        .offset((page - 1) * page_size)
+    )
+    rows = result.all()
+    
+    if rows:
+        total = rows[0].total
+    elif page == 1:
+        total = 0
+    else:
+        # Страница за концом списка - посчитать отдельно
+        count_query = select(func.count(Client.id))
+        if search:
+            count_query = count_query.where(or_(Client.full_name.ilike(pattern), Client.person_id.ilike(pattern)))
+        if segment:
+            count_query = count_query.where(Client.segment == segment)
+        total = (await db.execute(count_query)).scalar()
+    
+    response = {
+        "data": [
+            {
+                "id": client.id,
+                "client_id": client.person_id,
+                "person_id": client.person_id,
+                "full_name": client.full_name,
+                "client_type": client.client_type,
+                "segment": client.segment,
+                "birth_year": client.birth_year,
+                "monthly_income": float(client.monthly_income) if client.monthly_income else None,
+                "accounts_count": client_accounts,
+                "total_balance": float(client_balance),
+                "agreements_count": client_agreements,
+                "created_at": client.created_at.isoformat() if client.created_at else None
+            }
+            for client, client_accounts, client_balance, client_agreements, _ in rows
+        ],
         "meta": {
-            "total": len(clients_data)
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "sort": sort,
+            "order": order
         }
     }
+    
+    _clients_cache.set(cache_key, response)
+    return response
 
 
 @router.get("/clients/{client_id}")
 async def get_client_details(
     client_id: str,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Получить детальную информацию о клиенте со счетами
@@ -12,9 +12,11 @@ import uuid
 import random
 
 from ..database import get_db
+from ..responses import fast_json
 from ..models import Card, Account, Client
 from ..services.auth_service import require_any_token, require_client
 from ..services.consent_service import ConsentService
+from ..services.dimensions import dimension_cache
 
 
 router = APIRouter(prefix="/cards", tags=["8 Карты"])
@@ -182,13 +184,13 @@ async def get_cards(
             issuedAt=card.issued_at.isoformat() + "Z"
         ))
     
-    return {
+    return fast_json({
         "data": {
             "cards": cards_list,
             "total": len(cards_list)
         },
         "meta": {}
-    }
+    })
 
 
 @router.get("/{card_id}", summary="2. Получить детали карты")
@@ -420,6 +422,7 @@ async def create_card(
     db.add(new_card)
     await db.commit()
     await db.refresh(new_card)
+    dimension_cache.invalidate_cards(new_card.account_id)
     
     return {
         "data": CardResponse(
@@ -703,8 +706,10 @@ async def delete_card(
         raise HTTPException(404, "Card not found")
     
     # Удалить карту
+    account_id = card.account_id
     await db.delete(card)
     await db.commit()
+    dimension_cache.invalidate_cards(account_id)
     
     return {
         "data": {
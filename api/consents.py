@@ -505,6 +505,7 @@ async def delete_account_access_consents_consent_id(
     consent.status = "Revoked"
     consent.status_update_date_time = datetime.utcnow()
     await db.commit()
+    ConsentService.invalidate_consent_owner(consent_id)
     
     return None  # 204 No Content
 
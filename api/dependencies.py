@@ -0,0 +1,31 @@
+"""
+Общие зависимости эндпоинтов API
+"""
+from fastapi import Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import AsyncGenerator
+
+from database import replica_monitor
+from services.auth_service import request_subject
+
+
+async def get_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency для read-only эндпоинтов: сессия реплики (см. database.ReplicaMonitor)
+
+    Без DATABASE_READ_URL, при отставании реплики или сразу после своего
+    платежа - сессия primary, как get_db. Выбранная фабрика сессий
+    сохраняется в request.state.read_session_factory (для потоковых выгрузок).
+    """
+    session_factory = replica_monitor.session_factory(request_subject(request))
+    request.state.read_session_factory = session_factory
+
+    async with session_factory() as session:
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+        finally:
+            await session.close()
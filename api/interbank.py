@@ -2,18 +2,26 @@
 Interbank API - Прием межбанковских переводов
 Используется для коммуникации между банками
 """
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Header, Response
 from pydantic import BaseModel, Field
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from typing import Optional
+from sqlalchemy import select, any_, bindparam, String, ARRAY
+from sqlalchemy.exc import IntegrityError
+from typing import Optional, List
 from datetime import datetime
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
 import uuid
+import hashlib
+import json
 
 from database import get_db
+from api.dependencies import get_read_db
 from models import Account, Payment, Transaction, InterbankTransfer, BankCapital
 from services.payment_service import PaymentService
+from services.ledger import LedgerService
+from services.events import event_bus
+from services.cache import TTLCache, MISSING
+from services.auth_service import require_federation_bank
 from config import config
 
 
@@ -40,6 +48,24 @@ class InterbankTransferResponse(BaseModel):
     credited_at: Optional[str] = None
 
 
+class InterbankTransferBatchRequest(BaseModel):
+    """Пачка входящих межбанковских переводов"""
+    transfers: List[InterbankTransferRequest] = Field(..., description="Переводы (до INTERBANK_RECEIVE_BATCH_MAX)")
+
+
+class InterbankTransferResult(BaseModel):
+    """Результат одного перевода из пачки"""
+    transfer_id: str
+    status: str  # completed / duplicate / rejected
+    message: str
+    credited_at: Optional[str] = None
+
+
+class InterbankTransferBatchResponse(BaseModel):
+    """Ответ на пачку переводов"""
+    results: List[InterbankTransferResult]
+
+
 # === Endpoints ===
 
 @router.post("/receive", response_model=InterbankTransferResponse, status_code=201)
@@ -60,8 +86,14 @@ async def receive_interbank_transfer(
     4. Обновить капитал банка (+amount)
     5. Сохранить запись InterbankTransfer
     
+    ### Идемпотентность:
+    Повторный запрос с тем же `transfer_id` не зачисляет деньги второй раз,
+    а возвращает тот же успешный ответ (банк-отправитель повторяет отправку
+    при таймаутах и ошибках).
+    
     ### Безопасность:
-    - Header `x-bank-auth-token` для аутентификации банка (в MVP упрощено)
+    - Header `x-bank-auth-token` - код банка федерации (INTERBANK_PEERS), 403 для остальных
+    - `from_bank` должен совпадать с банком из `x-bank-auth-token`
     - В продакшене: JWT подписанный ключом банка-отправителя
     
     ### Пример запроса:
@@ -76,13 +108,20 @@ async def receive_interbank_transfer(
     }
     ```
     """
+    sender = _require_peer_bank(x_bank_auth_token)
+    if request.from_bank != sender:
+        raise HTTPException(403, f"Transfer from {request.from_bank} sent by {sender}")
     
-    # TODO: Проверить x_bank_auth_token (в продакшене)
-    # В MVP пропускаем для упрощения
+    amount = _parse_amount(request.amount)
+    if amount is None:
+        raise HTTPException(400, f"Invalid amount: {request.amount}")
+    
+    # Перевод уже зачислен - повторная доставка
+    duplicate = await _already_received(db, request)
+    if duplicate:
+        return duplicate
     
     try:
-        amount = Decimal(request.amount)
-        
         # 1. Найти счет получателя
         result = await db.execute(
             select(Account).where(Account.account_number == request.to_account_number)
@@ -93,27 +132,20 @@ async def receive_interbank_transfer(
             raise HTTPException(404, f"Account {request.to_account_number} not found in {config.BANK_CODE}")
         
         # 2. Зачислить деньги на счет
-        to_account.balance += amount
+        await LedgerService.credit(db, to_account.id, amount)
         
         # 3. Создать транзакцию (Credit - зачисление)
         transaction = Transaction(
             account_id=to_account.id,
-            transaction_type="Credit",
+            transaction_id=f"tx-{uuid.uuid4().hex[:12]}",
             amount=amount,
-            balance_after=to_account.balance,
+            direction="credit",
             description=f"Входящий перевод из {request.from_bank}: {request.description}",
             transaction_date=datetime.utcnow()
         )
         db.add(transaction)
         
-        # 4. Обновить капитал банка-получателя (+amount)
-        await PaymentService.update_bank_capital(
-            db=db,
-            amount_change=amount,
-            reason=f"Incoming transfer from {request.from_bank}: {request.transfer_id}"
-        )
-        
-        # 5. Сохранить запись InterbankTransfer
+        # 4. Сохранить запись InterbankTransfer (уникальный transfer_id - защита от двойного зачисления)
         interbank_transfer = InterbankTransfer(
             transfer_id=request.transfer_id,
             payment_id=None,  # На стороне получателя нет payment
@@ -125,9 +157,26 @@ async def receive_interbank_transfer(
         )
         db.add(interbank_transfer)
         
+        # 5. Обновить капитал банка-получателя (+amount) - коммитит все изменения
+        await PaymentService.update_bank_capital(
+            db=db,
+            amount_change=amount,
+            reason=f"Incoming transfer from {request.from_bank}: {request.transfer_id}",
+            reference=request.transfer_id
+        )
+        
         await db.commit()
         await db.refresh(to_account)
         
+        event_bus.publish("interbank_transfer", {
+            "transfer_id": request.transfer_id,
+            "direction": "incoming",
+            "from_bank": request.from_bank,
+            "to_bank": config.BANK_CODE,
+            "amount": amount,
+            "status": "completed"
+        })
+        
         return InterbankTransferResponse(
             success=True,
             transfer_id=request.transfer_id,
@@ -137,11 +186,213 @@ async def receive_interbank_transfer(
         
     except HTTPException:
         raise
+    except IntegrityError:
+        # Параллельный запрос с тем же transfer_id успел зачислить первым
+        await db.rollback()
+        duplicate = await _already_received(db, request)
+        if duplicate:
+            return duplicate
+        raise HTTPException(400, "Failed to process transfer")
     except Exception as e:
         await db.rollback()
         raise HTTPException(400, f"Failed to process transfer: {str(e)}")
 
 
+@router.post("/receive-batch", response_model=InterbankTransferBatchResponse)
+async def receive_interbank_transfer_batch(
+    request: InterbankTransferBatchRequest,
+    x_bank_auth_token: Optional[str] = Header(None, alias="x-bank-auth-token"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    ## 🏦 Прием пачки межбанковских переводов
+    
+    Зачисляет N переводов в одной транзакции БД: один SELECT счетов,
+    одно изменение капитала на суммарную величину, один commit.
+    
+    ### Результат по каждому переводу:
+    - `completed` - зачислен
+    - `duplicate` - уже был зачислен ранее (идемпотентность по `transfer_id`)
+    - `rejected` - отклонен (счет не найден, некорректная сумма, перевод не от банка
+      из x-bank-auth-token); остальные переводы пачки не затрагиваются
+    """
+    sender = _require_peer_bank(x_bank_auth_token)
+    
+    if len(request.transfers) > config.INTERBANK_RECEIVE_BATCH_MAX:
+        raise HTTPException(413, f"Too many transfers in batch (max {config.INTERBANK_RECEIVE_BATCH_MAX})")
+    
+    try:
+        results = await _credit_batch(db, request.transfers, sender)
+    except IntegrityError:
+        # Параллельный запрос зачислил часть переводов первым - повторить,
+        # они вернутся как duplicate
+        await db.rollback()
+        try:
+            results = await _credit_batch(db, request.transfers, sender)
+        except IntegrityError:
+            # Конфликт снова - отправитель повторит пачку позже (5xx)
+            await db.rollback()
+            raise HTTPException(503, "Concurrent transfers with the same transfer_id, retry the batch")
+    
+    completed = {r.transfer_id for r in results if r.status == "completed"}
+    for transfer in request.transfers:
+        if transfer.transfer_id in completed:
+            event_bus.publish("interbank_transfer", {
+                "transfer_id": transfer.transfer_id,
+                "direction": "incoming",
+                "from_bank": transfer.from_bank,
+                "to_bank": config.BANK_CODE,
+                "amount": Decimal(transfer.amount),
+                "status": "completed"
+            })
+    
+    return InterbankTransferBatchResponse(results=results)
+
+
+async def _credit_batch(
+    db: AsyncSession,
+    transfers: List[InterbankTransferRequest],
+    sender: str
+) -> List[InterbankTransferResult]:
+    """Зачислить пачку переводов одной транзакцией"""
+    now = datetime.utcnow()
+    transfer_ids = list({t.transfer_id for t in transfers})
+    account_numbers = list({t.to_account_number for t in transfers})
+    
+    # Уже зачисленные переводы
+    existing_result = await db.execute(
+        select(InterbankTransfer.transfer_id, InterbankTransfer.completed_at).where(
+            InterbankTransfer.transfer_id == any_(bindparam("transfer_ids", transfer_ids, type_=ARRAY(String))),
+            InterbankTransfer.to_bank == config.BANK_CODE
+        )
+    )
+    already_received = {transfer_id: completed_at for transfer_id, completed_at in existing_result.all()}
+    
+    # Все счета получателей одним запросом (блокирует LedgerService.post ниже -
+    # в порядке id, а горячие счета не блокируются вовсе)
+    accounts_result = await db.execute(
+        select(Account)
+        .where(Account.account_number == any_(bindparam("account_numbers", account_numbers, type_=ARRAY(String))))
+    )
+    accounts = {a.account_number: a for a in accounts_result.scalars().all()}
+    
+    results = []
+    by_transfer_id = {}  # Повтор transfer_id внутри пачки получает тот же результат
+    credited_count = 0
+    total_credited = Decimal("0")
+    credits = {}  # account_id -> сумма зачислений
+    
+    for transfer in transfers:
+        if transfer.transfer_id in by_transfer_id:
+            results.append(by_transfer_id[transfer.transfer_id])
+            continue
+        
+        if transfer.transfer_id in already_received:
+            completed_at = already_received[transfer.transfer_id] or now
+            results.append(InterbankTransferResult(
+                transfer_id=transfer.transfer_id,
+                status="duplicate",
+                message="Transfer already processed",
+                credited_at=completed_at.isoformat() + "Z"
+            ))
+            by_transfer_id[transfer.transfer_id] = results[-1]
+            continue
+        
+        if transfer.from_bank != sender:
+            results.append(InterbankTransferResult(
+                transfer_id=transfer.transfer_id,
+                status="rejected",
+                message=f"Transfer from {transfer.from_bank} sent by {sender}"
+            ))
+            by_transfer_id[transfer.transfer_id] = results[-1]
+            continue
+        
+        amount = _parse_amount(transfer.amount)
+        if amount is None:
+            results.append(InterbankTransferResult(
+                transfer_id=transfer.transfer_id,
+                status="rejected",
+                message=f"Invalid amount: {transfer.amount}"
+            ))
+            by_transfer_id[transfer.transfer_id] = results[-1]
+            continue
+        
+        to_account = accounts.get(transfer.to_account_number)
+        if not to_account:
+            results.append(InterbankTransferResult(
+                transfer_id=transfer.transfer_id,
+                status="rejected",
+                message=f"Account {transfer.to_account_number} not found in {config.BANK_CODE}"
+            ))
+            by_transfer_id[transfer.transfer_id] = results[-1]
+            continue
+        
+        # Записать транзакцию и InterbankTransfer, зачисление - одной проводкой ниже
+        credits[to_account.id] = credits.get(to_account.id, Decimal("0")) + amount
+        db.add(Transaction(
+            account_id=to_account.id,
+            transaction_id=f"tx-{uuid.uuid4().hex[:12]}",
+            amount=amount,
+            direction="credit",
+            description=f"Входящий перевод из {transfer.from_bank}: {transfer.description}",
+            transaction_date=now
+        ))
+        db.add(InterbankTransfer(
+            transfer_id=transfer.transfer_id,
+            payment_id=None,
+            from_bank=transfer.from_bank,
+            to_bank=config.BANK_CODE,
+            amount=amount,
+            status="completed",
+            completed_at=now
+        ))
+        credited_count += 1
+        total_credited += amount
+        
+        results.append(InterbankTransferResult(
+            transfer_id=transfer.transfer_id,
+            status="completed",
+            message=f"Credited to account {transfer.to_account_number}",
+            credited_at=now.isoformat() + "Z"
+        ))
+        by_transfer_id[transfer.transfer_id] = results[-1]
+    
+    # Зачислить на все счета одной проводкой
+    await LedgerService.post(db, credits)
+    
+    if total_credited:
+        # Одно изменение капитала на всю пачку - коммитит все изменения
+        await PaymentService.update_bank_capital(
+            db=db,
+            amount_change=total_credited,
+            reason=f"Incoming transfer batch: {credited_count} transfers"
+        )
+    else:
+        await db.commit()
+    
+    return results
+
+
+async def _already_received(db: AsyncSession, request: InterbankTransferRequest) -> Optional[InterbankTransferResponse]:
+    """Ответ для уже зачисленного перевода или None"""
+    result = await db.execute(
+        select(InterbankTransfer).where(
+            InterbankTransfer.transfer_id == request.transfer_id,
+            InterbankTransfer.to_bank == config.BANK_CODE
+        )
+    )
+    transfer = result.scalar_one_or_none()
+    if not transfer:
+        return None
+    
+    return InterbankTransferResponse(
+        success=True,
+        transfer_id=request.transfer_id,
+        message=f"Transfer already processed. Credited to account {request.to_account_number}",
+        credited_at=transfer.completed_at.isoformat() + "Z" if transfer.completed_at else None
+    )
+
+
 @router.get("/check-account/{account_number}")
 async def check_account_exists(
     account_number: str,
@@ -174,9 +425,74 @@ async def check_account_exists(
         raise HTTPException(404, f"Account {account_number} not found")
 
 
+def _parse_amount(value: str) -> Optional[Decimal]:
+    """Сумма перевода; None - не число, NaN / Infinity или не больше нуля"""
+    try:
+        amount = Decimal(value)
+        # NaN / Infinity: сравнение NaN само бросает InvalidOperation
+        return amount if amount.is_finite() and amount > 0 else None
+    except InvalidOperation:
+        return None
+
+
+def _require_peer_bank(x_bank_auth_token: Optional[str]) -> str:
+    """Код банка из x-bank-auth-token (банки федерации передают свой код); 403 - не банк федерации"""
+    peers = [b for b in config.INTERBANK_PEERS if b != config.BANK_CODE]
+    if x_bank_auth_token not in peers:
+        raise HTTPException(403, "Unknown interbank peer")
+    return x_bank_auth_token
+
+
+# Снапшот счетов для export_accounts: (etag, тело ответа)
+_accounts_export_cache = TTLCache(max_size=1, ttl=config.ACCOUNT_EXPORT_CACHE_TTL)
+
+
+@router.get("/accounts/export")
+async def export_accounts(
+    bank: dict = Depends(require_federation_bank),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    ## 📇 Снапшот номеров счетов банка
+    
+    Другие банки загружают его в свой справочник маршрутизации
+    и определяют банк получателя без check-account запросов.
+    Поддерживает условный запрос (ETag / If-None-Match).
+    
+    Только для банков федерации: RS256 токен банка (Authorization: Bearer),
+    подпись проверяется ключом банка из key ring. Закрытые счета не выгружаются.
+    """
+    # Банки федерации опрашивают снапшот по расписанию: в пределах TTL
+    # ответ (и 304) отдается без запроса к БД
+    snapshot = _accounts_export_cache.get("snapshot")
+    if snapshot is MISSING:
+        result = await db.execute(
+            select(Account.account_number)
+            .where(Account.status == "active")
+            .order_by(Account.account_number)
+        )
+        accounts = result.scalars().all()
+        
+        body = json.dumps({
+            "bank_code": config.BANK_CODE,
+            "accounts": accounts,
+            "generated_at": datetime.utcnow().isoformat()
+        }, separators=(",", ":")).encode()
+        etag = '"' + hashlib.sha256("\n".join(accounts).encode()).hexdigest()[:32] + '"'
+        snapshot = (etag, body)
+        _accounts_export_cache.set("snapshot", snapshot)
+    
+    etag, body = snapshot
+    if if_none_match == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
 @router.get("/transfers", response_model=list)
 async def list_interbank_transfers(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     limit: int = 50
 ):
     """
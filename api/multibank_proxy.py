@@ -9,6 +9,8 @@ import httpx
 import os
 import logging
 
+from services.http_clients import bank_http_clients, CircuitOpenError
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/multibank", tags=["Internal: Multibank"], include_in_schema=False)
@@ -55,26 +57,28 @@ async def get_bank_token(request: BankTokenRequest):
     Использует креды команды (client_id и client_secret)
     """
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.post(
-                f"{request.bank_url}/auth/bank-token",
-                params={
-                    "client_id": TEAM_CLIENT_ID,
-                    "client_secret": TEAM_CLIENT_SECRET
-                },
-                headers={"accept": "application/json"}
+        client = bank_http_clients.for_url(request.bank_url)
+        response = await client.post(
+            f"{request.bank_url}/auth/bank-token",
+            params={
+                "client_id": TEAM_CLIENT_ID,
+                "client_secret": TEAM_CLIENT_SECRET
+            },
+            headers={"accept": "application/json"}
+        )
+        
+        if response.status_code != 200:
+            raise HTTPException(
+                response.status_code, 
+                f"Failed to get bank token: {response.text}"
             )
-            
-            if response.status_code != 200:
-                raise HTTPException(
-                    response.status_code, 
-                    f"Failed to get bank token: {response.text}"
-                )
-            
-            return response.json()
-            
+        
+        return response.json()
+        
     except httpx.TimeoutException:
         raise HTTPException(504, "Bank server timeout")
+    except CircuitOpenError:
+        raise HTTPException(503, "Bank temporarily unavailable")
     except httpx.RequestError as e:
         raise HTTPException(502, f"Connection error: {str(e)}")
 
@@ -87,39 +91,41 @@ async def request_consent(request: ConsentRequest):
     Требуется банковский токен из шага 1
     """
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            # Запрос на создание consent (формат согласно API банков)
-            consent_data = {
-                "client_id": request.client_id,
-                "permissions": [
-                    "ReadAccountsBasic", 
-                    "ReadAccountsDetail", 
-                    "ReadBalances", 
-                    "ReadTransactionsDetail"
-                ],
-                "expiration_date": "2025-12-31T23:59:59.000Z"
+        client = bank_http_clients.for_url(request.bank_url)
+        # Запрос на создание consent (формат согласно API банков)
+        consent_data = {
+            "client_id": request.client_id,
+            "permissions": [
+                "ReadAccountsBasic", 
+                "ReadAccountsDetail", 
+                "ReadBalances", 
+                "ReadTransactionsDetail"
+            ],
+            "expiration_date": "2025-12-31T23:59:59.000Z"
+        }
+        
+        response = await client.post(
+            f"{request.bank_url}/account-consents/request",
+            json=consent_data,
+            headers={
+                "Authorization": f"Bearer {request.bank_token}",
+                "Content-Type": "application/json",
+                "x-requesting-bank": TEAM_CLIENT_ID  # ВАЖНО: указываем requesting_bank!
             }
-            
-            response = await client.post(
-                f"{request.bank_url}/account-consents/request",
-                json=consent_data,
-                headers={
-                    "Authorization": f"Bearer {request.bank_token}",
-                    "Content-Type": "application/json",
-                    "x-requesting-bank": TEAM_CLIENT_ID  # ВАЖНО: указываем requesting_bank!
-                }
+        )
+        
+        if response.status_code not in [200, 201]:
+            raise HTTPException(
+                response.status_code,
+                f"Failed to request consent: {response.text}"
             )
-            
-            if response.status_code not in [200, 201]:
-                raise HTTPException(
-                    response.status_code,
-                    f"Failed to request consent: {response.text}"
-                )
-            
-            return response.json()
-            
+        
+        return response.json()
+        
     except httpx.TimeoutException:
         raise HTTPException(504, "Bank server timeout")
+    except CircuitOpenError:
+        raise HTTPException(503, "Bank temporarily unavailable")
     except httpx.RequestError as e:
         raise HTTPException(502, f"Connection error: {str(e)}")
 
@@ -132,28 +138,30 @@ async def get_accounts_with_consent(request: AccountsWithConsentRequest):
     Требуется банковский токен и consent_id из предыдущих шагов
     """
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            url = f"{request.bank_url}/accounts"
-            headers = {
-                "accept": "application/json",
-                "Authorization": f"Bearer {request.bank_token}",
-                "x-consent-id": request.consent_id,
-                "x-requesting-bank": TEAM_CLIENT_ID
-            }
-            params = {"client_id": request.client_id}
-            
-            response = await client.get(url, headers=headers, params=params)
-            
-            if response.status_code != 200:
-                raise HTTPException(
-                    response.status_code,
-                    f"Failed to get accounts: {response.text}"
-                )
-            
-            return response.json()
-            
+        client = bank_http_clients.for_url(request.bank_url)
+        url = f"{request.bank_url}/accounts"
+        headers = {
+            "accept": "application/json",
+            "Authorization": f"Bearer {request.bank_token}",
+            "x-consent-id": request.consent_id,
+            "x-requesting-bank": TEAM_CLIENT_ID
+        }
+        params = {"client_id": request.client_id}
+        
+        response = await client.get(url, headers=headers, params=params)
+        
+        if response.status_code != 200:
+            raise HTTPException(
+                response.status_code,
+                f"Failed to get accounts: {response.text}"
+            )
+        
+        return response.json()
+        
     except httpx.TimeoutException:
         raise HTTPException(504, "Bank server timeout")
+    except CircuitOpenError:
+        raise HTTPException(503, "Bank temporarily unavailable")
     except httpx.RequestError as e:
         raise HTTPException(502, f"Connection error: {str(e)}")
 
@@ -166,22 +174,24 @@ async def proxy_login(request: LoginRequest):
     Используйте новый flow: bank-token -> request-consent -> accounts-with-consent
     """
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.post(
-                f"{request.bank_url}/auth/login",
-                json={
-                    "username": request.username,
-                    "password": request.password
-                }
-            )
-            
-            if response.status_code != 200:
-                raise HTTPException(response.status_code, "Authentication failed")
-            
-            return response.json()
-            
+        client = bank_http_clients.for_url(request.bank_url)
+        response = await client.post(
+            f"{request.bank_url}/auth/login",
+            json={
+                "username": request.username,
+                "password": request.password
+            }
+        )
+        
+        if response.status_code != 200:
+            raise HTTPException(response.status_code, "Authentication failed")
+        
+        return response.json()
+        
     except httpx.TimeoutException:
         raise HTTPException(504, "Bank server timeout")
+    except CircuitOpenError:
+        raise HTTPException(503, "Bank temporarily unavailable")
     except httpx.RequestError as e:
         raise HTTPException(502, f"Connection error: {str(e)}")
 
@@ -192,21 +202,23 @@ async def proxy_accounts(request: ProxyRequest):
     Проксирует запрос получения счетов к другому банку
     """
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(
-                f"{request.bank_url}{request.endpoint}",
-                headers={
-                    "Authorization": f"Bearer {request.token}"
-                }
-            )
-            
-            if response.status_code != 200:
-                raise HTTPException(response.status_code, "Failed to fetch accounts")
-            
-            return response.json()
-            
+        client = bank_http_clients.for_url(request.bank_url)
+        response = await client.get(
+            f"{request.bank_url}{request.endpoint}",
+            headers={
+                "Authorization": f"Bearer {request.token}"
+            }
+        )
+        
+        if response.status_code != 200:
+            raise HTTPException(response.status_code, "Failed to fetch accounts")
+        
+        return response.json()
+        
     except httpx.TimeoutException:
         raise HTTPException(504, "Bank server timeout")
+    except CircuitOpenError:
+        raise HTTPException(503, "Bank temporarily unavailable")
     except httpx.RequestError as e:
         raise HTTPException(502, f"Connection error: {str(e)}")
 
@@ -222,24 +234,26 @@ async def get_balance_with_consent(
     Получить баланс счета используя consent (правильный OpenBanking flow)
     """
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(
-                f"{bank_url}/accounts/{account_id}/balances",
-                headers={
-                    "accept": "application/json",
-                    "Authorization": f"Bearer {bank_token}",
-                    "x-consent-id": consent_id,
-                    "x-requesting-bank": TEAM_CLIENT_ID
-                }
-            )
-            
-            if response.status_code != 200:
-                raise HTTPException(response.status_code, f"Failed to fetch balance: {response.text}")
-            
-            return response.json()
-            
+        client = bank_http_clients.for_url(bank_url)
+        response = await client.get(
+            f"{bank_url}/accounts/{account_id}/balances",
+            headers={
+                "accept": "application/json",
+                "Authorization": f"Bearer {bank_token}",
+                "x-consent-id": consent_id,
+                "x-requesting-bank": TEAM_CLIENT_ID
+            }
+        )
+        
+        if response.status_code != 200:
+            raise HTTPException(response.status_code, f"Failed to fetch balance: {response.text}")
+        
+        return response.json()
+        
     except httpx.TimeoutException:
         raise HTTPException(504, "Bank server timeout")
+    except CircuitOpenError:
+        raise HTTPException(503, "Bank temporarily unavailable")
     except httpx.RequestError as e:
         raise HTTPException(502, f"Connection error: {str(e)}")
 
@@ -256,21 +270,23 @@ async def proxy_balance(
     Используйте balances-with-consent для правильного OpenBanking flow
     """
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(
-                f"{bank_url}/accounts/{account_id}/balances",
-                headers={
-                    "Authorization": f"Bearer {token}"
-                }
-            )
-            
-            if response.status_code != 200:
-                raise HTTPException(response.status_code, "Failed to fetch balance")
-            
-            return response.json()
-            
+        client = bank_http_clients.for_url(bank_url)
+        response = await client.get(
+            f"{bank_url}/accounts/{account_id}/balances",
+            headers={
+                "Authorization": f"Bearer {token}"
+            }
+        )
+        
+        if response.status_code != 200:
+            raise HTTPException(response.status_code, "Failed to fetch balance")
+        
+        return response.json()
+        
     except httpx.TimeoutException:
         raise HTTPException(504, "Bank server timeout")
+    except CircuitOpenError:
+        raise HTTPException(503, "Bank temporarily unavailable")
     except httpx.RequestError as e:
         raise HTTPException(502, f"Connection error: {str(e)}")
 
@@ -16,6 +16,7 @@ import uuid
 from database import get_db
 from models import PaymentConsentRequest, PaymentConsent, Client, Notification, BankSettings
 from services.auth_service import require_banker, require_client
+from services.consent_service import ConsentService
 from config import config
 
 
@@ -289,6 +290,7 @@ async def revoke_payment_consent(
     consent.status_update_date_time = datetime.utcnow()
     
     await db.commit()
+    ConsentService.invalidate_consent_owner(consent_id)
     
     return None
 
@@ -12,10 +12,11 @@ from datetime import datetime
 from decimal import Decimal
 import uuid
 
-from database import get_db
+from database import get_db, replica_monitor
 from models import Payment, Account, PaymentConsent
 from services.auth_service import require_any_token
 from services.payment_service import PaymentService
+from services.interbank_dispatcher import interbank_dispatcher
 
 
 router = APIRouter(prefix="/payments", tags=["4 Переводы"])
@@ -143,13 +144,11 @@ async def create_payment(
     - Коды банков: `vbank`, `abank`, `sbank`
     
     ### Sandbox особенности:
-    - Межбанковые переводы выполняются мгновенно
+    - Межбанковый перевод возвращается сразу в статусе `AcceptedSettlementInProcess`
+      и отправляется в банк-получатель в фоне (см. GET /payments/{payment_id})
     - Комиссия не взимается
     - Все валюты конвертируются по курсу 1:1 для упрощения
     """
-    if not current_client:
-        raise HTTPException(401, "Unauthorized")
-    
     # Проверка согласия для межбанковых запросов
     payment_consent_id_to_store = None
     if x_requesting_bank:
@@ -226,6 +225,13 @@ async def create_payment(
             payment_consent_id=payment_consent_id_to_store
         )
         
+        # Межбанковский перевод в outbox - разбудить диспетчер, не дожидаясь отправки
+        if interbank:
+            interbank_dispatcher.notify()
+        
+        # Read-your-writes: следующие чтения плательщика - с primary, а не с отстающей реплики
+        replica_monitor.mark_recent_write(token_data.get("bank_code") or token_data.get("client_id"))
+        
         # Если использовалось согласие - пометить его как использованное
         if payment_consent_id_to_store:
             consent_result = await db.execute(
@@ -275,10 +281,12 @@ async def get_payment(
     
     OpenBanking Russia Payments API
     GET /payments/{paymentId}
-    """
-    if not current_client:
-        raise HTTPException(401, "Unauthorized")
     
+    Межбанковский платеж остается AcceptedSettlementInProcess, пока перевод
+    не отправлен; итоговый статус - AcceptedSettlementCompleted или Rejected.
+    Перевод без ответа банка-получателя после INTERBANK_DISPATCH_MAX_ATTEMPTS
+    попыток уходит на ручной разбор, платеж остается AcceptedSettlementInProcess.
+    """
     payment = await PaymentService.get_payment(db, payment_id)
     
     if not payment:
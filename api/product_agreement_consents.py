@@ -28,6 +28,7 @@ try:
         BankSettings
     )
     from services.auth_service import require_bank, require_banker, require_any_token
+    from services.consent_service import ConsentService
 except ImportError:
     from database import get_db
     from models import (
@@ -38,6 +39,7 @@ except ImportError:
         BankSettings
     )
     from services.auth_service import require_bank, require_banker, require_any_token
+    from services.consent_service import ConsentService
 
 
 router = APIRouter(
@@ -313,6 +315,7 @@ async def revoke_product_agreement_consent(
     consent.status_update_date_time = datetime.utcnow()
     
     await db.commit()
+    ConsentService.invalidate_consent_owner(consent_id)
     
     return None
 
@@ -11,8 +11,10 @@ from datetime import datetime, timedelta
 import uuid
 
 from database import get_db
-from models import ProductAgreement, Product, Client, Account, BankCapital, Transaction
+from models import ProductAgreement, Product, Client, Account, Transaction
 from services.auth_service import require_any_token
+from services.ledger import LedgerService, InsufficientFundsError
+from services.capital import CapitalService
 
 router = APIRouter(prefix="/product-agreements", tags=["7 Договоры с продуктами"])
 
@@ -173,11 +175,11 @@ async def create_agreement(
             if not source_account:
                 raise HTTPException(404, "Source account not found")
             
-            if source_account.balance < Decimal(str(request.amount)):
-                raise HTTPException(400, f"Insufficient funds. Available: {source_account.balance}, Required: {request.amount}")
-            
-            # Списать со source account
-            source_account.balance -= Decimal(str(request.amount))
+            # Списать со source account (атомарно, с проверкой баланса)
+            try:
+                await LedgerService.debit(db, source_account.id, Decimal(str(request.amount)))
+            except InsufficientFundsError as e:
+                raise HTTPException(400, str(e))
             
             # Создать транзакцию списания
             debit_tx = Transaction(
@@ -213,14 +215,10 @@ async def create_agreement(
         db.add(credit_tx)
         
     elif product.product_type == "loan":
-        # Кредит: проверить капитал банка
-        from config import config
-        capital_result = await db.execute(
-            select(BankCapital).where(BankCapital.bank_code == config.BANK_CODE)
-        )
-        capital = capital_result.scalar_one_or_none()
+        # Кредит: проверить капитал банка (с учетом еще не перенесенных изменений)
+        capital = await CapitalService.current(db)
         
-        if capital and capital.capital < Decimal(str(request.amount)):
+        if capital is not None and capital < Decimal(str(request.amount)):
             raise HTTPException(400, "Insufficient bank capital for loan")
         
         # Создать кредитный счет
@@ -238,9 +236,13 @@ async def create_agreement(
         account_id = loan_account.id
         
         # Уменьшить капитал банка
-        if capital:
-            capital.capital -= Decimal(str(request.amount))
-            capital.total_loans += Decimal(str(request.amount))
+        CapitalService.record(
+            db,
+            -Decimal(str(request.amount)),
+            reason=f"Loan issued: {agreement_id}",
+            reference=agreement_id,
+            loans_change=Decimal(str(request.amount))
+        )
         
     elif product.product_type in ["card", "credit_card"]:
         # ⚠️ ВАЖНО: Теперь карты НЕ создают отдельный счет!
@@ -437,14 +439,15 @@ async def close_agreement(
         if not repayment_account:
             raise HTTPException(404, "Repayment account not found")
         
-        debt = loan_account.balance
+        # Заблокировать оба счета и взять актуальную задолженность
+        balances = await LedgerService.lock_accounts(db, [repayment_account.id, loan_account.id])
+        debt = balances[loan_account.id]
         
-        if repayment_account.balance < debt:
-            raise HTTPException(400, f"Insufficient funds for repayment. Available: {repayment_account.balance}, Required: {debt}")
+        if balances[repayment_account.id] < debt:
+            raise HTTPException(400, f"Insufficient funds for repayment. Available: {balances[repayment_account.id]}, Required: {debt}")
         
-        # Погасить кредит
-        repayment_account.balance -= debt
-        loan_account.balance = Decimal("0")
+        # Погасить кредит: списать со счета погашения и обнулить кредитный счет
+        await LedgerService.post(db, {repayment_account.id: -debt, loan_account.id: -debt})
         
         # Создать транзакции
         debit_tx = Transaction(
@@ -468,14 +471,13 @@ async def close_agreement(
         db.add(credit_tx)
         
         # Увеличить капитал банка (вернуть выданный кредит)
-        from config import config
-        capital_result = await db.execute(
-            select(BankCapital).where(BankCapital.bank_code == config.BANK_CODE)
+        CapitalService.record(
+            db,
+            debt,
+            reason=f"Loan repaid: {agreement.agreement_id}",
+            reference=agreement.agreement_id,
+            loans_change=-debt
         )
-        capital = capital_result.scalar_one_or_none()
-        if capital:
-            capital.capital += debt
-            capital.total_loans -= debt
     
     # Закрыть договор
     agreement.status = "closed"
@@ -7,6 +7,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from database import get_db
+from responses import fast_json
 from models import Product
 from services.auth_service import require_any_token
 
@@ -36,7 +37,7 @@ async def get_products(
     result = await db.execute(query)
     products = result.scalars().all()
     
-    return {
+    return fast_json({
         "data": {
             "product": [
                 {
@@ -52,7 +53,7 @@ async def get_products(
                 for p in products
             ]
         }
-    }
+    })
 
 
 @router.get("/{product_id}", summary="Получить продукт")
@@ -14,6 +14,7 @@ import uuid
 from database import get_db
 from models import VRPConsent, Account, Client
 from services.auth_service import require_client
+from services.consent_service import ConsentService
 
 router = APIRouter(
     prefix="/vrp-consents",
@@ -270,6 +271,7 @@ async def delete_vrp_consent(
     consent.revoked_at = datetime.utcnow()
     
     await db.commit()
+    ConsentService.invalidate_consent_owner(consent_id)
     
     return {
         "data": {
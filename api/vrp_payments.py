@@ -14,6 +14,7 @@ import uuid
 from database import get_db
 from models import VRPPayment, VRPConsent, Account, Transaction
 from services.auth_service import require_client
+from services.ledger import LedgerService, InsufficientFundsError
 
 router = APIRouter(
     prefix="/domestic-vrp-payments",
@@ -86,18 +87,14 @@ async def create_vrp_payment(
             f"Amount {amount} exceeds max individual amount {consent.max_individual_amount}"
         )
     
-    # Проверить баланс
-    if account.balance < amount:
-        raise HTTPException(
-            400,
-            f"Insufficient funds. Available: {account.balance}, Required: {amount}"
-        )
-    
     # Создать платеж
     payment_id = f"vrp-pay-{uuid.uuid4().hex[:12]}"
     
-    # Списать со счета
-    account.balance -= amount
+    # Списать со счета (атомарно, с проверкой баланса)
+    try:
+        await LedgerService.debit(db, account.id, amount)
+    except InsufficientFundsError as e:
+        raise HTTPException(400, str(e))
     
     # Создать транзакцию
     transaction = Transaction(
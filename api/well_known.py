@@ -2,15 +2,18 @@
 Well-Known endpoints - JWKS
 OpenID Connect Discovery compatible
 """
-from fastapi import APIRouter
-from pathlib import Path
-import json
+from fastapi import APIRouter, Header, Response
+from typing import Optional
+
+from services.key_ring import key_ring
 
 router = APIRouter(prefix="/.well-known", tags=["Technical: Well-Known"])
 
 
 @router.get("/jwks.json", summary="Получить публичные ключи (JWKS)")
-async def get_jwks():
+async def get_jwks(
+    if_none_match: Optional[str] = Header(None, alias="if-none-match")
+):
     """
     JWKS endpoint - публичные ключи банка
     
@@ -19,31 +22,14 @@ async def get_jwks():
     
     Используется другими банками для проверки JWT подписей
     при межбанковских запросах.
-    """
-    from config import config
-    
-    # Путь к JWKS файлу банка
-    jwks_path = Path(__file__).parent.parent.parent.parent / "shared" / "keys" / f"{config.BANK_CODE}_jwks.json"
     
-    # Базовый JWKS если файла нет
-    default_jwks = {
-        "keys": [{
-            "kid": f"{config.BANK_CODE}-2025",
-            "kty": "RSA",
-            "use": "sig",
-            "alg": "RS256",
-            "n": "placeholder_modulus",
-            "e": "AQAB"
-        }]
-    }
+    Тело заранее сериализовано в key ring (перечитывается при ротации ключей),
+    поддерживается условный запрос по ETag.
+    """
+    etag = key_ring.jwks_etag()
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=300"}
     
-    # Загрузить из файла если есть
-    if jwks_path.exists():
-        try:
-            with open(jwks_path, 'r') as f:
-                return json.load(f)
-        except:
-            pass
+    if if_none_match == etag:
+        return Response(status_code=304, headers=headers)
     
-    return default_jwks
-
+    return Response(content=key_ring.jwks_body(), media_type="application/json", headers=headers)
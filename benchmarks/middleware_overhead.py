@@ -0,0 +1,99 @@
+"""
+Накладные расходы middleware логирования API (запросов в секунду)
+
+Сравнивает одно и то же приложение:
+- без middleware
+- с APILoggingMiddleware (чистый ASGI, middleware.py)
+- с тем же логированием поверх BaseHTTPMiddleware (как было раньше)
+
+Запросы подаются прямо в ASGI приложение, без сети и сервера: разница между
+вариантами - только цена middleware. /health - служебный путь (не логируется),
+/accounts - обычный; вместо эндпоинтов заглушки без БД, очередь логов не запущена.
+
+Запуск из корня репозитория:
+    python benchmarks/middleware_overhead.py [requests]
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from starlette.applications import Starlette
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from middleware import SKIP_PATHS, APILoggingMiddleware
+
+
+async def accounts(request):
+    return JSONResponse({"data": {"account": [{"accountId": str(i), "status": "Enabled"} for i in range(10)]}})
+
+
+async def health(request):
+    return JSONResponse({"status": "healthy"})
+
+
+def _app() -> Starlette:
+    return Starlette(routes=[Route("/accounts", accounts), Route("/health", health)])
+
+
+class BaseHTTPLoggingMiddleware(BaseHTTPMiddleware):
+    """Логирование через BaseHTTPMiddleware: ответ оборачивается в задачу и memory stream"""
+
+    def __init__(self, app):
+        super().__init__(app)
+        self._logger = APILoggingMiddleware(app)
+
+    async def dispatch(self, request, call_next):
+        if request.url.path.startswith(SKIP_PATHS):
+            return await call_next(request)
+
+        start_time = time.perf_counter()
+        response = await call_next(request)
+        response_time_ms = int((time.perf_counter() - start_time) * 1000)
+        await self._logger._log_request(request, response.status_code, response_time_ms)
+        return response
+
+
+async def _requests_per_second(app, path: str, requests: int) -> float:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"bench"), (b"user-agent", b"bench")],
+        "server": ("bench", 80), "client": ("127.0.0.1", 50000)
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    for _ in range(min(requests // 10, 500)):
+        await app(dict(scope), receive, send)  # Прогрев
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return requests / (time.perf_counter() - start)
+
+
+async def main(requests: int):
+    variants = {
+        "no middleware": _app(),
+        "pure ASGI (APILoggingMiddleware)": APILoggingMiddleware(_app()),
+        "BaseHTTPMiddleware": BaseHTTPLoggingMiddleware(_app())
+    }
+
+    for path in ("/accounts", "/health"):
+        print(f"{path} ({requests} requests)")
+        for name, app in variants.items():
+            rps = await _requests_per_second(app, path, requests)
+            print(f"  {name:<34} {rps:>10.0f} req/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000))
@@ -0,0 +1,100 @@
+"""
+Сериализация страницы транзакций: стандартный путь FastAPI против fast_json
+
+- jsonable_encoder + JSONResponse (stdlib json) - как FastAPI отдает dict
+- FastJSONResponse без orjson (stdlib json, без jsonable_encoder)
+- FastJSONResponse с orjson (responses.py)
+
+Страница - ROWS транзакций в формате /accounts/{id}/transactions, собранная
+_serialize_transaction из объектов Transaction без БД.
+
+Запуск из корня репозитория:
+    python benchmarks/serialization.py [rows] [repeats]
+"""
+import importlib
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT.parent))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import responses
+from models import Transaction
+from responses import FastJSONResponse
+
+# api/accounts.py импортирует модули относительно пакета репозитория (как main.py)
+accounts_api = importlib.import_module(f"{ROOT.name}.api.accounts")
+
+
+def _page(rows: int) -> dict:
+    merchant = {"merchantId": "m-1", "name": "Кофейня", "mccCode": "5814", "category": "restaurants"}
+    card = {"cardId": "card-1", "cardNumber": "4111 **** **** 1111"}
+    start = datetime(2025, 3, 1, 12, 0)
+
+    transactions = []
+    for i in range(rows):
+        moment = start + timedelta(minutes=i)
+        tx = Transaction(
+            id=i, account_id=1, transaction_id=f"tx-{i:06d}", amount=Decimal("1234.50"),
+            currency="RUB", direction="credit" if i % 2 else "debit", status="completed",
+            description=f"Перевод №{i}", transaction_city="Москва", transaction_country="RU",
+            transaction_date=moment, booking_date=moment
+        )
+        transactions.append(accounts_api._serialize_transaction(tx, 1, merchant, card))
+
+    return {
+        "data": {"transaction": transactions},
+        "links": {"self": f"/accounts/acc-1/transactions?limit={rows}"},
+        "meta": {"pageSize": rows}
+    }
+
+
+def _measure(render, repeats: int) -> float:
+    """Среднее время одного ответа, мс"""
+    render()  # Прогрев
+    start = time.perf_counter()
+    for _ in range(repeats):
+        render()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main(rows: int, repeats: int):
+    page = _page(rows)
+    orjson = responses.orjson
+
+    def standard():
+        return JSONResponse(jsonable_encoder(page)).body
+
+    def fast_stdlib():
+        responses.orjson = None
+        try:
+            return FastJSONResponse(page).body
+        finally:
+            responses.orjson = orjson
+
+    def fast_orjson():
+        return FastJSONResponse(page).body
+
+    print(f"{rows} transactions, {len(standard())} bytes, {repeats} repeats")
+    baseline = _measure(standard, repeats)
+    print(f"  {'jsonable_encoder + json':<26} {baseline:>8.2f} ms")
+    for name, render in (("fast_json, stdlib json", fast_stdlib), ("fast_json, orjson", fast_orjson)):
+        if render is fast_orjson and orjson is None:
+            print(f"  {name:<26} orjson not installed")
+            continue
+        elapsed = _measure(render, repeats)
+        print(f"  {name:<26} {elapsed:>8.2f} ms  (x{baseline / elapsed:.1f})")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 500,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    )
@@ -12,9 +12,22 @@ from pathlib import Path
 try:
     # Попытка относительного импорта (для пакетного режима)
     from .config import config
-    from .database import engine
+    from .database import engine, read_engine, check_pool_capacity, replica_monitor
+    from .migrations import run_migrations
     from .models import Base
     from .middleware import APILoggingMiddleware
+    from .services.api_log_queue import api_log_queue
+    from .services.api_log_maintenance import api_log_maintenance
+    from .services.directory_sync import directory_sync
+    from .services.key_ring import key_ring
+    from .services.http_clients import bank_http_clients
+    from .services.account_routing import account_directory
+    from .services.interbank_dispatcher import interbank_dispatcher
+    from .services.hot_accounts import hot_account_compactor
+    from .services.capital import capital_aggregator
+    from .services.dimensions import dimension_cache
+    from .services.bank_stats import bank_stats
+    from .services.events import event_bus
     from .api import (
         accounts, auth, consents, payments, admin, products, well_known, 
         banker, product_agreements, product_agreement_consents,
@@ -24,9 +37,22 @@ try:
 except ImportError:
     # Абсолютный импорт (для прямого запуска)
     from config import config
-    from database import engine
+    from database import engine, read_engine, check_pool_capacity, replica_monitor
+    from migrations import run_migrations
     from models import Base
     from middleware import APILoggingMiddleware
+    from services.api_log_queue import api_log_queue
+    from services.api_log_maintenance import api_log_maintenance
+    from services.directory_sync import directory_sync
+    from services.key_ring import key_ring
+    from services.http_clients import bank_http_clients
+    from services.account_routing import account_directory
+    from services.interbank_dispatcher import interbank_dispatcher
+    from services.hot_accounts import hot_account_compactor
+    from services.capital import capital_aggregator
+    from services.dimensions import dimension_cache
+    from services.bank_stats import bank_stats
+    from services.events import event_bus
     from api import (
         accounts, auth, consents, payments, admin, products, well_known, 
         banker, product_agreements, product_agreement_consents,
@@ -46,11 +72,71 @@ async def lifespan(app: FastAPI):
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
     
+    # Новые колонки и индексы существующих таблиц
+    await run_migrations(engine)
+    
+    # Размер пула vs max_connections сервера
+    try:
+        await check_pool_capacity()
+    except Exception as e:
+        print(f"⚠️  Failed to check DB pool capacity: {e}")
+    
+    # Реплика для чтения (если задана DATABASE_READ_URL): контроль отставания
+    await replica_monitor.start()
+    
+    # Партиции api_calls_log (до первой записи логов) и поминутные агрегаты
+    await api_log_maintenance.start()
+    
+    # Фоновая запись логов API
+    await api_log_queue.start()
+    
+    # Отправка логов API в реестр
+    await directory_sync.start()
+    
+    # RSA ключи (подпись bank-токенов, JWKS)
+    await key_ring.start()
+    
+    # Справочник счетов других банков
+    await account_directory.start()
+    
+    # Отправка межбанковских переводов из outbox
+    await interbank_dispatcher.start()
+    
+    # Перенос отложенных зачислений горячих счетов
+    await hot_account_compactor.start()
+    
+    # Перенос журнала изменений капитала в bank_capital
+    await capital_aggregator.start()
+    
+    # Кэш мерчантов и карт для истории транзакций
+    await dimension_cache.start()
+    
+    # Счетчики для /admin/stats
+    await bank_stats.start()
+    
+    # Лента мониторинга (SSE)
+    await event_bus.start()
+    
     yield
     
     # Shutdown
     print(f"🛑 Stopping {config.BANK_NAME}")
+    await interbank_dispatcher.stop()
+    await directory_sync.stop()
+    await hot_account_compactor.stop()
+    await capital_aggregator.stop()
+    await dimension_cache.stop()
+    await bank_stats.stop()
+    await event_bus.stop()
+    await account_directory.stop()
+    await key_ring.stop()
+    await bank_http_clients.close()
+    await api_log_queue.stop()
+    await api_log_maintenance.stop()
+    await replica_monitor.stop()
     await engine.dispose()
+    if read_engine is not None:
+        await read_engine.dispose()
 
 
 # Create FastAPI app
@@ -1,267 +1,218 @@
 """
 Middleware для логирования API calls
 """
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from jose import jwt
+import re
 import time
 from datetime import datetime
 
 try:
-    from .database import get_db
-    from .models import APICallLog
+    from .database import AsyncSessionLocal
+    from .services.api_log_queue import api_log_queue
+    from .services.consent_service import ConsentService
 except ImportError:
-    from database import get_db
-    from models import APICallLog
+    from database import AsyncSessionLocal
+    from services.api_log_queue import api_log_queue
+    from services.consent_service import ConsentService
 
 
-class APILoggingMiddleware(BaseHTTPMiddleware):
+# Служебные endpoints - не логируются
+SKIP_PATHS = (
+    "/docs",
+    "/openapi.json",
+    "/health",
+    "/static/",
+    "/favicon.ico",
+    "/.well-known/",
+    "/admin/api-calls"  # Не логируем запрос самих логов
+)
+
+# team200-1, team200-2 -> team200
+TEAM_PERSON_RE = re.compile(r'(team\d+)-\d+')
+
+
+class APILoggingMiddleware:
     """
     Логирование всех API запросов
-    
-    Сохраняет в БД информацию о каждом запросе для аналитики
+
+    Чистый ASGI middleware: не оборачивает ответ (в отличие от BaseHTTPMiddleware),
+    а только подсматривает в сообщение http.response.start, откуда берет
+    статус и время ответа. Тело ответа проходит без буферизации.
     """
-    
-    async def dispatch(self, request: Request, call_next):
-        # Пропускаем служебные endpoints
-        skip_paths = [
-            "/docs",
-            "/openapi.json",
-            "/health",
-            "/static/",
-            "/favicon.ico",
-            "/.well-known/",
-            "/admin/api-calls"  # Не логируем запрос самих логов
-        ]
-        
-        should_skip = any(request.url.path.startswith(path) for path in skip_paths)
-        
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"].startswith(SKIP_PATHS):
+            await self.app(scope, receive, send)
+            return
+
         # Замер времени
-        start_time = time.time()
-        
-        # Выполнить запрос
-        response = await call_next(request)
-        
-        # Вычислить время ответа
-        response_time_ms = int((time.time() - start_time) * 1000)
-        
-        # Логировать если не пропускается
-        if not should_skip:
-            # Определить caller
-            caller_id = "anonymous"
-            caller_type = "external"
-            person_id = None  # Сохраним конкретный person_id для деталей
-            
-            # 1. Попробовать извлечь из JWT token
-            auth_header = request.headers.get("Authorization", "")
-            if "Bearer" in auth_header:
-                try:
-                    import jwt
-                    import re
-                    token = auth_header.replace("Bearer ", "")
-                    # Декодировать без проверки (только для логирования)
-                    decoded = jwt.decode(token, options={"verify_signature": False})
-                    
-                    # Извлечь caller_id из разных полей
-                    if "sub" in decoded:
-                        sub_value = decoded["sub"]
-                        person_id = sub_value  # Сохраняем оригинальный person_id
-                        
-                        # Если это team200-1, team200-2, etc - извлечь team ID
-                        match = re.match(r'(team\d+)-\d+', str(sub_value))
-                        if match:
-                            caller_id = match.group(1)  # team200
-                            caller_type = "team"
-                        elif "client-" in str(sub_value):
-                            caller_id = sub_value
-                            caller_type = "client"
-                        elif str(sub_value).startswith("team"):
-                            # Уже в формате team200 (без суффикса)
-                            caller_id = sub_value
-                            caller_type = "team"
-                        else:
-                            caller_id = sub_value
-                            caller_type = "client"
-                    elif "client_id" in decoded:
-                        caller_id = decoded["client_id"]
-                        caller_type = "team"
-                        person_id = caller_id
-                except Exception as e:
-                    # Debug: логировать ошибки декодирования Authorization header
-                    print(f"⚠️  Authorization header decode error: {e}")
-            
-            # 2. Попробовать извлечь из Cookie (session)
-            if caller_id == "anonymous":
-                cookie_header = request.headers.get("Cookie", "")
-                if "session_token=" in cookie_header or "access_token=" in cookie_header:
-                    try:
-                        import re
-                        # Попытка извлечь из cookie
-                        cookies = {}
-                        for item in cookie_header.split(';'):
-                            if '=' in item:
-                                key, val = item.strip().split('=', 1)
-                                cookies[key] = val
-                        
-                        # Попробовать декодировать JWT из cookie
-                        token = cookies.get('session_token') or cookies.get('access_token')
-                        if token:
-                            decoded = jwt.decode(token, options={"verify_signature": False})
-                            
-                            if "sub" in decoded:
-                                sub_value = decoded["sub"]
-                                person_id = sub_value  # Сохраняем оригинальный person_id
-                                
-                                # Если это team200-1, team200-2, etc - извлечь team ID
-                                match = re.match(r'(team\d+)-\d+', str(sub_value))
-                                if match:
-                                    caller_id = match.group(1)  # team200
-                                    caller_type = "team"
-                                elif "client-" in str(sub_value):
-                                    caller_id = sub_value
-                                    caller_type = "client"
-                                elif str(sub_value).startswith("team"):
-                                    caller_id = sub_value
-                                    caller_type = "team"
-                                else:
-                                    caller_id = sub_value
-                                    caller_type = "client"
-                    except Exception as e:
-                        # Debug: логировать ошибки декодирования
-                        print(f"⚠️  Cookie decode error: {e}")
-            
-            # 3. Попробовать извлечь из X-Consent-ID (межбанковские запросы)
-            if caller_id == "anonymous":
-                consent_id = request.headers.get("X-Consent-ID") or request.headers.get("x-consent-id")
-                if consent_id:
-                    try:
-                        from sqlalchemy import select
-                        import re
-                        try:
-                            from .models import Consent, PaymentConsent, ProductAgreementConsent, VRPConsent, Client
-                        except ImportError:
-                            from models import Consent, PaymentConsent, ProductAgreementConsent, VRPConsent, Client
-                        
-                        # Попробовать найти согласие в БД
-                        async for db in get_db():
-                            # Проверить все типы согласий
-                            consent = None
-                            client_id = None
-                            
-                            # 1. Account Consent
-                            stmt = select(Consent).where(Consent.consent_id == consent_id)
-                            result = await db.execute(stmt)
-                            consent = result.scalar_one_or_none()
-                            if consent:
-                                client_id = consent.client_id
-                            
-                            # 2. Payment Consent
-                            if not consent:
-                                stmt = select(PaymentConsent).where(PaymentConsent.consent_id == consent_id)
-                                result = await db.execute(stmt)
-                                consent = result.scalar_one_or_none()
-                                if consent:
-                                    client_id = consent.client_id
-                            
-                            # 3. Product Agreement Consent
-                            if not consent:
-                                stmt = select(ProductAgreementConsent).where(ProductAgreementConsent.consent_id == consent_id)
-                                result = await db.execute(stmt)
-                                consent = result.scalar_one_or_none()
-                                if consent:
-                                    client_id = consent.client_id
-                            
-                            # 4. VRP Consent
-                            if not consent:
-                                stmt = select(VRPConsent).where(VRPConsent.consent_id == consent_id)
-                                result = await db.execute(stmt)
-                                consent = result.scalar_one_or_none()
-                                if consent:
-                                    client_id = consent.client_id
-                            
-                            # Если нашли client_id - найти person_id
-                            if client_id:
-                                stmt = select(Client).where(Client.id == client_id)
-                                result = await db.execute(stmt)
-                                client = result.scalar_one_or_none()
-                                if client and client.person_id:
-                                    person_id = client.person_id
-                                    
-                                    # Извлечь team ID из person_id (team200-1 -> team200)
-                                    match = re.match(r'(team\d+)-\d+', str(person_id))
-                                    if match:
-                                        caller_id = match.group(1)  # team200
-                                        caller_type = "team-interbank"
-                                    elif str(person_id).startswith("team"):
-                                        caller_id = person_id
-                                        caller_type = "team-interbank"
-                                    else:
-                                        caller_id = person_id
-                                        caller_type = "interbank"
-                            
-                            break
-                    except Exception as e:
-                        # Debug: логировать ошибки извлечения consent
-                        print(f"⚠️  Consent ID extraction error: {e}")
-            
-            # 4. Попробовать извлечь из query параметров (для /auth/bank-token)
-            if caller_id == "anonymous":
-                query_params = dict(request.query_params)
-                if "client_id" in query_params:
-                    import re
-                    client_id_value = query_params["client_id"]
-                    person_id = client_id_value  # Сохраняем полный person_id (team200-1)
-                    
-                    # Извлечь team ID (team200-1 -> team200)
-                    match = re.match(r'(team\d+)-\d+', str(client_id_value))
-                    if match:
-                        caller_id = match.group(1)  # team200
-                        caller_type = "team"
-                    elif str(client_id_value).startswith("team"):
-                        # Уже в формате team200 (без суффикса)
-                        caller_id = client_id_value
-                        caller_type = "team"
-                        person_id = client_id_value  # Используем как есть
-                    else:
-                        caller_id = client_id_value
-                        caller_type = "client"
-            
-            # 5. Проверить User-Agent для известных ботов/сканеров
-            user_agent = request.headers.get("User-Agent", "")
-            if caller_id == "anonymous":
-                if "YandexBot" in user_agent:
-                    caller_id = "yandex-bot"
-                    caller_type = "bot"
-                elif "ApiSecurityAnalyzer" in user_agent:
-                    caller_id = "security-scanner"
-                    caller_type = "scanner"
-                elif "Postman" in user_agent:
-                    caller_id = "postman-test"
-                    caller_type = "testing"
-            
-            # Сохранить в БД асинхронно (не блокируя ответ)
+        start_time = time.perf_counter()
+        status_code = 500
+        response_time_ms = None
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code, response_time_ms
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                response_time_ms = int((time.perf_counter() - start_time) * 1000)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if response_time_ms is None:
+                # Ответ не начался (исключение в приложении)
+                response_time_ms = int((time.perf_counter() - start_time) * 1000)
+
             try:
-                async for db in get_db():
-                    log_entry = APICallLog(
-                        caller_id=caller_id,
-                        caller_type=caller_type,
-                        person_id=person_id,  # Конкретный пользователь (team200-1)
-                        endpoint=request.url.path,
-                        method=request.method,
-                        status_code=response.status_code,
-                        response_time_ms=response_time_ms,
-                        ip_address=request.client.host if request.client else None,
-                        user_agent=request.headers.get("User-Agent", "")[:500],
-                        created_at=datetime.utcnow(),
-                        synced_to_directory=False
-                    )
-                    
-                    db.add(log_entry)
-                    await db.commit()
-                    break
+                await self._log_request(Request(scope), status_code, response_time_ms)
             except Exception as e:
                 # Не ломаем запрос если логирование не удалось
                 print(f"⚠️  Failed to log API call: {e}")
-        
-        return response
 
+    async def _log_request(self, request: Request, status_code: int, response_time_ms: int):
+        """Определить caller и поставить запись в очередь логов"""
+        caller_id, caller_type, person_id = await self._identify_caller(request)
+
+        # Поставить в очередь - в БД запишет фоновый writer пачкой
+        api_log_queue.put({
+            "caller_id": caller_id,
+            "caller_type": caller_type,
+            "person_id": person_id,  # Конкретный пользователь (team200-1)
+            "endpoint": request.url.path[:500],
+            "method": request.method,
+            "status_code": status_code,
+            "response_time_ms": response_time_ms,
+            "ip_address": request.client.host if request.client else None,
+            "user_agent": request.headers.get("User-Agent", "")[:500],
+            "created_at": datetime.utcnow(),
+            "synced_to_directory": False
+        })
+
+    async def _identify_caller(self, request: Request):
+        """
+        Определить caller запроса
+
+        Returns:
+            (caller_id, caller_type, person_id)
+        """
+        # 0. Claims, уже проверенные auth-зависимостью этого запроса
+        claims = getattr(request.state, "auth_claims", None)
+        if claims:
+            caller = _caller_from_claims(claims)
+            if caller:
+                return caller
+
+        # 1. Попробовать извлечь из JWT token (endpoint без auth-зависимости)
+        auth_header = request.headers.get("Authorization", "")
+        if not claims and "Bearer" in auth_header:
+            try:
+                token = auth_header.replace("Bearer ", "")
+                # Декодировать без проверки (только для логирования)
+                caller = _caller_from_claims(jwt.get_unverified_claims(token))
+                if caller:
+                    return caller
+            except Exception as e:
+                # Debug: логировать ошибки декодирования Authorization header
+                print(f"⚠️  Authorization header decode error: {e}")
+
+        # 2. Попробовать извлечь из Cookie (session)
+        token = request.cookies.get("session_token") or request.cookies.get("access_token")
+        if token:
+            try:
+                decoded = jwt.get_unverified_claims(token)
+                if "sub" in decoded:
+                    return _caller_from_subject(decoded["sub"])
+            except Exception as e:
+                # Debug: логировать ошибки декодирования
+                print(f"⚠️  Cookie decode error: {e}")
+
+        # 3. Попробовать извлечь из X-Consent-ID (межбанковские запросы)
+        consent_id = request.headers.get("X-Consent-ID")
+        if consent_id:
+            try:
+                caller = await self._caller_from_consent(consent_id)
+                if caller:
+                    return caller
+            except Exception as e:
+                # Debug: логировать ошибки извлечения consent
+                print(f"⚠️  Consent ID extraction error: {e}")
+
+        # 4. Попробовать извлечь из query параметров (для /auth/bank-token)
+        client_id_value = request.query_params.get("client_id")
+        if client_id_value:
+            # Извлечь team ID (team200-1 -> team200)
+            match = TEAM_PERSON_RE.match(client_id_value)
+            if match:
+                return match.group(1), "team", client_id_value
+            elif client_id_value.startswith("team"):
+                # Уже в формате team200 (без суффикса)
+                return client_id_value, "team", client_id_value
+            else:
+                return client_id_value, "client", client_id_value
+
+        # 5. Проверить User-Agent для известных ботов/сканеров
+        user_agent = request.headers.get("User-Agent", "")
+        if "YandexBot" in user_agent:
+            return "yandex-bot", "bot", None
+        elif "ApiSecurityAnalyzer" in user_agent:
+            return "security-scanner", "scanner", None
+        elif "Postman" in user_agent:
+            return "postman-test", "testing", None
+
+        return "anonymous", "external", None
+
+    async def _caller_from_consent(self, consent_id: str):
+        """Найти клиента по согласию любого типа (с кэшем, см. ConsentService)"""
+        # Сессия не берет соединение из пула, пока нет запроса - попадание в кэш бесплатно
+        async with AsyncSessionLocal() as db:
+            person_id = await ConsentService.get_consent_owner(db, consent_id)
+
+        if not person_id:
+            return None
+
+        return _interbank_caller(person_id)
+
+
+def _caller_from_claims(decoded: dict):
+    """Caller по claims токена или None, если в токене нет subject"""
+    # Извлечь caller_id из разных полей
+    if "sub" in decoded:
+        return _caller_from_subject(decoded["sub"])
+    elif "client_id" in decoded:
+        return decoded["client_id"], "team", decoded["client_id"]
+    return None
+
+
+def _caller_from_subject(sub_value):
+    """Caller по полю sub токена: (caller_id, caller_type, person_id)"""
+    sub_value = str(sub_value)
+
+    # Если это team200-1, team200-2, etc - извлечь team ID
+    match = TEAM_PERSON_RE.match(sub_value)
+    if match:
+        return match.group(1), "team", sub_value
+    elif "client-" in sub_value:
+        return sub_value, "client", sub_value
+    elif sub_value.startswith("team"):
+        # Уже в формате team200 (без суффикса)
+        return sub_value, "team", sub_value
+    else:
+        return sub_value, "client", sub_value
+
+
+def _interbank_caller(person_id: str):
+    """Caller межбанкового запроса по person_id клиента из согласия"""
+    # Извлечь team ID из person_id (team200-1 -> team200)
+    match = TEAM_PERSON_RE.match(str(person_id))
+    if match:
+        return match.group(1), "team-interbank", person_id
+    elif str(person_id).startswith("team"):
+        return person_id, "team-interbank", person_id
+    else:
+        return person_id, "interbank", person_id
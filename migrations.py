@@ -0,0 +1,192 @@
+"""
+Миграции схемы БД
+
+`Base.metadata.create_all` создает только отсутствующие таблицы (и их индексы):
+новые колонки и индексы существующих таблиц добавляются здесь. Миграции
+применяются при старте приложения (lifespan) по порядку версий; примененные
+версии записываются в schema_migrations.
+
+Миграция с `transactional=False` выполняется вне транзакции (autocommit) -
+например, для CREATE INDEX CONCURRENTLY на больших таблицах без блокировки
+записи. Поэтому все ее операторы должны быть идемпотентными (IF NOT EXISTS).
+"""
+import logging
+from dataclasses import dataclass
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+# Ключ advisory lock: несколько экземпляров приложения не применяют миграции одновременно
+MIGRATIONS_LOCK_ID = 815_001
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    statements: List[str]
+    transactional: bool = True
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(
+        version=1,
+        description="transactions.booking_date: колонка и заполнение из transaction_date",
+        statements=[
+            # Без DEFAULT: иначе ADD COLUMN заполнит все строки значением NOW() и UPDATE ниже ничего не найдет
+            "ALTER TABLE transactions ADD COLUMN IF NOT EXISTS booking_date TIMESTAMP",
+            "UPDATE transactions SET booking_date = COALESCE(transaction_date, created_at, NOW()) WHERE booking_date IS NULL",
+            "ALTER TABLE transactions ALTER COLUMN booking_date SET DEFAULT NOW()",
+            "ALTER TABLE transactions ALTER COLUMN booking_date SET NOT NULL",
+        ]
+    ),
+    Migration(
+        version=2,
+        description="transactions: индекс (account_id, booking_date DESC, id DESC) для истории по счету",
+        statements=[
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_transactions_account_booking "
+            "ON transactions (account_id, booking_date DESC, id DESC)",
+            "DROP INDEX CONCURRENTLY IF EXISTS idx_transactions_account_date",
+        ],
+        transactional=False
+    ),
+    Migration(
+        version=3,
+        description="bank_stats_mv: счетчики для /admin/stats (обновляет services/bank_stats.py)",
+        statements=[
+            """
+            CREATE MATERIALIZED VIEW IF NOT EXISTS bank_stats_mv AS
+            SELECT
+                1 AS id,
+                (SELECT count(*) FROM payments) AS payments_count,
+                (SELECT count(*) FROM accounts) AS accounts_count,
+                (SELECT count(*) FROM clients) AS clients_count,
+                (SELECT COALESCE(sum(balance), 0) FROM accounts)
+                    + (SELECT COALESCE(sum(amount), 0) FROM account_pending_credits) AS total_balance,
+                (now() AT TIME ZONE 'UTC') AS refreshed_at
+            """,
+            # Уникальный индекс нужен для REFRESH ... CONCURRENTLY (чтение не блокируется)
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_bank_stats_mv_id ON bank_stats_mv (id)",
+        ]
+    ),
+    Migration(
+        version=4,
+        description="индексы горячих запросов: согласия, FK по клиенту/счету, clients.person_id LIKE, api_calls_log",
+        statements=[
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_consents_active_lookup "
+            "ON consents (client_id, granted_to, expiration_date_time) WHERE status = 'active'",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_accounts_client_id ON accounts (client_id)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_cards_account_id ON cards (account_id)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_product_agreements_client_id ON product_agreements (client_id)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_notifications_client_id ON notifications (client_id)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_clients_person_id_pattern "
+            "ON clients (person_id varchar_pattern_ops)",
+            # Для партиционированной api_calls_log (новая БД - create_all, миграция 5)
+            # CONCURRENTLY недопустим, а индекс уже создан вместе с таблицей.
+            # Старую таблицу все равно переписывает миграция 5 - обычный CREATE INDEX.
+            # ix_api_calls_log_created_at покрыт новым индексом (created_at - первая колонка)
+            """
+            DO $$
+            BEGIN
+                IF NOT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'api_calls_log'::regclass) THEN
+                    CREATE INDEX IF NOT EXISTS idx_api_calls_log_created_caller ON api_calls_log (created_at, caller_id);
+                    DROP INDEX IF EXISTS ix_api_calls_log_created_at;
+                END IF;
+            END $$
+            """,
+        ],
+        transactional=False
+    ),
+    Migration(
+        version=5,
+        description="api_calls_log: партиционирование по дням (created_at), старые строки - партиция legacy",
+        statements=[
+            # В новой БД create_all уже создал партиционированную таблицу - тогда ничего не делаем.
+            # Иначе: старая таблица становится партицией до конца последнего дня с ее строками
+            # (уйдет по сроку хранения), последовательность id переходит новой таблице;
+            # дневные партиции после нее и DEFAULT создает services/api_log_maintenance.py
+            """
+            DO $$
+            DECLARE
+                today TIMESTAMP := date_trunc('day', now() AT TIME ZONE 'UTC');
+                legacy_until TIMESTAMP;
+            BEGIN
+                IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'api_calls_log'::regclass) THEN
+                    RETURN;
+                END IF;
+
+                ALTER TABLE api_calls_log RENAME TO api_calls_log_legacy;
+                -- Партиция не может иметь свой первичный ключ: (id, created_at) построится при ATTACH
+                ALTER TABLE api_calls_log_legacy DROP CONSTRAINT api_calls_log_pkey;
+                ALTER INDEX IF EXISTS idx_api_calls_log_created_caller RENAME TO idx_api_calls_log_legacy_created_caller;
+
+                CREATE TABLE api_calls_log (LIKE api_calls_log_legacy INCLUDING DEFAULTS)
+                    PARTITION BY RANGE (created_at);
+                ALTER TABLE api_calls_log ALTER COLUMN created_at SET NOT NULL;
+                ALTER TABLE api_calls_log ADD PRIMARY KEY (id, created_at);
+                ALTER SEQUENCE api_calls_log_id_seq OWNED BY api_calls_log.id;
+                CREATE INDEX idx_api_calls_log_created_caller ON api_calls_log (created_at, caller_id);
+
+                UPDATE api_calls_log_legacy SET created_at = today WHERE created_at IS NULL;
+                ALTER TABLE api_calls_log_legacy ALTER COLUMN created_at SET NOT NULL;
+                SELECT COALESCE(date_trunc('day', max(created_at)) + interval '1 day', today)
+                    INTO legacy_until FROM api_calls_log_legacy;
+                EXECUTE format(
+                    'ALTER TABLE api_calls_log ATTACH PARTITION api_calls_log_legacy FOR VALUES FROM (MINVALUE) TO (%L)',
+                    legacy_until
+                );
+
+                CREATE TABLE IF NOT EXISTS api_calls_log_default PARTITION OF api_calls_log DEFAULT;
+            END $$
+            """,
+        ]
+    ),
+]
+
+
+async def run_migrations(engine: AsyncEngine):
+    """Применить все не примененные миграции (вызывается из lifespan после create_all)"""
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+
+        await conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                description TEXT,
+                applied_at TIMESTAMP DEFAULT NOW()
+            )
+        """))
+
+        # Блокировка держится этим соединением; миграции выполняются в других
+        await conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATIONS_LOCK_ID})
+        try:
+            result = await conn.execute(text("SELECT version FROM schema_migrations"))
+            applied = set(result.scalars().all())
+
+            for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+                if migration.version in applied:
+                    continue
+
+                logger.info(f"Applying migration {migration.version}: {migration.description}")
+
+                if migration.transactional:
+                    async with engine.begin() as tx:
+                        for statement in migration.statements:
+                            await tx.execute(text(statement))
+                        await _mark_applied(tx, migration)
+                else:
+                    for statement in migration.statements:
+                        await conn.execute(text(statement))
+                    await _mark_applied(conn, migration)
+        finally:
+            await conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATIONS_LOCK_ID})
+
+
+async def _mark_applied(conn, migration: Migration):
+    await conn.execute(
+        text("INSERT INTO schema_migrations (version, description) VALUES (:version, :description)"),
+        {"version": migration.version, "description": migration.description}
+    )
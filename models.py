@@ -1,7 +1,7 @@
 """
 SQLAlchemy модели для банка
 """
-from sqlalchemy import Column, Integer, String, Numeric, DateTime, ForeignKey, Text, ARRAY, Boolean, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, ForeignKey, Text, ARRAY, Boolean, UniqueConstraint, Index, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -37,6 +37,12 @@ class Client(Base):
     
     # Relationships
     accounts = relationship("Account", back_populates="client")
+    
+    __table_args__ = (
+        # person_id LIKE 'team200-%' (клиенты команды): индекс unique не подходит для LIKE
+        # Для существующих БД индексы этого раздела создаются миграцией (migrations.py)
+        Index("idx_clients_person_id_pattern", "person_id", postgresql_ops={"person_id": "varchar_pattern_ops"}),
+    )
 
 
 class Account(Base):
@@ -44,7 +50,7 @@ class Account(Base):
     __tablename__ = "accounts"
     
     id = Column(Integer, primary_key=True)
-    client_id = Column(Integer, ForeignKey("clients.id"), nullable=False)
+    client_id = Column(Integer, ForeignKey("clients.id"), nullable=False, index=True)
     account_number = Column(String(20), unique=True, nullable=False)
     account_type = Column(String(50))  # checking, savings, deposit, loan (НЕ card - карты теперь отдельно!)
     balance = Column(Numeric(15, 2), default=0)
@@ -58,13 +64,29 @@ class Account(Base):
     cards = relationship("Card", back_populates="account", cascade="all, delete-orphan")
 
 
+class AccountPendingCredit(Base):
+    """
+    Незачисленное поступление на "горячий" счет (HOT_ACCOUNTS)
+
+    Зачисления на горячий счет не блокируют строку accounts, а дописываются сюда;
+    HotAccountCompactor переносит их в Account.balance пачками.
+    Баланс счета = Account.balance + сумма его записей здесь.
+    """
+    __tablename__ = "account_pending_credits"
+
+    id = Column(Integer, primary_key=True)
+    account_id = Column(Integer, ForeignKey("accounts.id"), nullable=False, index=True)
+    amount = Column(Numeric(15, 2), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
 class Card(Base):
     """Банковская карта, привязанная к счету"""
     __tablename__ = "cards"
     
     id = Column(Integer, primary_key=True)
     card_id = Column(String(100), unique=True, nullable=False)  # card-xxx
-    account_id = Column(Integer, ForeignKey("accounts.id"), nullable=False)
+    account_id = Column(Integer, ForeignKey("accounts.id"), nullable=False, index=True)
     client_id = Column(Integer, ForeignKey("clients.id"), nullable=False)
     
     # Номер карты (16 цифр) - отличается от номера счета!
@@ -163,13 +185,19 @@ class Transaction(Base):
     
     # Даты
     transaction_date = Column(DateTime, default=datetime.utcnow)
-    booking_date = Column(DateTime, default=datetime.utcnow)  # Дата проводки
+    booking_date = Column(DateTime, nullable=False, default=datetime.utcnow)  # Дата проводки
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
     account = relationship("Account", back_populates="transactions")
     card = relationship("Card")
     merchant = relationship("Merchant", back_populates="transactions")
+    
+    __table_args__ = (
+        # История по счету: фильтр по booking_date + курсорная пагинация (booking_date, id)
+        # Для существующих БД создается миграцией (migrations.py)
+        Index("idx_transactions_account_booking", "account_id", booking_date.desc(), id.desc()),
+    )
 
 
 class BankSettings(Base):
@@ -232,6 +260,14 @@ class Consent(Base):
     
     # Relationships
     client = relationship("Client")
+    
+    __table_args__ = (
+        # Проверка согласия на каждый межбанковый запрос: client_id + granted_to среди активных
+        Index(
+            "idx_consents_active_lookup", "client_id", "granted_to", "expiration_date_time",
+            postgresql_where=text("status = 'active'")
+        ),
+    )
 
 
 class Notification(Base):
@@ -239,7 +275,7 @@ class Notification(Base):
     __tablename__ = "notifications"
     
     id = Column(Integer, primary_key=True)
-    client_id = Column(Integer, ForeignKey("clients.id"), nullable=False)
+    client_id = Column(Integer, ForeignKey("clients.id"), nullable=False, index=True)
     notification_type = Column(String(50))  # consent_request / consent_approved / etc
     title = Column(String(255))
     message = Column(Text)
@@ -446,11 +482,39 @@ class InterbankTransfer(Base):
     from_bank = Column(String(100), nullable=False)  # Код банка-отправителя
     to_bank = Column(String(100), nullable=False)  # Код банка-получателя
     amount = Column(Numeric(15, 2), nullable=False)
-    status = Column(String(50), default="processing")  # processing / completed / failed
+    status = Column(String(50), default="processing")  # processing / completed / failed / manual_review
     created_at = Column(DateTime, default=datetime.utcnow)
     completed_at = Column(DateTime)
 
 
+class InterbankOutbox(Base):
+    """
+    Outbox исходящих межбанковских переводов
+
+    Запись создается в той же транзакции, что и списание со счета;
+    отправку в банк-получатель выполняет InterbankDispatcher в фоне.
+    """
+    __tablename__ = "interbank_outbox"
+
+    id = Column(Integer, primary_key=True)
+    transfer_id = Column(String(100), ForeignKey("interbank_transfers.transfer_id"), unique=True, nullable=False)
+    to_bank = Column(String(100), nullable=False)
+    to_account_number = Column(String(255), nullable=False)
+    amount = Column(Numeric(15, 2), nullable=False)
+    description = Column(Text)
+    status = Column(String(20), default="pending")  # pending / sent / failed / manual_review
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)  # Не отправлять раньше (ретраи и lease)
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        # Диспетчер выбирает только ожидающие отправки записи
+        Index("idx_interbank_outbox_pending", "next_attempt_at", postgresql_where=text("status = 'pending'")),
+    )
+
+
 class BankCapital(Base):
     """Капитал банка (для экономической модели)"""
     __tablename__ = "bank_capital"
@@ -464,6 +528,31 @@ class BankCapital(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 
+class BankCapitalDelta(Base):
+    """
+    Журнал изменений капитала банка (только добавление)
+
+    Операции не обновляют строку bank_capital, а пишут изменение сюда;
+    CapitalAggregator периодически переносит неучтенные изменения в bank_capital
+    и проставляет applied_at. Текущий капитал = bank_capital + неучтенные изменения.
+    """
+    __tablename__ = "bank_capital_deltas"
+
+    id = Column(Integer, primary_key=True)
+    bank_code = Column(String(100), nullable=False)
+    amount = Column(Numeric(15, 2), nullable=False)  # Изменение капитала (+/-)
+    loans_change = Column(Numeric(15, 2), default=0)  # Изменение выданных кредитов
+    reason = Column(String(255))
+    reference = Column(String(100))  # transfer_id / agreement_id / номер счета
+    created_at = Column(DateTime, default=datetime.utcnow)
+    applied_at = Column(DateTime)  # Когда учтено в bank_capital
+
+    __table_args__ = (
+        # Агрегатор и чтение капитала выбирают только неучтенные изменения
+        Index("idx_bank_capital_deltas_pending", "id", postgresql_where=text("applied_at IS NULL")),
+    )
+
+
 class Product(Base):
     """Финансовый продукт банка"""
     __tablename__ = "products"
@@ -487,7 +576,7 @@ class ProductAgreement(Base):
     
     id = Column(Integer, primary_key=True)
     agreement_id = Column(String(100), unique=True, nullable=False)
-    client_id = Column(Integer, ForeignKey("clients.id"), nullable=False)
+    client_id = Column(Integer, ForeignKey("clients.id"), nullable=False, index=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
     account_id = Column(Integer, ForeignKey("accounts.id"))  # Связанный счет
     amount = Column(Numeric(15, 2), nullable=False)
@@ -699,10 +788,16 @@ class VRPPayment(Base):
 
 
 class APICallLog(Base):
-    """Лог вызовов API для мониторинга"""
+    """
+    Лог вызовов API для мониторинга
+    
+    Партиционирован по дням (created_at): партиции создает и удаляет по сроку
+    хранения services/api_log_maintenance.py, аналитика читает APICallRollup.
+    """
     __tablename__ = "api_calls_log"
     
-    id = Column(Integer, primary_key=True)
+    # Ключ партиционирования обязан входить в первичный ключ
+    id = Column(Integer, primary_key=True, autoincrement=True)
     
     # Кто вызвал (может быть client_id или team_id)
     caller_id = Column(String(100))  # team200, client-123, etc
@@ -722,9 +817,46 @@ class APICallLog(Base):
     user_agent = Column(String(500))
     
     # Timestamp
-    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, primary_key=True)
     
     # Для синхронизации с Directory
     synced_to_directory = Column(Boolean, default=False)
     synced_at = Column(DateTime)
+    
+    __table_args__ = (
+        # Вызовы за период по вызывающему (мониторинг, выгрузка в Directory)
+        Index("idx_api_calls_log_created_caller", "created_at", "caller_id"),
+        # Для существующих БД таблица переводится в партиционированную миграцией (migrations.py)
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+
+class DirectorySyncState(Base):
+    """Курсор отправки api_calls_log в реестр: все строки с id <= last_id отправлены"""
+    __tablename__ = "directory_sync_state"
+    
+    name = Column(String(50), primary_key=True)  # api_calls_log
+    last_id = Column(Integer, nullable=False, default=0)
+    last_created_at = Column(DateTime)  # created_at последней отправленной строки (отсечение партиций)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class APICallRollup(Base):
+    """
+    Поминутные агрегаты api_calls_log для аналитики /admin/api-calls
+    
+    Считаются services/api_log_maintenance.py; caller_id без вызывающего - пустая строка.
+    """
+    __tablename__ = "api_calls_rollup_minute"
+    
+    bucket = Column(DateTime, primary_key=True)  # Начало минуты (UTC)
+    caller_id = Column(String(100), primary_key=True)
+    endpoint = Column(String(500), primary_key=True)
+    method = Column(String(10), primary_key=True)
+    status_code = Column(Integer, primary_key=True)
+    
+    calls = Column(Integer, nullable=False)
+    p50_ms = Column(Integer)
+    p95_ms = Column(Integer)
+    max_ms = Column(Integer)
 
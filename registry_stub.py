@@ -0,0 +1,99 @@
+"""
+Локальная замена реестра (Directory) для проверки отправки логов API
+
+Принимает пачки services/directory_sync.py так же, как реестр: POST
+DIRECTORY_SYNC_PATH, NDJSON в gzip; строки дедуплицируются по (bank_code, id).
+Хранит все в памяти. Недоступность реестра имитируется через /stub/outage.
+
+Запуск (порт по умолчанию совпадает с REGISTRY_URL):
+    python registry_stub.py [port]
+
+- GET  /stub/stats               - принято строк / пачек / дублей по банкам
+- POST /stub/outage?seconds=60   - отвечать 503 указанное время
+- POST /stub/reset               - очистить принятые строки
+"""
+import gzip
+import json
+import sys
+import time
+from collections import defaultdict
+
+from fastapi import FastAPI, HTTPException, Request
+
+try:
+    from .config import config
+except ImportError:
+    from config import config
+
+app = FastAPI(title="Registry stub")
+
+_rows = defaultdict(dict)  # bank_code -> {id: row}
+_stats = {"batches": 0, "duplicates": 0, "rejected": 0}
+_outage_until = 0.0
+
+
+@app.post(config.DIRECTORY_SYNC_PATH)
+async def receive_api_calls(request: Request):
+    """Пачка логов API вызовов банка (NDJSON, Content-Encoding: gzip)"""
+    if time.monotonic() < _outage_until:
+        _stats["rejected"] += 1
+        raise HTTPException(503, "Registry stub outage")
+
+    body = await request.body()
+    if request.headers.get("Content-Encoding") == "gzip":
+        try:
+            body = gzip.decompress(body)
+        except OSError:
+            raise HTTPException(400, "Invalid gzip body")
+
+    accepted = 0
+    for line in body.decode("utf-8").splitlines():
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+            bank_code, row_id = row["bank_code"], row["id"]
+        except (ValueError, KeyError):
+            raise HTTPException(400, "Invalid NDJSON row")
+
+        if row_id in _rows[bank_code]:
+            _stats["duplicates"] += 1
+            continue
+        _rows[bank_code][row_id] = row
+        accepted += 1
+
+    _stats["batches"] += 1
+    return {"accepted": accepted}
+
+
+@app.get("/stub/stats")
+async def get_stub_stats():
+    return {
+        **_stats,
+        "rows": {bank_code: len(rows) for bank_code, rows in _rows.items()},
+        "max_id": {bank_code: max(rows, default=0) for bank_code, rows in _rows.items()},
+        "outage": time.monotonic() < _outage_until
+    }
+
+
+@app.post("/stub/outage")
+async def start_outage(seconds: float = 60):
+    global _outage_until
+    _outage_until = time.monotonic() + seconds
+    return {"outage_seconds": seconds}
+
+
+@app.post("/stub/reset")
+async def reset():
+    global _outage_until
+    _rows.clear()
+    _stats.update(batches=0, duplicates=0, rejected=0)
+    _outage_until = 0.0
+    return {"status": "reset"}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    uvicorn.run(app, host="0.0.0.0", port=port, log_level="info")
@@ -0,0 +1,68 @@
+"""
+Быстрые JSON ответы для нагруженных GET эндпоинтов
+
+Обычный путь FastAPI: dict -> jsonable_encoder (рекурсивный обход и копия
+всего ответа) -> json.dumps. Для страниц на сотни строк это заметная доля
+времени запроса. `fast_json(content)` возвращает готовый Response:
+jsonable_encoder не вызывается, сериализация - orjson за один проход
+(Decimal, datetime, pydantic модели - через `_default` / нативно).
+
+Включается per-endpoint (return fast_json(...)) и глобально FAST_JSON_RESPONSES;
+без установленного orjson используется stdlib json с тем же форматом значений.
+"""
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    from .config import config
+except ImportError:
+    from config import config
+
+try:
+    import orjson
+except ImportError:  # orjson - необязательная зависимость
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    """Типы, которые не сериализуются напрямую (как в jsonable_encoder)"""
+    if isinstance(obj, Decimal):
+        # jsonable_encoder: целое -> int, иначе float
+        return int(obj) if obj.as_tuple().exponent >= 0 else float(obj)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse с сериализацией orjson (fallback - stdlib json)"""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+        return json.dumps(
+            content,
+            default=_default,
+            ensure_ascii=False,
+            allow_nan=False,
+            separators=(",", ":")
+        ).encode("utf-8")
+
+
+def fast_json(content: Any, status_code: int = 200):
+    """
+    Ответ эндпоинта в обход jsonable_encoder
+
+    При FAST_JSON_RESPONSES=false возвращает content как есть - стандартный путь FastAPI.
+    """
+    if not config.FAST_JSON_RESPONSES:
+        return content
+    return FastJSONResponse(content, status_code=status_code)
@@ -0,0 +1,212 @@
+"""
+Маршрутизация счетов: номер счета -> банк-владелец
+
+Банк получателя определяется по локальному справочнику, без HTTP запросов:
+1. диапазоны префиксов номеров счетов из конфига
+2. снапшоты счетов других банков (GET /interbank/accounts/export), обновляются в фоне
+3. счета, найденные пробами ранее
+
+Только при промахе опрашиваются все банки параллельно (первый успешный ответ).
+Счет кэшируется как отсутствующий (negative cache), только если все банки
+ответили 404: ошибка, таймаут или открытый circuit breaker - ответ неизвестен.
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, FrozenSet, Optional, Tuple
+
+import httpx
+
+from config import config
+from services.auth_service import create_bank_token
+from services.cache import TTLCache, MISSING
+from services.http_clients import bank_http_clients
+
+logger = logging.getLogger(__name__)
+
+
+class AccountDirectory:
+    """Справочник счетов других банков (singleton `account_directory`)"""
+
+    def __init__(self):
+        # Длинные префиксы проверяются первыми
+        self._prefixes = sorted(
+            config.ACCOUNT_ROUTING_PREFIXES.items(),
+            key=lambda item: len(item[0]),
+            reverse=True
+        )
+        self._snapshots: Dict[str, FrozenSet[str]] = {}  # bank_code -> номера счетов
+        self._snapshot_meta: Dict[str, dict] = {}  # bank_code -> {"etag", "fetched_at"}
+        self._learned = TTLCache(
+            max_size=config.ACCOUNT_DIRECTORY_CACHE_SIZE,
+            ttl=config.ACCOUNT_DIRECTORY_REFRESH_INTERVAL
+        )
+        self._negative = TTLCache(
+            max_size=config.ACCOUNT_DIRECTORY_CACHE_SIZE,
+            ttl=config.ACCOUNT_NEGATIVE_CACHE_TTL
+        )
+
+        self._task: Optional[asyncio.Task] = None
+
+        self.resolved_by = {"prefix": 0, "snapshot": 0, "learned": 0, "probe": 0, "negative": 0, "not_found": 0}
+
+    # === Lifecycle ===
+
+    async def start(self):
+        """Запустить фоновое обновление снапшотов (вызывается из lifespan)"""
+        self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # === Public API ===
+
+    async def resolve(self, account_number: str) -> Optional[str]:
+        """Код банка-владельца счета или None, если счет не найден ни в одном банке"""
+        for prefix, bank_code in self._prefixes:
+            if account_number.startswith(prefix):
+                self.resolved_by["prefix"] += 1
+                return bank_code
+
+        for bank_code, accounts in self._snapshots.items():
+            if account_number in accounts:
+                self.resolved_by["snapshot"] += 1
+                return bank_code
+
+        bank_code = self._learned.get(account_number)
+        if bank_code is not MISSING:
+            self.resolved_by["learned"] += 1
+            return bank_code
+
+        if self._negative.get(account_number) is not MISSING:
+            self.resolved_by["negative"] += 1
+            return None
+
+        bank_code, definitive = await self._probe_all(account_number)
+        if bank_code:
+            self.resolved_by["probe"] += 1
+            self._learned.set(account_number, bank_code)
+        else:
+            self.resolved_by["not_found"] += 1
+            if definitive:
+                self._negative.set(account_number, True)
+        return bank_code
+
+    async def refresh_snapshot(self, bank_code: str):
+        """Загрузить снапшот счетов банка (условный запрос по ETag)"""
+        meta = self._snapshot_meta.get(bank_code, {})
+        headers = {"Authorization": f"Bearer {create_bank_token()}"}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+
+        try:
+            response = await bank_http_clients.for_bank(bank_code).get(
+                "/interbank/accounts/export",
+                headers=headers
+            )
+        except httpx.HTTPError as e:
+            logger.warning(f"Failed to fetch account snapshot of {bank_code}: {e}")
+            return
+
+        if response.status_code == 304:
+            self._snapshot_meta[bank_code] = {**meta, "fetched_at": time.time()}
+            return
+
+        if response.status_code != 200:
+            logger.warning(f"Account snapshot of {bank_code} returned {response.status_code}")
+            return
+
+        accounts = frozenset(response.json().get("accounts", []))
+        self._snapshots[bank_code] = accounts
+        self._snapshot_meta[bank_code] = {
+            "etag": response.headers.get("ETag"),
+            "fetched_at": time.time()
+        }
+
+        # Счета из нового снапшота больше не "отсутствующие"
+        for account_number in accounts:
+            self._negative.invalidate(account_number)
+
+    def stats(self) -> dict:
+        return {
+            "prefixes": dict(self._prefixes),
+            "snapshots": {
+                bank_code: {
+                    "accounts": len(accounts),
+                    "fetched_at": self._snapshot_meta.get(bank_code, {}).get("fetched_at")
+                }
+                for bank_code, accounts in self._snapshots.items()
+            },
+            "learned": self._learned.stats(),
+            "negative": self._negative.stats(),
+            "resolved_by": dict(self.resolved_by)
+        }
+
+    # === Internal ===
+
+    async def _probe_all(self, account_number: str) -> Tuple[Optional[str], bool]:
+        """
+        Опросить все банки параллельно: (первый найденный банк, все ли ответы окончательные)
+
+        Второй элемент True, только если счет не найден и каждый банк ответил 404.
+        """
+        tasks = [
+            asyncio.create_task(self._probe(bank_code, account_number))
+            for bank_code in _peer_banks()
+        ]
+        definitive = True
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                found = await next_done
+                if found is None:
+                    definitive = False
+                elif found:
+                    return found, True
+            return None, definitive
+        finally:
+            # Остальные пробы больше не нужны
+            for task in tasks:
+                task.cancel()
+
+    async def _probe(self, bank_code: str, account_number: str) -> Optional[str]:
+        """Код банка, если счет в нем есть; "" - банк ответил 404; None - ответ неизвестен"""
+        try:
+            response = await bank_http_clients.for_bank(bank_code).get(
+                f"/interbank/check-account/{account_number}",
+                headers={"x-bank-auth-token": config.BANK_CODE},
+                timeout=config.ACCOUNT_PROBE_TIMEOUT,
+                retries=0
+            )
+        except Exception as e:
+            logger.debug(f"Failed to check account in {bank_code}: {str(e)}")
+            return None
+
+        if response.status_code == 200:
+            logger.info(f"Account {account_number} found in {bank_code}")
+            return bank_code
+        if response.status_code == 404:
+            return ""
+        return None
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                await asyncio.gather(*(self.refresh_snapshot(b) for b in _peer_banks()))
+            except Exception as e:
+                logger.error(f"Account directory refresh failed: {e}")
+            await asyncio.sleep(config.ACCOUNT_DIRECTORY_REFRESH_INTERVAL)
+
+
+def _peer_banks():
+    """Другие банки федерации (свой исключается)"""
+    return [b for b in config.INTERBANK_PEERS if b != config.BANK_CODE]
+
+
+# Singleton instance
+account_directory = AccountDirectory()
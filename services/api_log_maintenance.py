@@ -0,0 +1,252 @@
+"""
+Обслуживание api_calls_log: дневные партиции, срок хранения, поминутные агрегаты
+
+- api_calls_log партиционирован по created_at (по дням): партиции создаются
+  на API_LOG_PARTITIONS_AHEAD дней вперед, партиции старше API_LOG_RETENTION_DAYS
+  удаляются целиком (DROP TABLE вместо DELETE миллионов строк)
+- строки без подходящей партиции попадают в api_calls_log_default; при создании
+  партиции они переносятся в нее
+- раз в API_LOG_ROLLUP_INTERVAL последние минуты сворачиваются в
+  api_calls_rollup_minute (caller_id, endpoint, method, status_code, p50/p95):
+  аналитика /admin/api-calls читает агрегаты, а не сырые строки
+
+При нескольких экземплярах приложения работу выполняет один (advisory lock).
+"""
+import asyncio
+import logging
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import text
+
+from config import config
+from database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Ключи advisory lock
+ROLLUP_LOCK_ID = 815_003
+PARTITION_LOCK_ID = 815_004
+
+PARTITION_PREFIX = "api_calls_log_p"
+DEFAULT_PARTITION = "api_calls_log_default"
+
+# Верхняя граница партиции из pg_get_expr(relpartbound): FOR VALUES FROM (...) TO ('2025-01-02 00:00:00')
+_UPPER_BOUND = re.compile(r"TO \('([^']+)'\)")
+
+ROLLUP_SQL = """
+    INSERT INTO api_calls_rollup_minute
+        (bucket, caller_id, endpoint, method, status_code, calls, p50_ms, p95_ms, max_ms)
+    SELECT
+        date_trunc('minute', created_at),
+        COALESCE(caller_id, ''),
+        endpoint,
+        method,
+        COALESCE(status_code, 0),
+        count(*),
+        percentile_disc(0.5) WITHIN GROUP (ORDER BY response_time_ms),
+        percentile_disc(0.95) WITHIN GROUP (ORDER BY response_time_ms),
+        max(response_time_ms)
+    FROM api_calls_log
+    WHERE created_at >= :start AND created_at < :end
+    GROUP BY 1, 2, 3, 4, 5
+    ON CONFLICT (bucket, caller_id, endpoint, method, status_code) DO UPDATE SET
+        calls = EXCLUDED.calls,
+        p50_ms = EXCLUDED.p50_ms,
+        p95_ms = EXCLUDED.p95_ms,
+        max_ms = EXCLUDED.max_ms
+"""
+
+
+def _partition_name(day: datetime) -> str:
+    return f"{PARTITION_PREFIX}{day:%Y%m%d}"
+
+
+def _day(moment: datetime) -> datetime:
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _upper_bound(bound: Optional[str]) -> Optional[datetime]:
+    match = _UPPER_BOUND.search(bound or "")
+    return datetime.fromisoformat(match.group(1)) if match else None
+
+
+class APILogMaintenance:
+    """Партиции и агрегаты api_calls_log (singleton `api_log_maintenance`)"""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._rolled_until: Optional[datetime] = None  # Агрегаты посчитаны до этой минуты
+        self._maintained_at = 0.0
+
+        self.partitions_created = 0
+        self.partitions_dropped = 0
+        self.rows_moved_from_default = 0
+        self.rollups = 0
+        self.last_error: Optional[str] = None
+
+    # === Lifecycle ===
+
+    async def start(self):
+        """Создать партиции до первой записи логов и запустить обслуживание (вызывается из lifespan)"""
+        try:
+            await self.maintain_partitions()
+        except Exception as e:
+            logger.error(f"API log partition maintenance failed: {e}")
+            self.last_error = str(e)
+
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # === Партиции ===
+
+    async def maintain_partitions(self):
+        """Создать недостающие дневные партиции и удалить партиции старше срока хранения"""
+        async with AsyncSessionLocal() as db:
+            locked = await db.scalar(text("SELECT pg_try_advisory_xact_lock(:id)"), {"id": PARTITION_LOCK_ID})
+            if not locked:
+                # Обслуживает другой экземпляр
+                self._maintained_at = time.monotonic()
+                return
+
+            await db.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF api_calls_log DEFAULT"))
+
+            today = _day(datetime.utcnow())
+            covered_until = await self._legacy_until(db)
+            for offset in range(config.API_LOG_PARTITIONS_AHEAD + 1):
+                day = today + timedelta(days=offset)
+                if covered_until is None or day >= covered_until:
+                    await self._create_partition(db, day)
+
+            await self._drop_expired(db, today - timedelta(days=config.API_LOG_RETENTION_DAYS))
+
+            # Агрегаты хранятся дольше сырых логов, но тоже не вечно
+            await db.execute(
+                text("DELETE FROM api_calls_rollup_minute WHERE bucket < :cutoff"),
+                {"cutoff": today - timedelta(days=config.API_LOG_ROLLUP_RETENTION_DAYS)}
+            )
+            await db.commit()
+
+        self._maintained_at = time.monotonic()
+
+    async def _partitions(self, db) -> dict:
+        """Партиции api_calls_log: имя -> граница (pg_get_expr)"""
+        result = await db.execute(text("""
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'api_calls_log'::regclass
+        """))
+        return {name: bound for name, bound in result.all()}
+
+    async def _legacy_until(self, db) -> Optional[datetime]:
+        """Верхняя граница партиции legacy (старая таблица, миграция 5): дни до нее уже покрыты"""
+        bounds = [
+            _upper_bound(bound) for name, bound in (await self._partitions(db)).items()
+            if name != DEFAULT_PARTITION and not name.startswith(PARTITION_PREFIX)
+        ]
+        bounds = [bound for bound in bounds if bound is not None]
+        return max(bounds) if bounds else None
+
+    async def _create_partition(self, db, day: datetime):
+        name = _partition_name(day)
+        if name in await self._partitions(db):
+            return
+
+        start, end = day, day + timedelta(days=1)
+
+        # Строки этого дня могли попасть в DEFAULT (партиция не была создана вовремя):
+        # ATTACH не пройдет, пока они там - переносим в новую таблицу до присоединения
+        await db.execute(text(f"CREATE TABLE IF NOT EXISTS {name} (LIKE api_calls_log INCLUDING DEFAULTS)"))
+        moved = await db.execute(
+            text(f"""
+                WITH moved AS (
+                    DELETE FROM {DEFAULT_PARTITION}
+                    WHERE created_at >= :start AND created_at < :end
+                    RETURNING *
+                )
+                INSERT INTO {name} SELECT * FROM moved
+            """),
+            {"start": start, "end": end}
+        )
+        await db.execute(text(
+            f"ALTER TABLE api_calls_log ATTACH PARTITION {name} "
+            f"FOR VALUES FROM ('{start.isoformat(sep=' ')}') TO ('{end.isoformat(sep=' ')}')"
+        ))
+
+        self.partitions_created += 1
+        self.rows_moved_from_default += moved.rowcount or 0
+        logger.info(f"Created API log partition {name}")
+
+    async def _drop_expired(self, db, cutoff: datetime):
+        """Удалить партиции, все строки которых старше cutoff"""
+        for name, bound in (await self._partitions(db)).items():
+            upper = _upper_bound(bound)
+            if name == DEFAULT_PARTITION or upper is None:
+                continue
+
+            if upper <= cutoff:
+                await db.execute(text(f"DROP TABLE {name}"))
+                self.partitions_dropped += 1
+                logger.info(f"Dropped expired API log partition {name}")
+
+    # === Агрегаты ===
+
+    async def rollup(self):
+        """Пересчитать поминутные агрегаты с последней посчитанной минуты до текущей (не включая)"""
+        end = datetime.utcnow().replace(second=0, microsecond=0)
+
+        async with AsyncSessionLocal() as db:
+            locked = await db.scalar(text("SELECT pg_try_advisory_xact_lock(:id)"), {"id": ROLLUP_LOCK_ID})
+            if not locked:
+                return
+
+            if self._rolled_until is None:
+                last = await db.scalar(text("SELECT max(bucket) FROM api_calls_rollup_minute"))
+                self._rolled_until = last + timedelta(minutes=1) if last else end - timedelta(hours=1)
+
+            # Пачки логов пишутся с задержкой - последние минуты пересчитываются заново
+            start = min(self._rolled_until, end - timedelta(minutes=config.API_LOG_ROLLUP_SETTLE_MINUTES))
+
+            await db.execute(text(ROLLUP_SQL), {"start": start, "end": end})
+            await db.commit()
+
+        self._rolled_until = end
+        self.rollups += 1
+
+    def stats(self) -> dict:
+        return {
+            "retention_days": config.API_LOG_RETENTION_DAYS,
+            "partitions_created": self.partitions_created,
+            "partitions_dropped": self.partitions_dropped,
+            "rows_moved_from_default": self.rows_moved_from_default,
+            "rollups": self.rollups,
+            "rolled_until": self._rolled_until.isoformat() + "Z" if self._rolled_until else None,
+            "last_error": self.last_error
+        }
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(config.API_LOG_ROLLUP_INTERVAL)
+            try:
+                await self.rollup()
+                if time.monotonic() - self._maintained_at >= config.API_LOG_MAINTENANCE_INTERVAL:
+                    await self.maintain_partitions()
+                self.last_error = None
+            except Exception as e:
+                logger.error(f"API log maintenance failed: {e}")
+                self.last_error = str(e)
+
+
+# Singleton instance
+api_log_maintenance = APILogMaintenance()
@@ -0,0 +1,212 @@
+"""
+Фоновая запись логов API вызовов
+
+Middleware не пишет в БД на пути запроса: записи кладутся в ограниченную
+очередь в памяти, а фоновый writer сбрасывает их в api_calls_log пачками
+(один multi-row INSERT на пачку) по размеру пачки или по таймеру.
+"""
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import insert, text
+
+from config import config
+from database import AsyncSessionLocal
+from models import APICallLog
+
+logger = logging.getLogger(__name__)
+
+
+class APILogQueue:
+    """
+    Очередь логов API с фоновым writer'ом
+
+    - память ограничена `max_size` записями; при переполнении новые записи отбрасываются
+    - пачка пишется при накоплении `batch_size` записей или раз в `flush_interval` секунд
+    - если БД недоступна, пачка сбрасывается в spill-файл (JSONL) и дочитывается
+      при следующем старте; без spill-файла пачка отбрасывается
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        batch_size: int,
+        flush_interval: float,
+        spill_path: str = ""
+    ):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+        # Счетчики для мониторинга
+        self.written = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.failed_batches = 0
+
+    def put(self, entry: dict) -> bool:
+        """Поставить запись в очередь (не блокирует). False - запись отброшена"""
+        if self._queue is None or self._stopping:
+            self.dropped += 1
+            return False
+
+        try:
+            self._queue.put_nowait(entry)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+
+    async def start(self):
+        """Запустить фоновый writer (вызывается из lifespan)"""
+        if self._task:
+            return
+
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._stopping = False
+        self._load_spill()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10.0):
+        """Остановить writer, дописав все накопленные записи"""
+        if not self._task:
+            return
+
+        self._stopping = True
+        try:
+            await asyncio.wait_for(self._task, timeout=timeout)
+        except asyncio.TimeoutError:
+            # БД не успевает - сохранить хвост очереди, чтобы не потерять его
+            self._task.cancel()
+            rest = self._drain_nowait()
+            if rest:
+                self._spill(rest)
+        finally:
+            self._task = None
+
+    def stats(self) -> dict:
+        """Состояние очереди для мониторинга"""
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "max_size": self.max_size,
+            "written": self.written,
+            "dropped": self.dropped,
+            "spilled": self.spilled,
+            "failed_batches": self.failed_batches
+        }
+
+    async def _run(self):
+        while True:
+            batch = await self._collect_batch()
+            if batch:
+                await self._flush(batch)
+
+            if self._stopping and self._queue.empty():
+                break
+
+    async def _collect_batch(self) -> List[dict]:
+        """Собрать пачку: до batch_size записей, но не дольше flush_interval"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_interval
+        batch = []
+
+        while len(batch) < self.batch_size:
+            if self._stopping:
+                # При остановке не ждем таймер - забираем то, что уже есть
+                batch.extend(self._drain_nowait(self.batch_size - len(batch)))
+                break
+
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _flush(self, batch: List[dict]):
+        try:
+            async with AsyncSessionLocal() as session:
+                # xid до выдачи id из последовательности: пока пачка не закоммичена,
+                # directory_sync не сдвинет курсор за ее id (см. services/directory_sync.py)
+                await session.execute(text("SELECT pg_current_xact_id()"))
+                # executemany одного INSERT -> multi-row INSERT ... VALUES (...), (...)
+                await session.execute(insert(APICallLog), batch)
+                await session.commit()
+            self.written += len(batch)
+        except Exception as e:
+            self.failed_batches += 1
+            logger.warning(f"Failed to flush {len(batch)} API call logs: {e}")
+            self._spill(batch)
+
+    def _drain_nowait(self, limit: Optional[int] = None) -> List[dict]:
+        items = []
+        while not self._queue.empty() and (limit is None or len(items) < limit):
+            items.append(self._queue.get_nowait())
+        return items
+
+    def _spill(self, batch: List[dict]):
+        """Сбросить пачку в spill-файл или отбросить, если файл не настроен"""
+        if not self.spill_path:
+            self.dropped += len(batch)
+            return
+
+        try:
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                for entry in batch:
+                    f.write(json.dumps(entry, default=_json_default, ensure_ascii=False) + "\n")
+            self.spilled += len(batch)
+        except OSError as e:
+            logger.error(f"Failed to spill API call logs to {self.spill_path}: {e}")
+            self.dropped += len(batch)
+
+    def _load_spill(self):
+        """Вернуть в очередь записи, сброшенные в spill-файл при прошлой работе"""
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return
+
+        try:
+            with open(self.spill_path, "r", encoding="utf-8") as f:
+                lines = f.readlines()
+            os.remove(self.spill_path)
+        except OSError as e:
+            logger.error(f"Failed to read API call log spill {self.spill_path}: {e}")
+            return
+
+        for line in lines:
+            try:
+                entry = json.loads(line)
+                if entry.get("created_at"):
+                    entry["created_at"] = datetime.fromisoformat(entry["created_at"])
+                self._queue.put_nowait(entry)
+            except asyncio.QueueFull:
+                self.dropped += 1
+            except ValueError:
+                continue
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+# Singleton instance
+api_log_queue = APILogQueue(
+    max_size=config.API_LOG_QUEUE_SIZE,
+    batch_size=config.API_LOG_BATCH_SIZE,
+    flush_interval=config.API_LOG_FLUSH_INTERVAL,
+    spill_path=config.API_LOG_SPILL_PATH
+)
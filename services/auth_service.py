@@ -5,12 +5,13 @@ from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pathlib import Path
-import httpx
+import hashlib
 
 from config import config
+from services.cache import TTLCache, MISSING
+from services.key_ring import key_ring
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -23,6 +24,12 @@ ERROR_NOT_AUTHENTICATED = "Not authenticated. Authorization token required"
 ERROR_INVALID_CREDENTIALS = "Could not validate credentials"
 ERROR_INSUFFICIENT_PERMISSIONS = "Insufficient permissions"
 
+# Проверенные токены: sha256(token) -> claims, запись живет не дольше exp токена
+verified_token_cache = TTLCache(
+    max_size=config.TOKEN_CACHE_SIZE,
+    ttl=config.TOKEN_CACHE_TTL
+)
+
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None, use_rs256: bool = False):
     """Создание JWT токена (HS256 или RS256)"""
@@ -38,20 +45,18 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None, u
     # Для bank tokens используем RS256
     if use_rs256:
         try:
-            # Загрузить приватный ключ
-            keys_path = Path(__file__).parent.parent.parent.parent / "shared" / "keys"
-            private_key_path = keys_path / f"{config.BANK_CODE}_private.pem"
+            # Приватный ключ загружен в key ring при старте
+            signing_key = key_ring.signing_key()
             
-            if not private_key_path.exists():
+            if not signing_key:
                 # Fallback to HS256 if key not found
                 encoded_jwt = jwt.encode(to_encode, config.SECRET_KEY, algorithm=config.ALGORITHM)
                 return encoded_jwt
             
-            with open(private_key_path, 'r') as f:
-                private_key = f.read()
+            kid, private_key = signing_key
             
             # Добавить kid (key ID) в header
-            headers = {"kid": f"{config.BANK_CODE}-2025"}
+            headers = {"kid": kid}
             encoded_jwt = jwt.encode(to_encode, private_key, algorithm="RS256", headers=headers)
             return encoded_jwt
         except Exception as e:
@@ -65,11 +70,36 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None, u
         return encoded_jwt
 
 
+def create_bank_token() -> str:
+    """
+    RS256 токен этого банка для межбанковских запросов (ключ подписи из key ring)
+
+    Банк-получатель проверяет его в require_federation_bank.
+    """
+    return create_access_token(
+        {"sub": config.BANK_CODE, "type": "bank"},
+        expires_delta=timedelta(minutes=5),
+        use_rs256=True
+    )
+
+
 async def verify_token(token: str, bank_code: Optional[str] = None) -> dict:
-    """Проверка JWT токена (HS256 или RS256)"""
+    """
+    Проверка JWT токена (HS256 или RS256)
+    
+    Успешно проверенные токены кэшируются до их exp: повторный запрос
+    с тем же токеном не проверяет подпись заново.
+    """
+    cache_key = hashlib.sha256(token.encode()).hexdigest()
+    cached = verified_token_cache.get(cache_key)
+    if cached is not MISSING:
+        return cached
+    
     try:
-        # Сначала пробуем HS256
-        try:
+        # Алгоритм из заголовка - чтобы не пробовать HS256 и RS256 по очереди
+        algorithm = jwt.get_unverified_header(token).get("alg")
+        
+        if algorithm == config.ALGORITHM:
             # Отключаем проверку iss и aud для совместимости
             payload = jwt.decode(
                 token, 
@@ -77,19 +107,10 @@ async def verify_token(token: str, bank_code: Optional[str] = None) -> dict:
                 algorithms=[config.ALGORITHM],
                 options={"verify_aud": False, "verify_iss": False}
             )
-            return payload
-        except JWTError:
-            pass
-        
-        # Если не получилось и указан bank_code, пробуем RS256
-        if bank_code:
-            try:
-                payload = await verify_rs256_token(token, bank_code)
-                return payload
-            except Exception:
-                pass
-        
-        raise JWTError("Token validation failed")
+        elif algorithm == "RS256" and bank_code:
+            payload = await verify_rs256_token(token, bank_code)
+        else:
+            raise JWTError("Token validation failed")
         
     except JWTError:
         raise HTTPException(
@@ -97,43 +118,59 @@ async def verify_token(token: str, bank_code: Optional[str] = None) -> dict:
             detail=ERROR_INVALID_CREDENTIALS,
             headers={"WWW-Authenticate": "Bearer"}
         )
+    
+    exp = payload.get("exp")
+    verified_token_cache.set(cache_key, payload, expires_at=float(exp) if exp else None)
+    return payload
+
+
+async def authenticate_request(request: Request, token: str) -> dict:
+    """
+    Проверить токен запроса один раз за запрос
+    
+    Claims сохраняются в request.state.auth_claims: их переиспользуют
+    остальные зависимости запроса и APILoggingMiddleware (для атрибуции).
+    """
+    claims = getattr(request.state, "auth_claims", None)
+    if claims is None:
+        claims = await verify_token(token)
+        request.state.auth_claims = claims
+    return claims
+
+
+def request_subject(request: Request) -> Optional[str]:
+    """
+    Субъект токена запроса (sub) для read-your-writes (см. database.ReplicaMonitor)
+
+    Claims уже проверенного токена (request.state.auth_claims), иначе - без
+    проверки подписи: субъект здесь только выбирает БД для чтения, доступ
+    проверяют auth-зависимости эндпоинта.
+    """
+    claims = getattr(request.state, "auth_claims", None)
+    if claims is None:
+        auth_header = request.headers.get("Authorization", "")
+        if not auth_header.startswith("Bearer "):
+            return None
+        try:
+            claims = jwt.get_unverified_claims(auth_header[len("Bearer "):])
+        except JWTError:
+            return None
+
+    subject = claims.get("sub") or claims.get("client_id")
+    return str(subject) if subject else None
 
 
 async def verify_rs256_token(token: str, bank_code: str) -> dict:
-    """Проверка RS256 токена через JWKS"""
+    """Проверка RS256 токена ключом банка из key ring (по kid)"""
     try:
-        # Попробовать загрузить JWKS из локального файла
-        keys_path = Path(__file__).parent.parent.parent.parent / "shared" / "keys"
-        public_key_path = keys_path / f"{bank_code}_public.pem"
-        
-        if public_key_path.exists():
-            with open(public_key_path, 'r') as f:
-                public_key = f.read()
-            
-            payload = jwt.decode(token, public_key, algorithms=["RS256"])
-            return payload
+        kid = jwt.get_unverified_header(token).get("kid")
+        public_key = await key_ring.get_verification_key(bank_code, kid)
         
-        # Альтернативно: загрузить JWKS через HTTP
-        async with httpx.AsyncClient() as client:
-            # Определить base URL банка
-            bank_ports = {"vbank": 8001, "abank": 8002, "sbank": 8003}
-            port = bank_ports.get(bank_code, 8001)
-            
-            jwks_url = f"http://localhost:{port}/.well-known/jwks.json"
-            response = await client.get(jwks_url, timeout=5.0)
-            
-            if response.status_code == 200:
-                jwks = response.json()
-                # Используем первый ключ из JWKS
-                if jwks.get("keys"):
-                    # Для упрощения используем первый ключ
-                    # В production нужно искать по kid
-                    key = jwks["keys"][0]
-                    # jwt.decode автоматически обработает JWKS
-                    payload = jwt.decode(token, key, algorithms=["RS256"])
-                    return payload
+        if not public_key:
+            raise JWTError(f"No RS256 key for {bank_code} (kid={kid})")
         
-        raise JWTError("Failed to verify RS256 token")
+        payload = jwt.decode(token, public_key, algorithms=["RS256"])
+        return payload
         
     except Exception as e:
         print(f"RS256 verification failed: {e}")
@@ -141,13 +178,13 @@ async def verify_rs256_token(token: str, bank_code: str) -> dict:
 
 
 async def get_current_client(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ) -> Optional[dict]:
     """
     Dependency для получения текущего клиента из JWT токена
     """
-    token = credentials.credentials
-    payload = await verify_token(token)
+    payload = await authenticate_request(request, credentials.credentials)
     
     if payload.get("type") != "client":
         return None
@@ -159,6 +196,7 @@ async def get_current_client(
 
 
 async def get_current_bank(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ) -> Optional[dict]:
     """
@@ -168,9 +206,8 @@ async def get_current_bank(
     - type="bank" - межбанковый токен
     - type="team" - токен команды (bank-token, выданный банком)
     """
-    token = credentials.credentials
     # Team токены используют HS256, bank_code не нужен
-    payload = await verify_token(token)
+    payload = await authenticate_request(request, credentials.credentials)
     
     # Принимаем и "bank" и "team" токены (team = токен банка для команды)
     if payload.get("type") not in ["bank", "team"]:
@@ -184,6 +221,7 @@ async def get_current_bank(
 
 
 async def get_optional_client(
+    request: Request,
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False))
 ) -> Optional[dict]:
     """
@@ -193,7 +231,7 @@ async def get_optional_client(
         return None
     
     try:
-        payload = await verify_token(credentials.credentials)
+        payload = await authenticate_request(request, credentials.credentials)
         if payload.get("type") == "client":
             return {
                 "client_id": payload.get("sub"),
@@ -206,6 +244,7 @@ async def get_optional_client(
 
 
 async def get_current_banker(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ) -> Optional[dict]:
     """
@@ -216,7 +255,7 @@ async def get_current_banker(
         return None
     
     try:
-        payload = await verify_token(credentials.credentials)
+        payload = await authenticate_request(request, credentials.credentials)
         if payload.get("type") == "banker":
             return {
                 "username": payload.get("sub"),
@@ -233,14 +272,14 @@ async def get_current_banker(
 # ============================================================================
 
 async def require_client(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ) -> dict:
     """
     Строгая зависимость - требует валидный client токен
     Автоматически поднимает 401 если токен отсутствует или невалиден
     """
-    token = credentials.credentials
-    payload = await verify_token(token)
+    payload = await authenticate_request(request, credentials.credentials)
     
     if payload.get("type") != "client":
         raise HTTPException(
@@ -256,14 +295,14 @@ async def require_client(
 
 
 async def require_bank(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ) -> dict:
     """
     Строгая зависимость - требует валидный bank/team токен
     Автоматически поднимает 401 если токен отсутствует или невалиден
     """
-    token = credentials.credentials
-    payload = await verify_token(token)
+    payload = await authenticate_request(request, credentials.credentials)
     
     if payload.get("type") not in ["bank", "team"]:
         raise HTTPException(
@@ -280,14 +319,14 @@ async def require_bank(
 
 
 async def require_banker(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ) -> dict:
     """
     Строгая зависимость - требует валидный banker токен
     Автоматически поднимает 401 если токен отсутствует или невалиден
     """
-    token = credentials.credentials
-    payload = await verify_token(token)
+    payload = await authenticate_request(request, credentials.credentials)
     
     if payload.get("type") != "banker":
         raise HTTPException(
@@ -302,7 +341,48 @@ async def require_banker(
     }
 
 
+async def require_federation_bank(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> dict:
+    """
+    Строгая зависимость - требует RS256 токен банка федерации (type="bank")
+    
+    Подпись проверяется ключом банка из sub (key ring: shared/keys или JWKS банка).
+    HS256 bank/team токены не принимаются: их подписывает SECRET_KEY, а не банк.
+    """
+    token = credentials.credentials
+    try:
+        algorithm = jwt.get_unverified_header(token).get("alg")
+        bank_code = jwt.get_unverified_claims(token).get("sub")
+    except JWTError:
+        algorithm = bank_code = None
+    
+    peers = [b for b in config.INTERBANK_PEERS if b != config.BANK_CODE]
+    if algorithm != "RS256" or bank_code not in peers:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=ERROR_INSUFFICIENT_PERMISSIONS,
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    
+    payload = await verify_token(token, bank_code=bank_code)
+    if payload.get("type") != "bank":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=ERROR_INSUFFICIENT_PERMISSIONS,
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    request.state.auth_claims = payload
+    
+    return {
+        "bank_code": bank_code,
+        "type": "bank"
+    }
+
+
 async def require_any_token(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ) -> dict:
     """
@@ -310,8 +390,7 @@ async def require_any_token(
     Автоматически поднимает 401 если токен отсутствует или невалиден
     Возвращает payload токена
     """
-    token = credentials.credentials
-    payload = await verify_token(token)
+    payload = await authenticate_request(request, credentials.credentials)
     
     token_type = payload.get("type")
     
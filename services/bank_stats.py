@@ -0,0 +1,120 @@
+"""
+Статистика банка для /admin/stats и дашборда мониторинга
+
+Счетчики (платежи, счета, клиенты, сумма балансов) считаются полным сканированием,
+поэтому не на каждый запрос: их хранит materialized view bank_stats_mv
+(см. migrations.py), BankStats обновляет его раз в STATS_REFRESH_INTERVAL
+и держит последнюю строку в памяти. Если приложение запущено в нескольких
+экземплярах, REFRESH выполняет только один (advisory lock), остальные читают.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import text
+
+from config import config
+from database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Ключ advisory lock обновления bank_stats_mv
+STATS_REFRESH_LOCK_ID = 815_002
+
+
+class BankStats:
+    """Периодически обновляемые счетчики банка (singleton `bank_stats`)"""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._stats: Optional[dict] = None
+        self._loaded_at = 0.0
+
+        self.refreshes = 0
+        self.last_error: Optional[str] = None
+
+    async def start(self):
+        """Загрузить счетчики и запустить обновление (вызывается из lifespan)"""
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.error(f"Failed to load bank stats: {e}")
+            self.last_error = str(e)
+
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def refresh(self):
+        """Обновить bank_stats_mv (если не обновляет другой экземпляр) и перечитать"""
+        async with AsyncSessionLocal() as db:
+            locked = await db.scalar(
+                text("SELECT pg_try_advisory_xact_lock(:id)"), {"id": STATS_REFRESH_LOCK_ID}
+            )
+            if locked:
+                await db.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY bank_stats_mv"))
+                self.refreshes += 1
+
+            result = await db.execute(text(
+                "SELECT payments_count, accounts_count, clients_count, total_balance, refreshed_at FROM bank_stats_mv"
+            ))
+            row = result.one_or_none()
+            await db.commit()
+
+        if row is not None:
+            self._stats = {
+                "payments_count": row.payments_count,
+                "accounts_count": row.accounts_count,
+                "clients_count": row.clients_count,
+                "total_balance": row.total_balance,
+                "refreshed_at": row.refreshed_at
+            }
+            self._loaded_at = time.monotonic()
+
+    async def snapshot(self) -> dict:
+        """Последние счетчики и их свежесть (без обращения к БД, если уже загружены)"""
+        if self._stats is None:
+            await self.refresh()
+
+        stats = dict(self._stats or {
+            "payments_count": 0,
+            "accounts_count": 0,
+            "clients_count": 0,
+            "total_balance": 0,
+            "refreshed_at": None
+        })
+
+        refreshed_at = stats["refreshed_at"]
+        age = (datetime.utcnow() - refreshed_at).total_seconds() if refreshed_at else None
+        stats["staleness"] = {
+            "refreshed_at": refreshed_at.isoformat() + "Z" if refreshed_at else None,
+            "age_seconds": round(age, 1) if age is not None else None,
+            "refresh_interval": config.STATS_REFRESH_INTERVAL,
+            # Обновление пропущено минимум дважды
+            "stale": age is None or age > config.STATS_REFRESH_INTERVAL * 3,
+            "last_error": self.last_error
+        }
+        return stats
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(config.STATS_REFRESH_INTERVAL)
+            try:
+                await self.refresh()
+                self.last_error = None
+            except Exception as e:
+                logger.error(f"Bank stats refresh failed: {e}")
+                self.last_error = str(e)
+
+
+# Singleton instance
+bank_stats = BankStats()
@@ -0,0 +1,72 @@
+"""
+In-process кэш с TTL и LRU вытеснением
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+# Маркер промаха (None - допустимое закэшированное значение)
+MISSING = object()
+
+
+class TTLCache:
+    """
+    Ограниченный по размеру кэш с временем жизни записей
+
+    - при превышении `max_size` вытесняется давно не использованная запись (LRU)
+    - запись живет `ttl` секунд, либо до явно переданного `expires_at` (time.time())
+    - не потокобезопасен: рассчитан на один event loop
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return default
+
+        value, expires_at = item
+        if expires_at <= time.time():
+            del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, expires_at: Optional[float] = None):
+        deadline = time.time() + self.ttl
+        if expires_at is not None:
+            deadline = min(deadline, expires_at)
+
+        self._data[key] = (value, deadline)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses
+        }
@@ -0,0 +1,231 @@
+"""
+Капитал банка - журнал изменений вместо обновления одной строки
+
+Каждый межбанковский перевод, кредит и дарение при закрытии счета меняют
+капитал банка. Если каждая такая операция обновляет единственную строку
+bank_capital, все движения денег выстраиваются в очередь на ее блокировке.
+
+Поэтому операции только дописывают изменение в bank_capital_deltas
+(CapitalService.record, в своей транзакции), а CapitalAggregator в фоне
+переносит накопившиеся изменения в bank_capital одним UPDATE на пачку.
+Точный текущий капитал = bank_capital + еще не учтенные изменения.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import config
+from database import AsyncSessionLocal
+from models import BankCapital, BankCapitalDelta
+
+logger = logging.getLogger(__name__)
+
+# Начальный капитал, если строки bank_capital еще нет
+INITIAL_CAPITAL = Decimal("3500000.00")
+
+
+class CapitalService:
+    """Изменения и чтение капитала банка"""
+
+    @staticmethod
+    def record(
+        db: AsyncSession,
+        amount: Decimal,
+        reason: str = "",
+        reference: Optional[str] = None,
+        loans_change: Decimal = Decimal("0")
+    ):
+        """
+        Записать изменение капитала (не коммитит - вместе с остальной операцией)
+
+        amount: положительное = увеличение, отрицательное = уменьшение
+        loans_change: изменение суммы выданных кредитов
+        """
+        db.add(BankCapitalDelta(
+            bank_code=config.BANK_CODE,
+            amount=amount,
+            loans_change=loans_change,
+            reason=reason[:255] if reason else None,
+            reference=reference
+        ))
+
+    @staticmethod
+    async def current(db: AsyncSession) -> Optional[Decimal]:
+        """Текущий капитал банка с учетом неучтенных изменений (None - капитал не заведен)"""
+        for snapshot in await CapitalService.snapshots(db):
+            if snapshot["bank_code"] == config.BANK_CODE:
+                return snapshot["capital"]
+        return None
+
+    @staticmethod
+    async def snapshots(db: AsyncSession) -> List[dict]:
+        """
+        Капитал всех банков в БД с учетом неучтенных изменений
+
+        Одним запросом: строка bank_capital и сумма журнала читаются из одного
+        снимка, поэтому параллельный перенос не учтет изменение дважды.
+        """
+        pending = (
+            select(
+                BankCapitalDelta.bank_code,
+                func.sum(BankCapitalDelta.amount).label("amount"),
+                func.sum(BankCapitalDelta.loans_change).label("loans_change"),
+                func.count(BankCapitalDelta.id).label("count")
+            )
+            .where(BankCapitalDelta.applied_at.is_(None))
+            .group_by(BankCapitalDelta.bank_code)
+            .subquery()
+        )
+        result = await db.execute(
+            select(
+                BankCapital,
+                func.coalesce(pending.c.amount, 0),
+                func.coalesce(pending.c.loans_change, 0),
+                func.coalesce(pending.c.count, 0)
+            )
+            .outerjoin(pending, pending.c.bank_code == BankCapital.bank_code)
+            .order_by(BankCapital.id)
+        )
+
+        return [
+            {
+                "bank_code": cap.bank_code,
+                "capital": cap.capital + Decimal(pending_amount),
+                "initial_capital": cap.initial_capital,
+                "total_deposits": cap.total_deposits or Decimal("0"),
+                "total_loans": (cap.total_loans or Decimal("0")) + Decimal(pending_loans),
+                "pending_deltas": pending_count,
+                "updated_at": cap.updated_at
+            }
+            for cap, pending_amount, pending_loans, pending_count in result.all()
+        ]
+
+    @staticmethod
+    async def fold(db: AsyncSession, limit: int) -> int:
+        """
+        Перенести до `limit` неучтенных изменений в bank_capital
+
+        Записи журнала не удаляются - только получают applied_at.
+
+        Returns:
+            Количество перенесенных изменений
+        """
+        now = datetime.utcnow()
+        batch = (
+            select(BankCapitalDelta.id)
+            .where(BankCapitalDelta.applied_at.is_(None))
+            .order_by(BankCapitalDelta.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        result = await db.execute(
+            update(BankCapitalDelta)
+            .where(BankCapitalDelta.id.in_(batch))
+            .values(applied_at=now)
+            .returning(BankCapitalDelta.bank_code, BankCapitalDelta.amount, BankCapitalDelta.loans_change)
+            .execution_options(synchronize_session=False)
+        )
+        rows = result.all()
+
+        sums: Dict[str, Tuple[Decimal, Decimal]] = {}
+        for bank_code, amount, loans_change in rows:
+            capital, loans = sums.get(bank_code, (Decimal("0"), Decimal("0")))
+            sums[bank_code] = (capital + amount, loans + (loans_change or Decimal("0")))
+
+        for bank_code, (capital, loans) in sums.items():
+            updated = await db.execute(
+                update(BankCapital)
+                .where(BankCapital.bank_code == bank_code)
+                .values(
+                    capital=BankCapital.capital + capital,
+                    total_loans=func.coalesce(BankCapital.total_loans, 0) + loans,
+                    updated_at=now
+                )
+                .execution_options(synchronize_session=False)
+            )
+            if updated.rowcount == 0:
+                # Капитал еще не заведен
+                db.add(BankCapital(
+                    bank_code=bank_code,
+                    capital=INITIAL_CAPITAL + capital,
+                    initial_capital=INITIAL_CAPITAL,
+                    total_loans=loans
+                ))
+
+        return len(rows)
+
+
+class CapitalAggregator:
+    """Фоновый перенос журнала в bank_capital и кэш капитала для админки (singleton `capital_aggregator`)"""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._snapshots: Optional[List[dict]] = None
+        self._cached_at = 0.0
+
+        self.folded = 0
+        self.last_error: Optional[str] = None
+
+    async def start(self):
+        """Запустить агрегатор (вызывается из lifespan)"""
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def fold_once(self) -> int:
+        """Перенести одну пачку изменений, вернуть их количество"""
+        async with AsyncSessionLocal() as db:
+            folded = await CapitalService.fold(db, config.CAPITAL_FOLD_BATCH)
+            await db.commit()
+
+        self.folded += folded
+        return folded
+
+    async def snapshot(self) -> dict:
+        """Капитал банков из кэша (не старше CAPITAL_CACHE_TTL)"""
+        if self._snapshots is None or time.monotonic() - self._cached_at > config.CAPITAL_CACHE_TTL:
+            async with AsyncSessionLocal() as db:
+                self._snapshots = await CapitalService.snapshots(db)
+            self._cached_at = time.monotonic()
+
+        return {
+            "banks": self._snapshots,
+            "age_seconds": round(time.monotonic() - self._cached_at, 3)
+        }
+
+    def stats(self) -> dict:
+        return {
+            "folded": self.folded,
+            "last_error": self.last_error
+        }
+
+    async def _run(self):
+        while True:
+            try:
+                folded = await self.fold_once()
+                self.last_error = None
+            except Exception as e:
+                logger.error(f"Capital aggregation failed: {e}")
+                self.last_error = str(e)
+                folded = 0
+
+            if folded < config.CAPITAL_FOLD_BATCH:
+                await asyncio.sleep(config.CAPITAL_FOLD_INTERVAL)
+
+
+# Singleton instance
+capital_aggregator = CapitalAggregator()
@@ -3,12 +3,24 @@
 Соответствует OpenBanking Russia Account-Consents API v2.1
 """
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
+from sqlalchemy import select, and_, union_all
 from datetime import datetime, timedelta
 from typing import Optional, List
 import uuid
 
-from models import Consent, ConsentRequest, Notification, Client, BankSettings
+from models import (
+    Consent, ConsentRequest, Notification, Client, BankSettings,
+    PaymentConsent, ProductAgreementConsent, VRPConsent
+)
+from config import config
+from services.cache import TTLCache, MISSING
+
+
+# consent_id (любого типа) -> person_id владельца, для атрибуции запросов
+consent_owner_cache = TTLCache(
+    max_size=config.CONSENT_OWNER_CACHE_SIZE,
+    ttl=config.CONSENT_OWNER_CACHE_TTL
+)
 
 
 class ConsentService:
@@ -346,5 +358,43 @@ class ConsentService:
         consent.revoked_at = datetime.utcnow()
         
         await db.commit()
+        ConsentService.invalidate_consent_owner(consent_id)
         return True
+    
+    @staticmethod
+    async def get_consent_owner(
+        db: AsyncSession,
+        consent_id: str
+    ) -> Optional[str]:
+        """
+        person_id клиента, выдавшего согласие любого типа
+        (account / payment / product-agreement / VRP)
+        
+        Результат (в т.ч. отсутствие согласия) кэшируется, так что повторные
+        запросы с тем же X-Consent-ID не ходят в БД.
+        """
+        cached = consent_owner_cache.get(consent_id)
+        if cached is not MISSING:
+            return cached
+        
+        # Один запрос по всем таблицам согласий вместо четырех последовательных
+        owners = union_all(*[
+            select(model.client_id.label("client_id")).where(model.consent_id == consent_id)
+            for model in (Consent, PaymentConsent, ProductAgreementConsent, VRPConsent)
+        ]).subquery()
+        
+        result = await db.execute(
+            select(Client.person_id)
+            .join(owners, owners.c.client_id == Client.id)
+            .limit(1)
+        )
+        person_id = result.scalar_one_or_none()
+        
+        consent_owner_cache.set(consent_id, person_id)
+        return person_id
+    
+    @staticmethod
+    def invalidate_consent_owner(consent_id: str):
+        """Сбросить кэш атрибуции при отзыве/удалении согласия"""
+        consent_owner_cache.invalidate(consent_id)
 
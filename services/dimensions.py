@@ -0,0 +1,143 @@
+"""
+Кэш справочников для отрисовки транзакций: мерчанты и карты
+
+Страница истории транзакций раньше делала еще два запроса (selectinload merchant
+и card). Мерчантов немного и они почти не меняются - держим их все в памяти
+(загрузка при старте, периодическое обновление, дозагрузка при промахе).
+Карты кэшируются по счету: краткое описание (маскированный номер, тип, название);
+выпуск и удаление карты сбрасывают кэш счета.
+"""
+import asyncio
+import logging
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import config
+from database import AsyncSessionLocal
+from models import Card, Merchant
+from services.cache import TTLCache, MISSING
+
+logger = logging.getLogger(__name__)
+
+
+def _merchant_summary(merchant: Merchant) -> dict:
+    return {
+        "merchantId": merchant.merchant_id,
+        "name": merchant.name,
+        "mccCode": merchant.mcc_code,
+        "category": merchant.category,
+        "city": merchant.city,
+        "country": merchant.country,
+        "address": merchant.address
+    }
+
+
+def _card_summary(card: Card) -> dict:
+    return {
+        "cardId": card.card_id,
+        "cardNumber": "****" + card.card_number[-4:],
+        "cardType": card.card_type,
+        "cardName": card.card_name
+    }
+
+
+class DimensionCache:
+    """Мерчанты (id -> dict) и карты по счетам (singleton `dimension_cache`)"""
+
+    def __init__(self):
+        self._merchants: Dict[int, dict] = {}
+        self._cards = TTLCache(max_size=config.CARD_CACHE_SIZE, ttl=config.CARD_CACHE_TTL)
+        self._task: Optional[asyncio.Task] = None
+
+        self.merchant_misses = 0
+
+    # === Lifecycle ===
+
+    async def start(self):
+        """Загрузить мерчантов и запустить периодическое обновление (вызывается из lifespan)"""
+        try:
+            await self.reload_merchants()
+        except Exception as e:
+            logger.error(f"Failed to warm merchant cache: {e}")
+
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # === Merchants ===
+
+    async def reload_merchants(self):
+        """Перечитать всех мерчантов"""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(Merchant))
+            self._merchants = {m.id: _merchant_summary(m) for m in result.scalars().all()}
+
+        logger.info(f"Merchant cache loaded: {len(self._merchants)} merchants")
+
+    async def merchants(self, db: AsyncSession, merchant_ids: Iterable[Optional[int]]) -> Dict[int, dict]:
+        """Описания мерчантов по id (отсутствующие в кэше дочитываются из БД)"""
+        ids = {merchant_id for merchant_id in merchant_ids if merchant_id is not None}
+
+        missing = [merchant_id for merchant_id in ids if merchant_id not in self._merchants]
+        if missing:
+            self.merchant_misses += 1
+            result = await db.execute(select(Merchant).where(Merchant.id.in_(missing)))
+            for merchant in result.scalars().all():
+                self._merchants[merchant.id] = _merchant_summary(merchant)
+
+        return {merchant_id: self._merchants[merchant_id] for merchant_id in ids if merchant_id in self._merchants}
+
+    # === Cards ===
+
+    async def cards(self, db: AsyncSession, account_id: int, card_ids: Iterable[Optional[int]]) -> Dict[int, dict]:
+        """Описания карт по id; карты счета `account_id` кэшируются целиком"""
+        ids = {card_id for card_id in card_ids if card_id is not None}
+        if not ids:
+            return {}
+
+        account_cards = self._cards.get(account_id)
+        if account_cards is MISSING:
+            result = await db.execute(select(Card).where(Card.account_id == account_id))
+            account_cards = {card.id: _card_summary(card) for card in result.scalars().all()}
+            self._cards.set(account_id, account_cards)
+
+        # Карта другого счета (или удаленная) - без кэша
+        foreign = [card_id for card_id in ids if card_id not in account_cards]
+        found = {card_id: account_cards[card_id] for card_id in ids if card_id in account_cards}
+        if foreign:
+            result = await db.execute(select(Card).where(Card.id.in_(foreign)))
+            found.update({card.id: _card_summary(card) for card in result.scalars().all()})
+
+        return found
+
+    def invalidate_cards(self, account_id: int):
+        """Сбросить кэш карт счета (выпуск / удаление карты)"""
+        self._cards.invalidate(account_id)
+
+    def stats(self) -> dict:
+        return {
+            "merchants": len(self._merchants),
+            "merchant_misses": self.merchant_misses,
+            "cards": self._cards.stats()
+        }
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(config.MERCHANT_CACHE_REFRESH_INTERVAL)
+            try:
+                await self.reload_merchants()
+            except Exception as e:
+                logger.error(f"Failed to refresh merchant cache: {e}")
+
+
+# Singleton instance
+dimension_cache = DimensionCache()
@@ -0,0 +1,275 @@
+"""
+Отправка логов API вызовов в реестр (Directory, config.REGISTRY_URL)
+
+Фоновый воркер читает api_calls_log по курсору (high-watermark по id, хранится
+в directory_sync_state), а не поиском по флагу synced_to_directory: каждая
+пачка - range scan по первичному ключу от последнего отправленного id.
+
+- пачка (до DIRECTORY_SYNC_BATCH_SIZE строк) уходит одним POST: NDJSON, gzip
+- после ответа 2xx строки пачки помечаются synced_to_directory одним UPDATE
+  по диапазону id, в той же транзакции сдвигается курсор
+- реестр недоступен - экспоненциальная пауза до DIRECTORY_SYNC_MAX_BACKOFF
+- пачка может быть отправлена повторно (упали между ответом реестра и commit):
+  реестр дедуплицирует строки по (bank_code, id)
+
+Логи пишутся пачками, и пачка с меньшими id может закоммититься позже, поэтому
+читаются только id до границы, за которой незакоммиченных строк уже нет:
+- граница фиксируется парой (last_value последовательности, затем xid
+  транзакции воркера - pg_current_xact_id())
+- она действительна, когда pg_snapshot_xmin текущего снапшота дорастет до этого
+  xid: все транзакции, получившие id до фиксации, завершены (writer логов,
+  api_log_queue, получает xid до выдачи id, поэтому их xid меньше)
+Строки отправляются с задержкой в один-два цикла; долгая пишущая транзакция
+приостанавливает отправку до своего завершения.
+"""
+import asyncio
+import gzip
+import json
+import logging
+import random
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import select, text, update
+
+from config import config
+from database import AsyncSessionLocal
+from models import APICallLog, DirectorySyncState
+from services.http_clients import bank_http_clients
+
+logger = logging.getLogger(__name__)
+
+# Ключ advisory lock: отправляет один экземпляр приложения
+DIRECTORY_SYNC_LOCK_ID = 815_005
+
+STATE_NAME = "api_calls_log"
+
+
+
+class RegistryUnavailableError(Exception):
+    """Реестр не принял пачку (сетевая ошибка или ответ не 2xx)"""
+
+
+def _serialize(row: APICallLog) -> dict:
+    return {
+        "id": row.id,
+        "bank_code": config.BANK_CODE,
+        "caller_id": row.caller_id,
+        "caller_type": row.caller_type,
+        "person_id": row.person_id,
+        "endpoint": row.endpoint,
+        "method": row.method,
+        "status_code": row.status_code,
+        "response_time_ms": row.response_time_ms,
+        "ip_address": row.ip_address,
+        "user_agent": row.user_agent,
+        "created_at": row.created_at.isoformat() + "Z"
+    }
+
+
+class DirectorySync:
+    """Воркер отправки api_calls_log в реестр (singleton `directory_sync`)"""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._consecutive_failures = 0
+        self._fence: Optional[Tuple[int, int]] = None  # (last_value последовательности, xid воркера)
+        self._settled_id: Optional[int] = None  # Все строки с id не больше - закоммичены или откачены
+
+        self.last_id = 0
+        self.last_created_at: Optional[datetime] = None
+        self.latest_id = 0  # Последний выданный id api_calls_log (для lag)
+        self.synced = 0
+        self.batches = 0
+        self.bytes_sent = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.last_success_at: Optional[datetime] = None
+
+    # === Lifecycle ===
+
+    async def start(self):
+        """Запустить воркер (вызывается из lifespan)"""
+        if not config.DIRECTORY_SYNC_ENABLED:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # === Sync ===
+
+    async def sync_batch(self) -> int:
+        """Отправить одну пачку; возвращает число отправленных строк"""
+        async with AsyncSessionLocal() as db:
+            locked = await db.scalar(text("SELECT pg_try_advisory_xact_lock(:id)"), {"id": DIRECTORY_SYNC_LOCK_ID})
+            if not locked:
+                return 0
+
+            settled_id = await self._advance_fence(db)
+            if settled_id is None:
+                # Первая граница еще не подтверждена
+                await db.commit()
+                return 0
+
+            state = await self._load_state(db, settled_id)
+
+            # Только по id: строки из spill-файла вставляются с новым id, но старым created_at
+            result = await db.execute(
+                select(APICallLog)
+                .where(APICallLog.id > state.last_id, APICallLog.id <= settled_id)
+                .order_by(APICallLog.id)
+                .limit(config.DIRECTORY_SYNC_BATCH_SIZE)
+            )
+            rows = list(result.scalars().all())
+            if not rows:
+                await db.commit()
+                return 0
+
+            await self._send(rows)
+
+            first_id, last_id = state.last_id, rows[-1].id
+            await db.execute(
+                update(APICallLog)
+                .where(
+                    APICallLog.id > first_id,
+                    APICallLog.id <= last_id,
+                    # Отсечение партиций: min по самим строкам пачки, включая строки из spill-файла
+                    APICallLog.created_at >= min(row.created_at for row in rows)
+                )
+                .values(synced_to_directory=True, synced_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            )
+
+            state.last_id = last_id
+            state.last_created_at = max(row.created_at for row in rows)
+            state.updated_at = datetime.utcnow()
+            await db.commit()
+
+        self.last_id = state.last_id
+        self.last_created_at = state.last_created_at
+        self.synced += len(rows)
+        self.batches += 1
+        return len(rows)
+
+    async def _advance_fence(self, db) -> Optional[int]:
+        """Подтвердить границу, если все транзакции до ее фиксации завершены, и зафиксировать следующую"""
+        xmin = int(await db.scalar(text("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint")))
+        if self._fence is not None and xmin >= self._fence[1]:
+            self._settled_id = max(self._settled_id or 0, self._fence[0])
+            self._fence = None
+
+        if self._fence is None:
+            # Сначала последовательность, потом свой xid: xid всех, кто уже получил id, меньше него
+            # (pg_snapshot_xmax не подходит - это последний завершенный xid + 1, а не следующий выданный)
+            self.latest_id = int(await db.scalar(
+                text("SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM api_calls_log_id_seq")
+            ))
+            xid = int(await db.scalar(text("SELECT pg_current_xact_id()::text::bigint")))
+            self._fence = (self.latest_id, xid)
+
+        return self._settled_id
+
+    async def _load_state(self, db, settled_id: int) -> DirectorySyncState:
+        state = await db.get(DirectorySyncState, STATE_NAME)
+        if state is None:
+            # Первый запуск: продолжить с первой неотправленной строки (единственный поиск по флагу),
+            # но не дальше границы - строки за ней могут быть еще не видны
+            first_unsynced = await db.scalar(
+                select(APICallLog.id).where(APICallLog.synced_to_directory.isnot(True)).order_by(APICallLog.id).limit(1)
+            )
+            if first_unsynced is None:
+                last_id = await db.scalar(select(APICallLog.id).order_by(APICallLog.id.desc()).limit(1)) or 0
+            else:
+                last_id = first_unsynced - 1
+            last_id = min(last_id, settled_id)
+
+            state = DirectorySyncState(name=STATE_NAME, last_id=last_id)
+            db.add(state)
+            await db.flush()
+
+        return state
+
+    async def _send(self, rows: List[APICallLog]):
+        payload = "".join(json.dumps(_serialize(row), ensure_ascii=False) + "\n" for row in rows)
+        body = gzip.compress(payload.encode("utf-8"))
+
+        client = bank_http_clients.for_url(config.REGISTRY_URL)
+        try:
+            # Повторы - в _run с паузой, не в клиенте
+            response = await client.post(
+                config.DIRECTORY_SYNC_PATH,
+                content=body,
+                headers={
+                    "Content-Type": "application/x-ndjson",
+                    "Content-Encoding": "gzip",
+                    "X-Bank-Code": config.BANK_CODE
+                },
+                retries=0
+            )
+        except Exception as e:
+            raise RegistryUnavailableError(f"{type(e).__name__}: {e}")
+
+        if response.status_code >= 300:
+            raise RegistryUnavailableError(f"Registry responded {response.status_code}")
+
+        self.bytes_sent += len(body)
+
+    def stats(self) -> dict:
+        rows_behind = max(self.latest_id - self.last_id, 0)
+        seconds_behind = None
+        if rows_behind and self.last_created_at:
+            seconds_behind = round((datetime.utcnow() - self.last_created_at).total_seconds(), 1)
+
+        return {
+            "enabled": config.DIRECTORY_SYNC_ENABLED,
+            "registry_url": config.REGISTRY_URL,
+            "last_id": self.last_id,
+            # Оценка сверху: id последовательности с пропусками
+            "lag_rows": rows_behind,
+            "lag_seconds": seconds_behind if rows_behind else 0,
+            "synced": self.synced,
+            "batches": self.batches,
+            "bytes_sent": self.bytes_sent,
+            "failures": self.failures,
+            "consecutive_failures": self._consecutive_failures,
+            "last_error": self.last_error,
+            "last_success_at": self.last_success_at.isoformat() + "Z" if self.last_success_at else None
+        }
+
+    async def _run(self):
+        delay = config.DIRECTORY_SYNC_INTERVAL
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                sent = await self.sync_batch()
+            except Exception as e:
+                self.failures += 1
+                self._consecutive_failures += 1
+                self.last_error = str(e)
+                if self._consecutive_failures == 1:
+                    logger.warning(f"Directory sync failed, backing off: {e}")
+
+                # Экспоненциальная пауза с jitter, пока реестр не ответит
+                backoff = config.DIRECTORY_SYNC_INTERVAL * (2 ** min(self._consecutive_failures, 10))
+                delay = random.uniform(0.5, 1.0) * min(config.DIRECTORY_SYNC_MAX_BACKOFF, backoff)
+                continue
+
+            if self._consecutive_failures:
+                logger.info(f"Directory sync recovered after {self._consecutive_failures} failures")
+            self._consecutive_failures = 0
+            self.last_error = None
+            self.last_success_at = datetime.utcnow()
+
+            # Полная пачка - отставание есть, следующую отправляем сразу
+            delay = 0 if sent >= config.DIRECTORY_SYNC_BATCH_SIZE else config.DIRECTORY_SYNC_INTERVAL
+
+
+# Singleton instance
+directory_sync = DirectorySync()
@@ -0,0 +1,151 @@
+"""
+Шина событий мониторинга (in-process) и SSE поток для дашборда
+
+Раньше каждая открытая вкладка мониторинга сама опрашивала /admin/capital,
+/admin/stats и /admin/payments. Теперь:
+- PaymentService, прием межбанковских переводов и InterbankDispatcher
+  публикуют события (новый платеж, статус перевода) в `event_bus`
+- один фоновый producer раз в MONITORING_PUSH_INTERVAL читает капитал и
+  счетчики (из их кэшей) и публикует их, только если они изменились
+  и есть хотя бы один подписчик
+- GET /admin/events отдает события подписчику как text/event-stream
+
+Сообщение сериализуется один раз и раздается всем подписчикам; медленный
+подписчик теряет самые старые события, а не тормозит остальных.
+"""
+import asyncio
+import json
+import logging
+from datetime import datetime
+from decimal import Decimal
+from typing import AsyncIterator, Dict, Optional, Set
+
+from config import config
+from services.bank_stats import bank_stats
+from services.capital import capital_aggregator
+
+logger = logging.getLogger(__name__)
+
+
+def _default(obj):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, datetime):
+        return obj.isoformat() + "Z"
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _format(event_type: str, data: dict) -> str:
+    """Сообщение SSE"""
+    return f"event: {event_type}\ndata: {json.dumps(data, default=_default, ensure_ascii=False)}\n\n"
+
+
+class EventBus:
+    """Шина событий мониторинга (singleton `event_bus`)"""
+
+    def __init__(self):
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._snapshots: Dict[str, str] = {}  # Последние capital / stats - сразу новому подписчику
+        self._task: Optional[asyncio.Task] = None
+
+        self.published = 0
+        self.dropped = 0
+
+    # === Lifecycle ===
+
+    async def start(self):
+        """Запустить producer капитала и счетчиков (вызывается из lifespan)"""
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # === Publish / subscribe ===
+
+    def publish(self, event_type: str, data: dict):
+        """Опубликовать событие всем подписчикам (не блокирует, без подписчиков - no-op)"""
+        if not self._subscribers:
+            return
+
+        message = _format(event_type, data)
+        self.published += 1
+
+        for queue in self._subscribers:
+            if queue.full():
+                # Медленный подписчик - выбросить самое старое событие
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(message)
+
+    async def stream(self) -> AsyncIterator[str]:
+        """Поток SSE для одного подписчика: последние снимки, затем события и heartbeat"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=config.MONITORING_SUBSCRIBER_QUEUE)
+        self._subscribers.add(queue)
+        try:
+            yield f"retry: {int(config.MONITORING_PUSH_INTERVAL * 1000)}\n\n"
+            for message in self._snapshots.values():
+                yield message
+
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=config.MONITORING_HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    # Комментарий SSE - держит соединение открытым через прокси
+                    yield ": ping\n\n"
+        finally:
+            self._subscribers.discard(queue)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "dropped": self.dropped
+        }
+
+    # === Producer ===
+
+    async def _run(self):
+        while True:
+            if self._subscribers:
+                try:
+                    await self._publish_snapshots()
+                except Exception as e:
+                    logger.error(f"Monitoring snapshot failed: {e}")
+
+            await asyncio.sleep(config.MONITORING_PUSH_INTERVAL)
+
+    async def _publish_snapshots(self):
+        """Опубликовать капитал и счетчики, если изменились с прошлого раза"""
+        capital = await capital_aggregator.snapshot()
+        stats = await bank_stats.snapshot()
+
+        snapshots = {
+            "capital": {"banks": capital["banks"]},
+            "stats": {
+                "accounts_count": stats["accounts_count"],
+                "clients_count": stats["clients_count"],
+                "total_balance": stats["total_balance"],
+                "payments_count": stats["payments_count"],
+                # Без age_seconds - иначе снимок "меняется" каждый раз
+                "refreshed_at": stats["staleness"]["refreshed_at"],
+                "stale": stats["staleness"]["stale"]
+            }
+        }
+
+        for event_type, data in snapshots.items():
+            message = _format(event_type, data)
+            if self._snapshots.get(event_type) == message:
+                continue
+
+            self._snapshots[event_type] = message
+            self.publish(event_type, data)
+
+
+# Singleton instance
+event_bus = EventBus()
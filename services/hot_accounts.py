@@ -0,0 +1,96 @@
+"""
+Горячие счета - зачисления без блокировки строки accounts
+
+Счета из HOT_ACCOUNTS (расчетные счета мерчантов, демо-счета команд и т.п.)
+получают большую долю зачислений; с блокировкой строки все они выстраиваются
+в очередь. Для таких счетов LedgerService дописывает зачисления
+в account_pending_credits, а HotAccountCompactor переносит их в баланс пачками.
+"""
+import asyncio
+import logging
+from typing import Optional
+
+from sqlalchemy import select
+
+from config import config
+from database import AsyncSessionLocal
+from models import Account
+from services.ledger import LedgerService
+
+logger = logging.getLogger(__name__)
+
+
+class HotAccountCompactor:
+    """Фоновый перенос незачисленных поступлений в балансы (singleton `hot_account_compactor`)"""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+        self.folded = 0
+        self.last_error: Optional[str] = None
+
+    async def start(self):
+        """Определить горячие счета и запустить компактор (вызывается из lifespan)"""
+        if not config.HOT_ACCOUNTS:
+            return
+
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Account.id).where(Account.account_number.in_(config.HOT_ACCOUNTS))
+            )
+            account_ids = result.scalars().all()
+
+        LedgerService.set_hot_accounts(account_ids)
+        logger.info(f"Hot accounts enabled: {len(account_ids)} of {len(config.HOT_ACCOUNTS)} configured")
+
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        # Перенести все, что успело накопиться
+        if config.HOT_ACCOUNTS:
+            try:
+                while await self.compact_once():
+                    pass
+            except Exception as e:
+                logger.error(f"Final hot account compaction failed: {e}")
+
+    async def compact_once(self) -> int:
+        """Перенести одну пачку поступлений, вернуть их количество"""
+        async with AsyncSessionLocal() as db:
+            folded = await LedgerService.fold_pending_credits(db, config.HOT_ACCOUNT_COMPACT_BATCH)
+            await db.commit()
+
+        self.folded += folded
+        return folded
+
+    def stats(self) -> dict:
+        return {
+            "hot_accounts": len(config.HOT_ACCOUNTS),
+            "folded": self.folded,
+            "last_error": self.last_error
+        }
+
+    async def _run(self):
+        while True:
+            try:
+                folded = await self.compact_once()
+                self.last_error = None
+            except Exception as e:
+                logger.error(f"Hot account compaction failed: {e}")
+                self.last_error = str(e)
+                folded = 0
+
+            if folded < config.HOT_ACCOUNT_COMPACT_BATCH:
+                await asyncio.sleep(config.HOT_ACCOUNT_COMPACT_INTERVAL)
+
+
+# Singleton instance
+hot_account_compactor = HotAccountCompactor()
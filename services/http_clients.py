@@ -0,0 +1,263 @@
+"""
+Общие HTTP клиенты для межбанковских вызовов
+
+Один долгоживущий httpx.AsyncClient на каждый банк (origin): keep-alive и пул
+соединений переиспользуются между запросами. Поверх клиента - ретраи с jitter
+и circuit breaker, чтобы один лежащий банк не держал пул и воркеры.
+"""
+import asyncio
+import logging
+import random
+import time
+from collections import OrderedDict
+from typing import Optional, Set
+from urllib.parse import urlsplit
+
+import httpx
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Методы, которые безопасно повторять после отправки запроса
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+# Ошибки, при которых запрос гарантированно не дошел до банка
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class CircuitOpenError(httpx.RequestError):
+    """Банк недоступен: circuit breaker открыт, запрос не отправлялся"""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker на банк
+
+    closed -> open после `failure_threshold` ошибок подряд;
+    через `reset_timeout` секунд пропускается один пробный запрос (half-open):
+    успех закрывает breaker, ошибка снова открывает.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+            # Пропустить один пробный запрос
+            self.state = "half_open"
+            return True
+
+        return False
+
+    def record_success(self):
+        self.state = "closed"
+        self.consecutive_failures = 0
+
+    def release_trial(self):
+        """
+        Запрос завершился без результата (отменен, ошибка не HTTP): не успех и не отказ банка
+
+        Пробный запрос half-open освобождается - следующий allow() пропустит новый,
+        иначе breaker навсегда остался бы в half_open и не пропускал ничего.
+        """
+        if self.state == "half_open":
+            self.state = "open"
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+
+class BankClient:
+    """HTTP клиент одного банка: пул соединений + ретраи + circuit breaker"""
+
+    def __init__(self, base_url: str, timeout: float):
+        self.base_url = base_url
+        self.timeout = timeout
+
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=config.INTERBANK_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=config.INTERBANK_HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=config.INTERBANK_HTTP_KEEPALIVE_EXPIRY
+            ),
+            http2=config.INTERBANK_HTTP2
+        )
+        self.breaker = CircuitBreaker(
+            failure_threshold=config.INTERBANK_BREAKER_FAILURES,
+            reset_timeout=config.INTERBANK_BREAKER_RESET_TIMEOUT
+        )
+
+        # Метрики
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.retries = 0
+        self.rejected = 0
+
+    async def request(self, method: str, url: str, retries: Optional[int] = None, **kwargs) -> httpx.Response:
+        """
+        Выполнить запрос
+
+        Ответы 5xx и сетевые ошибки повторяются с экспоненциальной задержкой и jitter:
+        для идемпотентных методов - всегда, для POST - только если запрос не был отправлен.
+        """
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise CircuitOpenError(f"Circuit open for {self.base_url}")
+
+        method = method.upper()
+        max_retries = config.INTERBANK_HTTP_RETRIES if retries is None else retries
+        attempt = 0
+
+        while True:
+            self.requests += 1
+            self.in_flight += 1
+            recorded = False
+            try:
+                response = await self._client.request(method, url, **kwargs)
+            except httpx.HTTPError as e:
+                self.failures += 1
+                self.breaker.record_failure()
+                recorded = True
+
+                retryable = method in IDEMPOTENT_METHODS or isinstance(e, NOT_SENT_ERRORS)
+                if attempt >= max_retries or not retryable or not self.breaker.allow():
+                    raise
+            else:
+                recorded = True
+                if response.status_code < 500:
+                    self.breaker.record_success()
+                    return response
+
+                self.failures += 1
+                self.breaker.record_failure()
+
+                if attempt >= max_retries or method not in IDEMPOTENT_METHODS or not self.breaker.allow():
+                    return response
+            finally:
+                self.in_flight -= 1
+                if not recorded:
+                    # CancelledError (например, проигравшая проба AccountDirectory) и прочие не HTTP ошибки
+                    self.breaker.release_trial()
+
+            attempt += 1
+            self.retries += 1
+            await asyncio.sleep(_backoff(attempt))
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    def stats(self) -> dict:
+        return {
+            "base_url": self.base_url,
+            "timeout": self.timeout,
+            "in_flight": self.in_flight,
+            "max_connections": config.INTERBANK_HTTP_MAX_CONNECTIONS,
+            "pool_saturation": round(self.in_flight / config.INTERBANK_HTTP_MAX_CONNECTIONS, 3),
+            "requests": self.requests,
+            "failures": self.failures,
+            "retries": self.retries,
+            "rejected_by_breaker": self.rejected,
+            "breaker": {
+                "state": self.breaker.state,
+                "consecutive_failures": self.breaker.consecutive_failures,
+                "times_opened": self.breaker.times_opened
+            }
+        }
+
+
+class BankHttpClients:
+    """
+    Реестр BankClient по origin банка (закрывается в lifespan)
+
+    Origin может прийти от клиента (multibank_proxy: bank_url из запроса), поэтому
+    реестр ограничен INTERBANK_HTTP_MAX_CLIENTS: при переполнении давно не
+    использованные клиенты без запросов в полете закрываются (LRU).
+    """
+
+    def __init__(self):
+        self._clients: "OrderedDict[str, BankClient]" = OrderedDict()
+        self._closing: Set[asyncio.Task] = set()
+        self.evicted = 0
+
+    def for_bank(self, bank_code: str) -> BankClient:
+        """Клиент банка в Docker сети (http://{bank_code}:8000)"""
+        return self.for_url(f"http://{bank_code}:8000")
+
+    def for_url(self, url: str) -> BankClient:
+        """Клиент по произвольному URL банка (используется origin URL)"""
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+
+        client = self._clients.get(origin)
+        if client is not None:
+            self._clients.move_to_end(origin)
+            return client
+
+        timeout = config.INTERBANK_HTTP_HOST_TIMEOUTS.get(parts.hostname or "", config.INTERBANK_HTTP_TIMEOUT)
+        client = BankClient(origin, timeout=timeout)
+        self._clients[origin] = client
+        self._evict(keep=origin)
+        return client
+
+    def _evict(self, keep: str):
+        """Закрыть давно не использованных клиентов сверх лимита (кроме занятых запросами)"""
+        excess = len(self._clients) - config.INTERBANK_HTTP_MAX_CLIENTS
+        if excess <= 0:
+            return
+
+        idle = [
+            origin for origin, client in self._clients.items()
+            if client.in_flight == 0 and origin != keep
+        ]
+        for origin in idle[:excess]:
+            client = self._clients.pop(origin)
+            self.evicted += 1
+
+            task = asyncio.get_running_loop().create_task(client.aclose())
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+
+    async def close(self):
+        clients, self._clients = self._clients, OrderedDict()
+        for client in clients.values():
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning(f"Failed to close HTTP client {client.base_url}: {e}")
+
+    def stats(self) -> dict:
+        return {origin: client.stats() for origin, client in self._clients.items()}
+
+
+def _backoff(attempt: int) -> float:
+    """Экспоненциальная задержка с full jitter"""
+    delay = min(config.INTERBANK_HTTP_BACKOFF_MAX, config.INTERBANK_HTTP_BACKOFF_BASE * (2 ** (attempt - 1)))
+    return random.uniform(0, delay)
+
+
+# Singleton instance
+bank_http_clients = BankHttpClients()
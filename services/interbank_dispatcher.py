@@ -0,0 +1,424 @@
+"""
+Фоновая отправка межбанковских переводов из outbox
+
+PaymentService.initiate_payment только списывает деньги и пишет InterbankOutbox
+в той же транзакции; платеж сразу возвращается в статусе AcceptedSettlementInProcess.
+Диспетчер забирает ожидающие записи, группирует по банку-получателю, отправляет
+пачками (POST /interbank/receive-batch) и фиксирует итог: перевод завершен,
+либо отклонен и деньги возвращены отправителю. Если итог так и остался неизвестен
+после INTERBANK_DISPATCH_MAX_ATTEMPTS попыток, перевод уходит на ручной разбор
+(manual_review) без возврата денег - банк-получатель мог его зачислить.
+
+Повторная отправка безопасна - /interbank/receive и /interbank/receive-batch
+идемпотентны по transfer_id.
+"""
+import asyncio
+import logging
+import random
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+import httpx
+from sqlalchemy import select, func
+
+from config import config
+from database import AsyncSessionLocal
+from models import InterbankOutbox, InterbankTransfer, Payment, Transaction
+from services.http_clients import bank_http_clients
+from services.ledger import LedgerService
+from services.payment_service import PaymentService
+from services.events import event_bus
+
+logger = logging.getLogger(__name__)
+
+
+class InterbankDispatcher:
+    """Диспетчер outbox межбанковских переводов (singleton `interbank_dispatcher`)"""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._batch_unsupported: Set[str] = set()  # Банки без /interbank/receive-batch
+
+        # Метрики
+        self.sent = 0
+        self.rejected = 0
+        self.retried = 0
+        self.manual_review = 0
+
+    # === Lifecycle ===
+
+    async def start(self):
+        """Запустить диспетчер (вызывается из lifespan)"""
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def notify(self):
+        """Разбудить диспетчер - в outbox появился новый перевод"""
+        self._wakeup.set()
+
+    # === Dispatch ===
+
+    async def dispatch_once(self) -> int:
+        """Отправить одну пачку ожидающих переводов, вернуть их количество"""
+        entries = await self._claim()
+        if not entries:
+            return 0
+
+        by_bank: Dict[str, List[dict]] = defaultdict(list)
+        for entry in entries:
+            by_bank[entry["to_bank"]].append(entry)
+
+        await asyncio.gather(*(
+            self._dispatch_bank(bank_code, bank_entries)
+            for bank_code, bank_entries in by_bank.items()
+        ))
+        return len(entries)
+
+    async def stats(self) -> dict:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(InterbankOutbox.status, func.count(InterbankOutbox.id))
+                .group_by(InterbankOutbox.status)
+            )
+            by_status = {status: count for status, count in result.all()}
+
+        return {
+            "outbox": by_status,
+            "sent": self.sent,
+            "rejected": self.rejected,
+            "retried": self.retried,
+            "manual_review": self.manual_review
+        }
+
+    async def _run(self):
+        while True:
+            try:
+                processed = await self.dispatch_once()
+            except Exception as e:
+                logger.error(f"Interbank dispatch failed: {e}")
+                processed = 0
+
+            if processed:
+                # Есть очередь - сразу следующая пачка
+                continue
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=config.INTERBANK_DISPATCH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _claim(self) -> List[dict]:
+        """
+        Забрать пачку ожидающих записей
+
+        Записи не меняют статус, а получают lease (next_attempt_at в будущем):
+        если процесс упадет во время отправки, запись снова станет доступна.
+        """
+        now = datetime.utcnow()
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(InterbankOutbox)
+                .where(
+                    InterbankOutbox.status == "pending",
+                    InterbankOutbox.next_attempt_at <= now
+                )
+                .order_by(InterbankOutbox.id)
+                .limit(config.INTERBANK_DISPATCH_BATCH_SIZE)
+                .with_for_update(skip_locked=True)
+            )
+            rows = result.scalars().all()
+
+            lease_until = now + timedelta(seconds=config.INTERBANK_DISPATCH_LEASE)
+            claimed = []
+            for row in rows:
+                row.next_attempt_at = lease_until
+                claimed.append({
+                    "id": row.id,
+                    "transfer_id": row.transfer_id,
+                    "to_bank": row.to_bank,
+                    "to_account_number": row.to_account_number,
+                    "amount": row.amount,
+                    "description": row.description or ""
+                })
+
+            await db.commit()
+
+        return claimed
+
+    async def _dispatch_bank(self, bank_code: str, entries: List[dict]):
+        """Отправить переводы одного банка пачками и зафиксировать итоги"""
+        if len(entries) == 1 or bank_code in self._batch_unsupported:
+            outcomes = await self._send_each(entries)
+        else:
+            outcomes = {}
+            for start in range(0, len(entries), config.INTERBANK_SEND_BATCH_SIZE):
+                chunk = entries[start:start + config.INTERBANK_SEND_BATCH_SIZE]
+                outcomes.update(await self._send_batch(bank_code, chunk))
+
+        semaphore = asyncio.Semaphore(config.INTERBANK_DISPATCH_CONCURRENCY)
+
+        async def complete(entry: dict):
+            async with semaphore:
+                outcome, error = outcomes[entry["transfer_id"]]
+                try:
+                    await self._complete(entry, outcome, error)
+                except Exception as e:
+                    # Запись останется pending и будет отправлена повторно после lease
+                    logger.error(f"Failed to record outcome of {entry['transfer_id']}: {e}")
+
+        await asyncio.gather(*(complete(entry) for entry in entries))
+
+    async def _send_batch(self, bank_code: str, entries: List[dict]) -> Dict[str, Tuple[str, Optional[str]]]:
+        """Отправить пачку через POST /interbank/receive-batch"""
+        try:
+            response = await bank_http_clients.for_bank(bank_code).post(
+                "/interbank/receive-batch",
+                json={"transfers": [_payload(entry) for entry in entries]},
+                headers={
+                    "x-bank-auth-token": config.BANK_CODE,
+                    "Content-Type": "application/json"
+                },
+                retries=0
+            )
+        except httpx.HTTPError as e:
+            error = str(e) or e.__class__.__name__
+            return {entry["transfer_id"]: ("retry", error) for entry in entries}
+
+        if response.status_code == 200:
+            results = {r["transfer_id"]: r for r in response.json().get("results", [])}
+            outcomes = {}
+            for entry in entries:
+                result = results.get(entry["transfer_id"])
+                if result is None:
+                    outcomes[entry["transfer_id"]] = ("retry", "Missing in batch response")
+                elif result["status"] in ("completed", "duplicate"):
+                    outcomes[entry["transfer_id"]] = ("sent", None)
+                else:
+                    outcomes[entry["transfer_id"]] = ("rejected", result.get("message"))
+            return outcomes
+
+        if response.status_code >= 500 or response.status_code == 429:
+            error = f"{response.status_code} - {response.text[:500]}"
+            return {entry["transfer_id"]: ("retry", error) for entry in entries}
+
+        if response.status_code == 413 and len(entries) > 1:
+            # Пачка больше INTERBANK_RECEIVE_BATCH_MAX банка-получателя - пополам
+            middle = len(entries) // 2
+            outcomes = await self._send_batch(bank_code, entries[:middle])
+            outcomes.update(await self._send_batch(bank_code, entries[middle:]))
+            return outcomes
+
+        if response.status_code in (403, 404, 405):
+            # Банк не поддерживает пачки (или не принимает их от нас) - дальше отправлять по одному
+            logger.warning(
+                f"{bank_code} rejected /interbank/receive-batch with {response.status_code}, "
+                f"sending transfers one by one: {response.text[:200]}"
+            )
+            self._batch_unsupported.add(bank_code)
+
+        # Пачка отклонена целиком - по одному, чтобы отделить проблемный перевод
+        return await self._send_each(entries)
+
+    async def _send_each(self, entries: List[dict]) -> Dict[str, Tuple[str, Optional[str]]]:
+        """Отправить переводы по одному (с ограничением параллельности)"""
+        semaphore = asyncio.Semaphore(config.INTERBANK_DISPATCH_CONCURRENCY)
+
+        async def send(entry: dict):
+            async with semaphore:
+                return entry["transfer_id"], await self._send(entry)
+
+        return dict(await asyncio.gather(*(send(entry) for entry in entries)))
+
+    async def _send(self, entry: dict) -> Tuple[str, Optional[str]]:
+        """
+        Отправить один перевод в банк-получатель
+
+        Returns:
+            ("sent" | "retry" | "rejected", описание ошибки)
+        """
+        try:
+            response = await bank_http_clients.for_bank(entry["to_bank"]).post(
+                "/interbank/receive",
+                json=_payload(entry),
+                headers={
+                    "x-bank-auth-token": config.BANK_CODE,
+                    "Content-Type": "application/json"
+                },
+                retries=0  # Повторы выполняет сам диспетчер (с backoff в outbox)
+            )
+        except httpx.HTTPError as e:
+            return "retry", str(e) or e.__class__.__name__
+
+        if response.status_code in (200, 201):
+            return "sent", None
+
+        error = f"{response.status_code} - {response.text[:500]}"
+        if response.status_code >= 500 or response.status_code == 429:
+            return "retry", error
+
+        # 4xx - банк-получатель отклонил перевод (например, счет не найден)
+        return "rejected", error
+
+    async def _complete(self, entry: dict, outcome: str, error: Optional[str]):
+        """Зафиксировать итог отправки в outbox, переводе и платеже"""
+        async with AsyncSessionLocal() as db:
+            outbox = await db.get(InterbankOutbox, entry["id"], with_for_update=True)
+            if outbox is None or outbox.status != "pending":
+                return
+
+            now = datetime.utcnow()
+
+            if outcome == "retry":
+                # Результат неизвестен (таймаут, 5xx) - только повтор, без возврата денег:
+                # банк-получатель мог успеть зачислить перевод
+                outbox.attempts += 1
+                outbox.last_error = error
+
+                if outbox.attempts >= config.INTERBANK_DISPATCH_MAX_ATTEMPTS:
+                    await self._give_up(db, outbox, entry, error)
+                    return
+
+                outbox.next_attempt_at = now + timedelta(seconds=_backoff(outbox.attempts))
+                await db.commit()
+
+                self.retried += 1
+                logger.warning(f"Interbank transfer {entry['transfer_id']} will be retried (attempt {outbox.attempts}): {error}")
+                return
+
+            transfer_result = await db.execute(
+                select(InterbankTransfer).where(InterbankTransfer.transfer_id == entry["transfer_id"])
+            )
+            transfer = transfer_result.scalar_one()
+
+            payment_result = await db.execute(
+                select(Payment).where(Payment.payment_id == transfer.payment_id)
+            )
+            payment = payment_result.scalar_one_or_none()
+
+            outbox.attempts += 1
+            outbox.last_error = error
+
+            if outcome == "sent":
+                outbox.status = "sent"
+                transfer.status = "completed"
+                transfer.completed_at = now
+                if payment:
+                    payment.status = "AcceptedSettlementCompleted"
+                    payment.status_update_date_time = now
+
+                # Обновить капитал банка-отправителя (-amount) - коммитит все изменения
+                await PaymentService.update_bank_capital(
+                    db=db,
+                    amount_change=-transfer.amount,
+                    reason=f"Outgoing transfer to {transfer.to_bank}: {transfer.transfer_id}",
+                    reference=transfer.transfer_id
+                )
+
+                self.sent += 1
+                _publish_outcome(transfer, payment)
+                logger.info(f"Interbank transfer {transfer.transfer_id} completed: {config.BANK_CODE} -> {transfer.to_bank}, {transfer.amount} RUB")
+                return
+
+            # Отклонен - вернуть деньги отправителю
+            outbox.status = "failed"
+            transfer.status = "failed"
+            if payment:
+                payment.status = "Rejected"
+                payment.status_update_date_time = now
+
+                await LedgerService.credit(db, payment.account_id, transfer.amount)
+
+                db.add(Transaction(
+                    account_id=payment.account_id,
+                    transaction_id=f"tx-{uuid.uuid4().hex[:12]}",
+                    amount=transfer.amount,
+                    direction="credit",
+                    description=f"Возврат неудачного перевода в {transfer.to_bank}",
+                    transaction_date=now
+                ))
+
+            await db.commit()
+
+            self.rejected += 1
+            _publish_outcome(transfer, payment)
+            logger.warning(f"Interbank transfer {transfer.transfer_id} rejected by {transfer.to_bank}, refunded to sender: {error}")
+
+    async def _give_up(self, db, outbox: InterbankOutbox, entry: dict, error: Optional[str]):
+        """
+        Прекратить повторы: перевод на ручной разбор
+
+        Деньги не возвращаются - итог неизвестен, и банк-получатель мог
+        зачислить перевод; платеж остается AcceptedSettlementInProcess.
+        """
+        outbox.status = "manual_review"
+
+        transfer_result = await db.execute(
+            select(InterbankTransfer).where(InterbankTransfer.transfer_id == entry["transfer_id"])
+        )
+        transfer = transfer_result.scalar_one()
+        transfer.status = "manual_review"
+
+        payment_result = await db.execute(
+            select(Payment).where(Payment.payment_id == transfer.payment_id)
+        )
+        payment = payment_result.scalar_one_or_none()
+
+        await db.commit()
+
+        self.manual_review += 1
+        _publish_outcome(transfer, payment)
+        logger.error(
+            f"Interbank transfer {transfer.transfer_id} to {transfer.to_bank} needs manual review: "
+            f"no definite outcome after {outbox.attempts} attempts, last error: {error}"
+        )
+
+
+def _publish_outcome(transfer: InterbankTransfer, payment: Optional[Payment]):
+    """Итог исходящего перевода - в ленту мониторинга"""
+    event_bus.publish("interbank_transfer", {
+        "transfer_id": transfer.transfer_id,
+        "direction": "outgoing",
+        "from_bank": transfer.from_bank,
+        "to_bank": transfer.to_bank,
+        "amount": transfer.amount,
+        "status": transfer.status
+    })
+    if payment:
+        event_bus.publish("payment_status", {
+            "payment_id": payment.payment_id,
+            "status": payment.status
+        })
+
+
+def _payload(entry: dict) -> dict:
+    """Тело перевода для /interbank/receive и /interbank/receive-batch"""
+    return {
+        "transfer_id": entry["transfer_id"],
+        "from_bank": config.BANK_CODE,
+        "to_account_number": entry["to_account_number"],
+        "amount": str(entry["amount"]),
+        "currency": "RUB",
+        "description": entry["description"]
+    }
+
+
+def _backoff(attempt: int) -> float:
+    """Экспоненциальная задержка с jitter"""
+    delay = min(config.INTERBANK_DISPATCH_BACKOFF_MAX, config.INTERBANK_DISPATCH_BACKOFF_BASE * (2 ** (attempt - 1)))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+# Singleton instance
+interbank_dispatcher = InterbankDispatcher()
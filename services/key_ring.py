@@ -0,0 +1,279 @@
+"""
+Key ring RS256 ключей - свой ключ подписи и публичные ключи банков по kid
+
+Ключи читаются и парсятся один раз при старте, а не на каждый токен.
+Фоновая задача перечитывает локальные файлы при их изменении и обновляет
+JWKS других банков по TTL (с ETag), так что ротация ключей не требует рестарта.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import httpx
+from jose import jwk
+from jose.backends.base import Key
+
+from config import config
+from services.http_clients import bank_http_clients
+
+logger = logging.getLogger(__name__)
+
+KEYS_PATH = Path(__file__).parent.parent.parent.parent / "shared" / "keys"
+
+# Локальные адреса банков для загрузки JWKS по HTTP
+BANK_PORTS = {"vbank": 8001, "abank": 8002, "sbank": 8003}
+
+
+def default_kid(bank_code: str) -> str:
+    """kid по умолчанию, если в JWKS банка он не указан"""
+    return f"{bank_code}-2025"
+
+
+class KeyRing:
+    """
+    Ключи для подписи и проверки RS256 токенов
+
+    - `signing_key()` - (kid, приватный ключ) этого банка или None
+    - `get_verification_key(bank_code, kid)` - публичный ключ банка по kid
+    - `jwks_body()` - сериализованный JWKS этого банка для /.well-known/jwks.json
+    """
+
+    def __init__(self, keys_path: Path = KEYS_PATH):
+        self.keys_path = keys_path
+
+        self._signing_key: Optional[Tuple[str, Key]] = None
+        self._local_keys: Dict[str, Dict[str, Key]] = {}  # bank_code -> {kid: key}
+        self._remote_keys: Dict[str, Dict[str, Key]] = {}
+        self._remote_meta: Dict[str, dict] = {}  # bank_code -> {"etag", "fetched_at"}
+        self._jwks_body: bytes = b""
+        self._jwks_etag: str = ""
+        self._mtimes: Dict[Path, float] = {}
+        self._loaded = False
+
+        self._task: Optional[asyncio.Task] = None
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    # === Lifecycle ===
+
+    async def start(self):
+        """Загрузить ключи и запустить фоновое обновление (вызывается из lifespan)"""
+        self.load_local()
+        self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # === Public API ===
+
+    def signing_key(self) -> Optional[Tuple[str, Key]]:
+        if not self._loaded:
+            self.load_local()
+        return self._signing_key
+
+    def jwks_body(self) -> bytes:
+        if not self._loaded:
+            self.load_local()
+        return self._jwks_body
+
+    def jwks_etag(self) -> str:
+        if not self._loaded:
+            self.load_local()
+        return self._jwks_etag
+
+    async def get_verification_key(self, bank_code: str, kid: Optional[str]) -> Optional[Key]:
+        """Публичный ключ банка: локальный файл, затем закэшированный удаленный JWKS"""
+        if not self._loaded:
+            self.load_local()
+
+        local_keys = self._local_keys.get(bank_code)
+        key = self._pick(local_keys, kid)
+        if key:
+            return key
+
+        key = self._pick(self._remote_keys.get(bank_code), kid)
+        if key:
+            return key
+
+        # PEM другого банка хранится под default_kid: если локальный ключ у банка
+        # один, он проверяет токены с любым kid (без принудительной загрузки JWKS)
+        if local_keys and len(local_keys) == 1:
+            return next(iter(local_keys.values()))
+
+        # Неизвестный kid - возможно, банк ротировал ключ: обновить JWKS
+        await self.refresh_remote(bank_code, force=True)
+        return self._pick(self._remote_keys.get(bank_code), kid)
+
+    def stats(self) -> dict:
+        return {
+            "signing_kid": self._signing_key[0] if self._signing_key else None,
+            "local_kids": {b: sorted(keys) for b, keys in self._local_keys.items()},
+            "remote_kids": {b: sorted(keys) for b, keys in self._remote_keys.items()}
+        }
+
+    # === Local keys ===
+
+    def load_local(self):
+        """(Пере)читать ключи из shared/keys"""
+        own_kid = default_kid(config.BANK_CODE)
+        local_keys: Dict[str, Dict[str, Key]] = {}
+        mtimes: Dict[Path, float] = {}
+
+        # JWKS файл этого банка - отдается как есть, задает kid ключа подписи
+        jwks_path = self.keys_path / f"{config.BANK_CODE}_jwks.json"
+        jwks = None
+        if jwks_path.exists():
+            try:
+                mtimes[jwks_path] = jwks_path.stat().st_mtime
+                jwks = json.loads(jwks_path.read_text())
+                if jwks.get("keys"):
+                    own_kid = jwks["keys"][0].get("kid", own_kid)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Failed to load {jwks_path}: {e}")
+                jwks = None
+
+        if jwks is None:
+            # Базовый JWKS если файла нет
+            jwks = {
+                "keys": [{
+                    "kid": own_kid,
+                    "kty": "RSA",
+                    "use": "sig",
+                    "alg": "RS256",
+                    "n": "placeholder_modulus",
+                    "e": "AQAB"
+                }]
+            }
+
+        # Публичные ключи всех банков ({bank}_public.pem)
+        if self.keys_path.exists():
+            for public_key_path in self.keys_path.glob("*_public.pem"):
+                bank_code = public_key_path.name[:-len("_public.pem")]
+                kid = own_kid if bank_code == config.BANK_CODE else default_kid(bank_code)
+                try:
+                    mtimes[public_key_path] = public_key_path.stat().st_mtime
+                    key = jwk.construct(public_key_path.read_text(), algorithm="RS256")
+                    local_keys.setdefault(bank_code, {})[kid] = key
+                except Exception as e:
+                    logger.warning(f"Failed to load {public_key_path}: {e}")
+
+        # Приватный ключ этого банка
+        signing_key = None
+        private_key_path = self.keys_path / f"{config.BANK_CODE}_private.pem"
+        if private_key_path.exists():
+            try:
+                mtimes[private_key_path] = private_key_path.stat().st_mtime
+                signing_key = (own_kid, jwk.construct(private_key_path.read_text(), algorithm="RS256"))
+            except Exception as e:
+                logger.warning(f"Failed to load RSA signing key: {e}")
+
+        self._local_keys = local_keys
+        self._signing_key = signing_key
+        self._jwks_body = json.dumps(jwks, separators=(",", ":")).encode()
+        self._jwks_etag = '"' + hashlib.sha256(self._jwks_body).hexdigest()[:32] + '"'
+        self._mtimes = mtimes
+        self._loaded = True
+
+    def _key_files(self) -> set:
+        """Файлы, из которых собирается key ring"""
+        if not self.keys_path.exists():
+            return set()
+
+        files = set(self.keys_path.glob("*_public.pem"))
+        for name in (f"{config.BANK_CODE}_private.pem", f"{config.BANK_CODE}_jwks.json"):
+            if (self.keys_path / name).exists():
+                files.add(self.keys_path / name)
+        return files
+
+    def _local_files_changed(self) -> bool:
+        files = self._key_files()
+        if files != set(self._mtimes):
+            return True
+
+        return any(path.stat().st_mtime != self._mtimes[path] for path in files)
+
+    # === Remote JWKS ===
+
+    async def refresh_remote(self, bank_code: str, force: bool = False):
+        """Загрузить JWKS банка по HTTP (условный запрос по ETag)"""
+        meta = self._remote_meta.get(bank_code, {})
+        min_interval = config.JWKS_MIN_REFRESH_INTERVAL if force else config.JWKS_CACHE_TTL
+        if time.time() - meta.get("fetched_at", 0) < min_interval:
+            return
+
+        lock = self._locks.setdefault(bank_code, asyncio.Lock())
+        async with lock:
+            # Пока ждали lock, JWKS мог обновить другой запрос
+            meta = self._remote_meta.get(bank_code, {})
+            if time.time() - meta.get("fetched_at", 0) < min_interval:
+                return
+
+            port = BANK_PORTS.get(bank_code, 8001)
+            jwks_url = f"http://localhost:{port}/.well-known/jwks.json"
+            headers = {"If-None-Match": meta["etag"]} if meta.get("etag") else {}
+
+            try:
+                response = await bank_http_clients.for_url(jwks_url).get(jwks_url, headers=headers, timeout=5.0)
+            except httpx.HTTPError as e:
+                logger.warning(f"Failed to fetch JWKS of {bank_code}: {e}")
+                self._remote_meta[bank_code] = {**meta, "fetched_at": time.time()}
+                return
+
+            if response.status_code == 304:
+                self._remote_meta[bank_code] = {**meta, "fetched_at": time.time()}
+                return
+
+            if response.status_code != 200:
+                logger.warning(f"JWKS of {bank_code} returned {response.status_code}")
+                self._remote_meta[bank_code] = {**meta, "fetched_at": time.time()}
+                return
+
+            keys = {}
+            for key_data in response.json().get("keys", []):
+                try:
+                    keys[key_data.get("kid") or default_kid(bank_code)] = jwk.construct(key_data, algorithm="RS256")
+                except Exception as e:
+                    logger.warning(f"Skipping invalid JWK from {bank_code}: {e}")
+
+            self._remote_keys[bank_code] = keys
+            self._remote_meta[bank_code] = {
+                "etag": response.headers.get("ETag"),
+                "fetched_at": time.time()
+            }
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(config.JWKS_REFRESH_INTERVAL)
+            try:
+                if self._local_files_changed():
+                    logger.info("RSA keys changed on disk, reloading key ring")
+                    self.load_local()
+
+                for bank_code in list(self._remote_meta):
+                    await self.refresh_remote(bank_code)
+            except Exception as e:
+                logger.error(f"Key ring refresh failed: {e}")
+
+    @staticmethod
+    def _pick(keys: Optional[Dict[str, Key]], kid: Optional[str]) -> Optional[Key]:
+        if not keys:
+            return None
+        if kid:
+            return keys.get(kid)
+        # Токен без kid - однозначно только если ключ у банка один
+        if len(keys) == 1:
+            return next(iter(keys.values()))
+        return None
+
+
+# Singleton instance
+key_ring = KeyRing()
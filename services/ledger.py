@@ -0,0 +1,264 @@
+"""
+Ledger - атомарные изменения балансов счетов
+
+Все изменения Account.balance идут через LedgerService, а не через
+read-modify-write в Python:
+- одна проводка - один `UPDATE ... SET balance = balance + :delta
+  WHERE balance + :delta >= 0 RETURNING balance`, без отдельной блокировки
+- несколько счетов - сначала `SELECT ... FOR UPDATE` в порядке id
+  (одинаковый порядок во всех транзакциях - без deadlock), затем UPDATE
+
+Горячие счета (HOT_ACCOUNTS, см. services/hot_accounts.py): зачисления не трогают
+строку accounts, а дописываются в account_pending_credits; HotAccountCompactor
+переносит их в баланс в фоне. Перед списанием с горячего счета его
+незачисленные поступления переносятся сразу.
+
+Изменения не коммитятся: коммит делает вызывающий код вместе
+с остальными записями (Transaction, Payment, ...).
+"""
+from decimal import Decimal
+from typing import Dict, Iterable, Optional, Set
+
+from sqlalchemy import select, update, delete, insert, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
+
+from models import Account, AccountPendingCredit
+
+# id горячих счетов (заполняет HotAccountCompactor при старте)
+_hot_account_ids: Set[int] = set()
+
+
+class InsufficientFundsError(ValueError):
+    """Недостаточно средств на счете"""
+
+    def __init__(self, account_id: int, available: Decimal, required: Decimal):
+        self.account_id = account_id
+        self.available = available
+        self.required = required
+        super().__init__(f"Insufficient funds. Available: {available}, Required: {required}")
+
+
+class AccountNotFoundError(ValueError):
+    """Счет не найден"""
+
+
+class LedgerService:
+    """Проводки по счетам"""
+
+    @staticmethod
+    async def debit(db: AsyncSession, account_id: int, amount: Decimal) -> Decimal:
+        """Списать со счета, вернуть новый баланс"""
+        if not amount:
+            return await LedgerService.balance(db, account_id)
+
+        balances = await LedgerService.post(db, {account_id: -amount})
+        if account_id not in balances:
+            # Горячий счет: списание целиком покрыто незачисленными поступлениями
+            return await LedgerService.balance(db, account_id)
+        return balances[account_id]
+
+    @staticmethod
+    async def credit(db: AsyncSession, account_id: int, amount: Decimal) -> Optional[Decimal]:
+        """Зачислить на счет, вернуть новый баланс (None - зачисление на горячий счет отложено)"""
+        balances = await LedgerService.post(db, {account_id: amount})
+        return balances.get(account_id)
+
+    @staticmethod
+    async def transfer(
+        db: AsyncSession,
+        from_account_id: int,
+        to_account_id: int,
+        amount: Decimal
+    ) -> Dict[int, Decimal]:
+        """Перевести между счетами банка, вернуть новые балансы"""
+        if from_account_id == to_account_id:
+            # Перевод самому себе - только проверка остатка
+            balances = await LedgerService.lock_accounts(db, [from_account_id])
+            if balances[from_account_id] < amount:
+                raise InsufficientFundsError(from_account_id, balances[from_account_id], amount)
+            return balances
+
+        return await LedgerService.post(db, {from_account_id: -amount, to_account_id: amount})
+
+    @staticmethod
+    async def post(
+        db: AsyncSession,
+        postings: Dict[int, Decimal],
+        defer_hot_credits: bool = True
+    ) -> Dict[int, Decimal]:
+        """
+        Применить проводки {account_id: delta} атомарно
+
+        Баланс ни одного счета не может уйти в минус: иначе InsufficientFundsError
+        и ни одна проводка не применяется (вызывающий код откатывает транзакцию).
+        Зачисления на горячие счета откладываются в account_pending_credits.
+
+        Returns:
+            {account_id: новый баланс} - кроме отложенных зачислений
+        """
+        postings = {account_id: delta for account_id, delta in postings.items() if delta}
+
+        deferred = {}
+        if defer_hot_credits and _hot_account_ids:
+            deferred = {
+                account_id: delta for account_id, delta in postings.items()
+                if delta > 0 and account_id in _hot_account_ids
+            }
+            postings = {account_id: delta for account_id, delta in postings.items() if account_id not in deferred}
+
+        if deferred:
+            await db.execute(
+                insert(AccountPendingCredit),
+                [{"account_id": account_id, "amount": delta} for account_id, delta in deferred.items()]
+            )
+
+        # Списание с горячего счета: сначала перенести его незачисленные поступления
+        for account_id, delta in list(postings.items()):
+            if delta < 0 and account_id in _hot_account_ids:
+                postings[account_id] = delta + await _take_pending(db, account_id)
+
+        postings = {account_id: delta for account_id, delta in postings.items() if delta}
+        if not postings:
+            return {}
+
+        if len(postings) == 1:
+            # Один счет: условный UPDATE сам берет блокировку строки
+            (account_id, delta), = postings.items()
+            return {account_id: await _apply(db, account_id, delta)}
+
+        # Несколько счетов: заблокировать в порядке id, проверить остатки, применить
+        balances = await LedgerService.lock_accounts(db, postings)
+        for account_id, delta in postings.items():
+            if balances[account_id] + delta < 0:
+                raise InsufficientFundsError(account_id, balances[account_id], -delta)
+
+        return {
+            account_id: await _apply(db, account_id, postings[account_id])
+            for account_id in sorted(postings)
+        }
+
+    @staticmethod
+    async def lock_accounts(db: AsyncSession, account_ids: Iterable[int]) -> Dict[int, Decimal]:
+        """
+        Заблокировать счета (SELECT ... FOR UPDATE в порядке id) до конца транзакции
+
+        Returns:
+            {account_id: текущий баланс}
+        """
+        ids = sorted(set(account_ids))
+        result = await db.execute(
+            select(Account.id, Account.balance)
+            .where(Account.id.in_(ids))
+            .order_by(Account.id)
+            .with_for_update()
+        )
+        balances = {account_id: balance for account_id, balance in result.all()}
+
+        missing = [account_id for account_id in ids if account_id not in balances]
+        if missing:
+            raise AccountNotFoundError(f"Account not found: {missing[0]}")
+
+        return balances
+
+    @staticmethod
+    async def balance(db: AsyncSession, account_id: int) -> Decimal:
+        """Текущий баланс счета (без незачисленных поступлений)"""
+        balance = await db.scalar(select(Account.balance).where(Account.id == account_id))
+        if balance is None:
+            raise AccountNotFoundError(f"Account not found: {account_id}")
+        return balance
+
+    @staticmethod
+    async def pending_credits(db: AsyncSession, account_id: int) -> Decimal:
+        """Сумма незачисленных поступлений горячего счета (0 для обычных счетов)"""
+        if account_id not in _hot_account_ids:
+            return Decimal("0")
+
+        total = await db.scalar(
+            select(func.coalesce(func.sum(AccountPendingCredit.amount), 0))
+            .where(AccountPendingCredit.account_id == account_id)
+        )
+        return Decimal(total)
+
+    @staticmethod
+    async def fold_pending_credits(db: AsyncSession, limit: int) -> int:
+        """
+        Перенести до `limit` незачисленных поступлений в балансы счетов
+
+        Одно UPDATE на счет на всю пачку. Записи, которые сейчас забирает
+        списание с этого же счета, пропускаются (SKIP LOCKED).
+
+        Returns:
+            Количество перенесенных записей
+        """
+        batch = (
+            select(AccountPendingCredit.id)
+            .order_by(AccountPendingCredit.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        result = await db.execute(
+            delete(AccountPendingCredit)
+            .where(AccountPendingCredit.id.in_(batch))
+            .returning(AccountPendingCredit.account_id, AccountPendingCredit.amount)
+        )
+        rows = result.all()
+
+        sums: Dict[int, Decimal] = {}
+        for account_id, amount in rows:
+            sums[account_id] = sums.get(account_id, Decimal("0")) + amount
+
+        await LedgerService.post(db, sums, defer_hot_credits=False)
+        return len(rows)
+
+    @staticmethod
+    def set_hot_accounts(account_ids: Iterable[int]):
+        """Задать горячие счета (вызывается при старте)"""
+        _hot_account_ids.clear()
+        _hot_account_ids.update(account_ids)
+
+    @staticmethod
+    def is_hot(account_id: int) -> bool:
+        return account_id in _hot_account_ids
+
+
+async def _take_pending(db: AsyncSession, account_id: int) -> Decimal:
+    """Забрать незачисленные поступления счета (удалить и вернуть сумму)"""
+    result = await db.execute(
+        delete(AccountPendingCredit)
+        .where(AccountPendingCredit.account_id == account_id)
+        .returning(AccountPendingCredit.amount)
+    )
+    return sum(result.scalars().all(), Decimal("0"))
+
+
+async def _apply(db: AsyncSession, account_id: int, delta: Decimal) -> Decimal:
+    """UPDATE баланса одного счета; списание - только при достаточном остатке"""
+    stmt = (
+        update(Account)
+        .where(Account.id == account_id)
+        .values(balance=Account.balance + delta)
+        .returning(Account.balance)
+        .execution_options(synchronize_session=False)
+    )
+    if delta < 0:
+        stmt = stmt.where(Account.balance + delta >= 0)
+
+    result = await db.execute(stmt)
+    new_balance = result.scalar_one_or_none()
+
+    if new_balance is None:
+        current = await db.scalar(select(Account.balance).where(Account.id == account_id))
+        if current is None:
+            raise AccountNotFoundError(f"Account not found: {account_id}")
+        raise InsufficientFundsError(account_id, current, -delta)
+
+    # Обновить загруженный в сессию Account, не помечая его измененным
+    account = db.identity_map.get(identity_key(Account, account_id))
+    if account is not None:
+        set_committed_value(account, "balance", new_balance)
+
+    return new_balance
@@ -8,11 +8,14 @@ from decimal import Decimal
 from datetime import datetime
 from typing import Optional, Tuple
 import uuid
-import httpx
 import logging
 
-from models import Account, Payment, InterbankTransfer, BankCapital, Client, Transaction
+from models import Account, Payment, InterbankTransfer, InterbankOutbox, Client, Transaction
 from config import config
+from services.account_routing import account_directory
+from services.ledger import LedgerService
+from services.capital import CapitalService
+from services.events import event_bus
 
 logger = logging.getLogger(__name__)
 
@@ -44,6 +47,7 @@ class PaymentService:
         if not from_account:
             raise ValueError("Source account not found")
         
+        # Быстрая проверка без блокировки; окончательная - атомарно в LedgerService
         if from_account.balance < amount:
             raise ValueError("Insufficient funds")
         
@@ -61,9 +65,6 @@ class PaymentService:
             status="AcceptedSettlementInProcess"
         )
         
-        # Списать со счета отправителя
-        from_account.balance -= amount
-        
         # Попытаться найти получателя в своем банке
         result = await db.execute(
             select(Account).where(Account.account_number == to_account_number)
@@ -72,11 +73,11 @@ class PaymentService:
         
         interbank_transfer = None
         
-        db.add(payment)
-        
         if to_account:
-            # Внутрибанковский перевод
-            to_account.balance += amount
+            # Внутрибанковский перевод: списание и зачисление одной проводкой
+            await LedgerService.transfer(db, from_account.id, to_account.id, amount)
+            
+            db.add(payment)
             payment.status = "AcceptedSettlementCompleted"
             payment.destination_bank = config.BANK_CODE
             payment.status_update_date_time = datetime.utcnow()
@@ -84,9 +85,9 @@ class PaymentService:
             # Создать транзакцию для отправителя (Debit - списание)
             transaction_debit = Transaction(
                 account_id=from_account.id,
-                transaction_type="Debit",
+                transaction_id=f"tx-{uuid.uuid4().hex[:12]}",
                 amount=amount,
-                balance_after=from_account.balance,
+                direction="debit",
                 description=f"Перевод на счет {to_account_number}: {description}",
                 transaction_date=datetime.utcnow()
             )
@@ -95,9 +96,9 @@ class PaymentService:
             # Создать транзакцию для получателя (Credit - зачисление)
             transaction_credit = Transaction(
                 account_id=to_account.id,
-                transaction_type="Credit",
+                transaction_id=f"tx-{uuid.uuid4().hex[:12]}",
                 amount=amount,
-                balance_after=to_account.balance,
+                direction="credit",
                 description=f"Перевод от счета {from_account_number}: {description}",
                 transaction_date=datetime.utcnow()
             )
@@ -117,6 +118,14 @@ class PaymentService:
                 await db.rollback()
                 raise ValueError(f"Target account {to_account_number} not found in any bank")
             
+            # Списать со счета отправителя (атомарно, с проверкой остатка)
+            await LedgerService.debit(db, from_account.id, amount)
+            db.add(payment)
+            
+            # FK payment -> transfer -> outbox объявлены без relationship:
+            # порядок INSERT задают flush
+            await db.flush()
+            
             # Создать запись межбанкового перевода
             transfer_id = f"transfer-{uuid.uuid4().hex[:12]}"
             interbank_transfer = InterbankTransfer(
@@ -132,90 +141,53 @@ class PaymentService:
             # Создать транзакцию для отправителя (Debit - списание)
             transaction_debit = Transaction(
                 account_id=from_account.id,
-                transaction_type="Debit",
+                transaction_id=f"tx-{uuid.uuid4().hex[:12]}",
                 amount=amount,
-                balance_after=from_account.balance,
+                direction="debit",
                 description=f"Межбанковский перевод в {target_bank} на счет {to_account_number}: {description}",
                 transaction_date=datetime.utcnow()
             )
             db.add(transaction_debit)
             
-            # Сохранить локальные изменения (списание со счета)
-            await db.commit()
+            await db.flush()
+            
+            # Outbox: перевод отправит InterbankDispatcher в фоне.
+            # Запись сохраняется в одной транзакции со списанием - деньги не "зависнут"
+            # между списанием и отправкой, даже если процесс упадет.
+            db.add(InterbankOutbox(
+                transfer_id=transfer_id,
+                to_bank=target_bank,
+                to_account_number=to_account_number,
+                amount=amount,
+                description=description
+            ))
             
-            # Вызвать API другого банка
-            try:
-                success = await PaymentService._send_interbank_transfer(
-                    transfer_id=transfer_id,
-                    to_bank=target_bank,
-                    to_account_number=to_account_number,
-                    amount=amount,
-                    description=description
-                )
-                
-                if success:
-                    # Перевод успешен
-                    payment.status = "AcceptedSettlementCompleted"
-                    payment.destination_bank = target_bank
-                    interbank_transfer.status = "completed"
-                    interbank_transfer.completed_at = datetime.utcnow()
-                    
-                    # Обновить капитал банка-отправителя (-amount)
-                    await PaymentService.update_bank_capital(
-                        db=db,
-                        amount_change=-amount,
-                        reason=f"Outgoing transfer to {target_bank}: {transfer_id}"
-                    )
-                    
-                    logger.info(f"Interbank transfer {transfer_id} completed: {config.BANK_CODE} -> {target_bank}, {amount} RUB")
-                else:
-                    # Перевод не удался - откат
-                    payment.status = "Rejected"
-                    interbank_transfer.status = "failed"
-                    
-                    # Вернуть деньги отправителю
-                    from_account.balance += amount
-                    
-                    # Создать корректирующую транзакцию (возврат)
-                    transaction_refund = Transaction(
-                        account_id=from_account.id,
-                        transaction_type="Credit",
-                        amount=amount,
-                        balance_after=from_account.balance,
-                        description=f"Возврат неудачного перевода в {target_bank}",
-                        transaction_date=datetime.utcnow()
-                    )
-                    db.add(transaction_refund)
-                    
-                    logger.warning(f"Interbank transfer {transfer_id} failed, refunded to sender")
-                    
-            except Exception as e:
-                # Ошибка при вызове API - откат
-                logger.error(f"Interbank transfer {transfer_id} error: {str(e)}")
-                payment.status = "Rejected"
-                interbank_transfer.status = "failed"
-                
-                # Вернуть деньги отправителю
-                from_account.balance += amount
-                
-                # Создать корректирующую транзакцию (возврат)
-                transaction_refund = Transaction(
-                    account_id=from_account.id,
-                    transaction_type="Credit",
-                    amount=amount,
-                    balance_after=from_account.balance,
-                    description=f"Возврат из-за ошибки межбанковского перевода: {str(e)}",
-                    transaction_date=datetime.utcnow()
-                )
-                db.add(transaction_refund)
+            payment.destination_bank = target_bank
+            logger.info(f"Interbank transfer {transfer_id} queued: {config.BANK_CODE} -> {target_bank}, {amount} RUB")
             
             payment.status_update_date_time = datetime.utcnow()
         
         await db.commit()
         await db.refresh(payment)
         
+        event_bus.publish("payment", PaymentService.payment_event(payment, from_account_number))
+        
         return payment, interbank_transfer
     
+    @staticmethod
+    def payment_event(payment: Payment, from_account_number: Optional[str] = None) -> dict:
+        """Платеж для ленты мониторинга (поля как в /admin/payments)"""
+        return {
+            "payment_id": payment.payment_id,
+            "sender_account_id": from_account_number or f"acc-{payment.account_id}",
+            "receiver_account_id": payment.destination_account or "—",
+            "amount": payment.amount,
+            "currency": payment.currency or "RUB",
+            "destination_bank": payment.destination_bank,
+            "status": payment.status,
+            "created_at": payment.creation_date_time
+        }
+    
     @staticmethod
     async def get_payment(
         db: AsyncSession,
@@ -231,37 +203,19 @@ class PaymentService:
     async def update_bank_capital(
         db: AsyncSession,
         amount_change: Decimal,
-        reason: str = ""
+        reason: str = "",
+        reference: Optional[str] = None
     ):
         """
-        Обновить капитал банка
+        Обновить капитал банка и закоммитить все изменения сессии
         
         amount_change: положительное = увеличение, отрицательное = уменьшение
-        """
-        bank_code = config.BANK_CODE
-        
-        # Получить или создать запись капитала
-        result = await db.execute(
-            select(BankCapital).where(BankCapital.bank_code == bank_code)
-        )
-        capital_record = result.scalar_one_or_none()
-        
-        if not capital_record:
-            # Создать если нет
-            capital_record = BankCapital(
-                bank_code=bank_code,
-                capital=Decimal("3500000.00"),  # Начальный капитал
-                initial_capital=Decimal("3500000.00")
-            )
-            db.add(capital_record)
-        
-        # Обновить капитал
-        capital_record.capital += amount_change
-        capital_record.updated_at = datetime.utcnow()
         
+        Строка bank_capital не блокируется: изменение пишется в журнал
+        (см. services/capital.py) и переносится в капитал в фоне.
+        """
+        CapitalService.record(db, amount_change, reason, reference)
         await db.commit()
-        
-        return capital_record
     
     @staticmethod
     async def _detect_target_bank(account_number: str) -> Optional[str]:
@@ -269,88 +223,10 @@ class PaymentService:
         Определить банк-получатель по номеру счета
         
         В реальности это делается через БИК (БИК включен в платежных реквизитах).
-        В MVP: пытаемся найти счет во всех банках через HTTP запросы.
+        В MVP: локальный справочник счетов (префиксы + снапшоты других банков),
+        при промахе - параллельный опрос банков (см. services/account_routing.py).
         
         Returns:
             Код банка (vbank/abank/sbank) или None
         """
-        banks = ["vbank", "abank", "sbank"]
-        
-        # Исключить свой банк из поиска
-        banks = [b for b in banks if b != config.BANK_CODE]
-        
-        # Проверяем каждый банк через локальные адреса (внутри Docker сети)
-        for bank_code in banks:
-            try:
-                # В Docker сети банки доступны по именам сервисов
-                bank_url = f"http://{bank_code}:8000"
-                
-                async with httpx.AsyncClient(timeout=5.0) as client:
-                    # Проверяем существование счета через GET /accounts (упрощенная проверка)
-                    # В продакшене: специальный endpoint для проверки существования счета
-                    response = await client.get(
-                        f"{bank_url}/interbank/check-account/{account_number}",
-                        headers={"x-bank-auth-token": config.BANK_CODE}
-                    )
-                    
-                    if response.status_code == 200:
-                        logger.info(f"Account {account_number} found in {bank_code}")
-                        return bank_code
-                        
-            except Exception as e:
-                logger.debug(f"Failed to check account in {bank_code}: {str(e)}")
-                continue
-        
-        return None
-    
-    @staticmethod
-    async def _send_interbank_transfer(
-        transfer_id: str,
-        to_bank: str,
-        to_account_number: str,
-        amount: Decimal,
-        description: str
-    ) -> bool:
-        """
-        Отправить межбанковский перевод через HTTP API
-        
-        Returns:
-            True если успешно, False если ошибка
-        """
-        try:
-            # URL банка-получателя (в Docker сети)
-            bank_url = f"http://{to_bank}:8000"
-            
-            # Подготовить данные для отправки
-            transfer_data = {
-                "transfer_id": transfer_id,
-                "from_bank": config.BANK_CODE,
-                "to_account_number": to_account_number,
-                "amount": str(amount),
-                "currency": "RUB",
-                "description": description
-            }
-            
-            # Отправить POST запрос
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.post(
-                    f"{bank_url}/interbank/receive",
-                    json=transfer_data,
-                    headers={
-                        "x-bank-auth-token": config.BANK_CODE,
-                        "Content-Type": "application/json"
-                    }
-                )
-                
-                if response.status_code == 201:
-                    result = response.json()
-                    logger.info(f"Interbank transfer {transfer_id} sent successfully to {to_bank}: {result}")
-                    return True
-                else:
-                    logger.error(f"Interbank transfer {transfer_id} failed: {response.status_code} - {response.text}")
-                    return False
-                    
-        except Exception as e:
-            logger.error(f"Failed to send interbank transfer {transfer_id}: {str(e)}")
-            return False
-
+        return await account_directory.resolve(account_number)
@@ -0,0 +1,121 @@
+"""
+Проверка планов горячих запросов (регрессия индексов)
+
+Для каждого запроса из HOT_QUERIES выполняется EXPLAIN с `enable_seqscan = off`:
+если подходящий индекс есть, планировщик обязан его использовать; Seq Scan
+по таблице в плане значит, что индекса нет (не применилась миграция, индекс
+удален или запрос изменился так, что индекс больше не подходит).
+
+Без отключения seqscan проверка была бы бесполезной на маленьких (seed)
+таблицах - там полный просмотр дешевле любого индекса.
+Используется GET /admin/query-plans; подходит и для проверки после деплоя.
+"""
+import json
+import logging
+from dataclasses import dataclass
+from typing import List
+
+from sqlalchemy import text
+
+from database import engine
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class HotQuery:
+    name: str
+    table: str  # Таблица, по которой не должно быть Seq Scan
+    sql: str
+
+
+HOT_QUERIES: List[HotQuery] = [
+    HotQuery(
+        name="consent_check",
+        table="consents",
+        sql="SELECT * FROM consents WHERE client_id = 1 AND granted_to = 'team200' "
+            "AND status = 'active' AND expiration_date_time > now()"
+    ),
+    HotQuery(
+        name="client_accounts",
+        table="accounts",
+        sql="SELECT * FROM accounts WHERE client_id = 1"
+    ),
+    HotQuery(
+        name="account_transactions",
+        table="transactions",
+        sql="SELECT * FROM transactions WHERE account_id = 1 ORDER BY booking_date DESC, id DESC LIMIT 51"
+    ),
+    HotQuery(
+        name="account_cards",
+        table="cards",
+        sql="SELECT * FROM cards WHERE account_id = 1"
+    ),
+    HotQuery(
+        name="client_agreements",
+        table="product_agreements",
+        sql="SELECT * FROM product_agreements WHERE client_id = 1"
+    ),
+    HotQuery(
+        name="client_notifications",
+        table="notifications",
+        sql="SELECT * FROM notifications WHERE client_id = 1"
+    ),
+    HotQuery(
+        name="team_clients",
+        table="clients",
+        sql="SELECT * FROM clients WHERE person_id LIKE 'team200-%'"
+    ),
+    HotQuery(
+        name="caller_api_calls",
+        table="api_calls_log",
+        sql="SELECT * FROM api_calls_log WHERE created_at >= now() - interval '1 hour' AND caller_id = 'team200'"
+    ),
+]
+
+
+def _plan_nodes(plan: dict):
+    """Все узлы плана (рекурсивно)"""
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+def _scans_table(node: dict, table: str) -> bool:
+    """Узел читает таблицу или ее партицию (api_calls_log -> api_calls_log_p20250101)"""
+    relation = node.get("Relation Name", "")
+    return relation == table or relation.startswith(table + "_")
+
+
+async def check_query_plans() -> dict:
+    """EXPLAIN всех HOT_QUERIES; ok=False, если хотя бы один план - полный просмотр таблицы"""
+    results = []
+
+    async with engine.connect() as conn:
+        for query in HOT_QUERIES:
+            # SET LOCAL действует до конца транзакции - откатываем ее после каждого EXPLAIN
+            async with conn.begin() as tx:
+                await conn.execute(text("SET LOCAL enable_seqscan = off"))
+                raw = (await conn.execute(text(f"EXPLAIN (FORMAT JSON) {query.sql}"))).scalar()
+                await tx.rollback()
+
+            plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+            nodes = [node for node in _plan_nodes(plan) if _scans_table(node, query.table)]
+            seq_scan = any(node["Node Type"] == "Seq Scan" for node in nodes)
+
+            if seq_scan:
+                logger.warning(f"Hot query {query.name} plan uses Seq Scan on {query.table}")
+
+            results.append({
+                "name": query.name,
+                "table": query.table,
+                "ok": not seq_scan,
+                "scans": [node["Node Type"] for node in nodes],
+                "indexes": [node["Index Name"] for node in _plan_nodes(plan) if "Index Name" in node],
+                "total_cost": plan.get("Total Cost")
+            })
+
+    return {
+        "ok": all(result["ok"] for result in results),
+        "queries": results
+    }
@@ -12,6 +12,8 @@ CREATE TABLE IF NOT EXISTS clients (
     created_at TIMESTAMP DEFAULT NOW()
 );
 
+CREATE INDEX IF NOT EXISTS idx_clients_person_id_pattern ON clients(person_id varchar_pattern_ops);
+
 CREATE TABLE IF NOT EXISTS accounts (
     id SERIAL PRIMARY KEY,
     client_id INTEGER REFERENCES clients(id),
@@ -23,6 +25,17 @@ CREATE TABLE IF NOT EXISTS accounts (
     opened_at TIMESTAMP DEFAULT NOW()
 );
 
+CREATE INDEX IF NOT EXISTS ix_accounts_client_id ON accounts(client_id);
+
+CREATE TABLE IF NOT EXISTS account_pending_credits (
+    id SERIAL PRIMARY KEY,
+    account_id INTEGER NOT NULL REFERENCES accounts(id),
+    amount NUMERIC(15, 2) NOT NULL,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS ix_account_pending_credits_account_id ON account_pending_credits(account_id);
+
 CREATE TABLE IF NOT EXISTS transactions (
     id SERIAL PRIMARY KEY,
     account_id INTEGER REFERENCES accounts(id),
@@ -32,9 +45,12 @@ CREATE TABLE IF NOT EXISTS transactions (
     counterparty VARCHAR(255),
     description TEXT,
     transaction_date TIMESTAMP DEFAULT NOW(),
+    booking_date TIMESTAMP NOT NULL DEFAULT NOW(),
     created_at TIMESTAMP DEFAULT NOW()
 );
 
+CREATE INDEX IF NOT EXISTS idx_transactions_account_booking ON transactions(account_id, booking_date DESC, id DESC);
+
 CREATE TABLE IF NOT EXISTS bank_settings (
     key VARCHAR(100) PRIMARY KEY,
     value TEXT,
@@ -77,6 +93,23 @@ CREATE TABLE IF NOT EXISTS interbank_transfers (
     completed_at TIMESTAMP
 );
 
+CREATE TABLE IF NOT EXISTS interbank_outbox (
+    id SERIAL PRIMARY KEY,
+    transfer_id VARCHAR(100) UNIQUE NOT NULL REFERENCES interbank_transfers(transfer_id),
+    to_bank VARCHAR(100) NOT NULL,
+    to_account_number VARCHAR(255) NOT NULL,
+    amount NUMERIC(15, 2) NOT NULL,
+    description TEXT,
+    status VARCHAR(20) DEFAULT 'pending',
+    attempts INTEGER DEFAULT 0,
+    next_attempt_at TIMESTAMP DEFAULT NOW(),
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT NOW(),
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_interbank_outbox_pending ON interbank_outbox(next_attempt_at) WHERE status = 'pending';
+
 CREATE TABLE IF NOT EXISTS bank_capital (
     id SERIAL PRIMARY KEY,
     bank_code VARCHAR(100) UNIQUE NOT NULL,
@@ -87,6 +120,20 @@ CREATE TABLE IF NOT EXISTS bank_capital (
     updated_at TIMESTAMP DEFAULT NOW()
 );
 
+-- Журнал изменений капитала (переносится в bank_capital в фоне)
+CREATE TABLE IF NOT EXISTS bank_capital_deltas (
+    id SERIAL PRIMARY KEY,
+    bank_code VARCHAR(100) NOT NULL,
+    amount NUMERIC(15, 2) NOT NULL,
+    loans_change NUMERIC(15, 2) DEFAULT 0,
+    reason VARCHAR(255),
+    reference VARCHAR(100),
+    created_at TIMESTAMP DEFAULT NOW(),
+    applied_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_bank_capital_deltas_pending ON bank_capital_deltas(id) WHERE applied_at IS NULL;
+
 CREATE TABLE IF NOT EXISTS teams (
     id SERIAL PRIMARY KEY,
     client_id VARCHAR(100) UNIQUE NOT NULL,
@@ -147,6 +194,9 @@ INSERT INTO transactions (account_id, transaction_id, amount, direction, counter
 (12, 'tx-demo-002', 150000.00, 'credit', 'ООО Компания', 'Зарплата', '2025-10-01 10:00:00'),
 (13, 'tx-demo-003', 200000.00, 'credit', 'Клиенты', 'Доход от бизнеса', '2025-09-30 18:00:00');
 
+-- Дата проводки демо-транзакций = дата операции
+UPDATE transactions SET booking_date = transaction_date;
+
 -- Настройки банка
 INSERT INTO bank_settings (key, value) VALUES
 ('bank_code', 'abank'),
@@ -195,6 +245,8 @@ CREATE TABLE IF NOT EXISTS product_agreements (
     created_at TIMESTAMP DEFAULT NOW()
 );
 
+CREATE INDEX IF NOT EXISTS ix_product_agreements_client_id ON product_agreements(client_id);
+
 
 -- История ключевой ставки ЦБ
 CREATE TABLE IF NOT EXISTS key_rate_history (
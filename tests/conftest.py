@@ -0,0 +1,42 @@
+"""
+Общие настройки тестов
+
+Модули приложения импортируются абсолютно (`from config import config`),
+как при запуске через run.py - корень репозитория добавляется в sys.path.
+
+Тесты с PostgreSQL (фикстура `db_engine`) запускаются, только если задан
+TEST_DATABASE_URL - отдельная БД: тесты создают в ней схему и очищают таблицы.
+"""
+import os
+import sys
+from pathlib import Path
+
+import pytest
+import pytest_asyncio
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+if TEST_DATABASE_URL:
+    # До импорта database: engine создается при импорте
+    os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+
+
+@pytest_asyncio.fixture
+async def db_engine():
+    """Engine приложения на TEST_DATABASE_URL со схемой (create_all + миграции)"""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+
+    from database import engine
+    from migrations import run_migrations
+    from models import Base
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    await run_migrations(engine)
+
+    yield engine
+
+    # Соединения пула привязаны к event loop теста
+    await engine.dispose()
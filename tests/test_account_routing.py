@@ -0,0 +1,62 @@
+"""
+AccountDirectory: negative cache только при окончательном ответе всех банков
+"""
+import httpx
+import pytest
+
+from config import config
+from services import account_routing
+from services.account_routing import AccountDirectory
+from services.http_clients import CircuitOpenError
+
+ACCOUNT = "40817810000000000001"
+
+
+class _FakeClients:
+    """bank_http_clients: ответ пробы по коду банка"""
+
+    def __init__(self, answers: dict):
+        self.answers = answers
+
+    def for_bank(self, bank_code: str):
+        answer = self.answers[bank_code]
+
+        class _Client:
+            async def get(self, url, **kwargs):
+                if isinstance(answer, Exception):
+                    raise answer
+                return httpx.Response(answer)
+
+        return _Client()
+
+
+@pytest.fixture
+def directory(monkeypatch):
+    monkeypatch.setattr(config, "INTERBANK_PEERS", ["abank", "sbank"])
+    monkeypatch.setattr(config, "ACCOUNT_ROUTING_PREFIXES", {})
+    return AccountDirectory()
+
+
+@pytest.mark.asyncio
+async def test_not_found_in_every_bank_is_cached(directory, monkeypatch):
+    monkeypatch.setattr(account_routing, "bank_http_clients", _FakeClients({"abank": 404, "sbank": 404}))
+
+    assert await directory.resolve(ACCOUNT) is None
+    assert await directory.resolve(ACCOUNT) is None
+    assert directory.resolved_by["negative"] == 1
+
+
+@pytest.mark.parametrize("failure", [
+    httpx.ConnectTimeout("timeout"),
+    CircuitOpenError("circuit open"),
+    503,
+])
+@pytest.mark.asyncio
+async def test_unknown_answer_is_not_cached(directory, monkeypatch, failure):
+    monkeypatch.setattr(account_routing, "bank_http_clients", _FakeClients({"abank": 404, "sbank": failure}))
+    assert await directory.resolve(ACCOUNT) is None
+
+    # Банк снова доступен и знает счет - следующий resolve его находит
+    monkeypatch.setattr(account_routing, "bank_http_clients", _FakeClients({"abank": 404, "sbank": 200}))
+    assert await directory.resolve(ACCOUNT) == "sbank"
+    assert directory.resolved_by["negative"] == 0
@@ -0,0 +1,78 @@
+"""
+DirectorySync: курсор не перепрыгивает id незакоммиченных пачек логов (нужен TEST_DATABASE_URL)
+"""
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import insert, select, text
+
+from models import APICallLog
+from services.api_log_maintenance import api_log_maintenance
+from services.directory_sync import directory_sync
+
+
+@pytest_asyncio.fixture
+async def sent(db_engine, monkeypatch):
+    async with db_engine.begin() as conn:
+        await conn.execute(text("TRUNCATE api_calls_log, directory_sync_state"))
+    await api_log_maintenance.maintain_partitions()
+
+    batches = []
+
+    async def fake_send(rows):
+        batches.append([row.endpoint for row in rows])
+
+    monkeypatch.setattr(directory_sync, "_send", fake_send)
+    monkeypatch.setattr(directory_sync, "_fence", None)
+    monkeypatch.setattr(directory_sync, "_settled_id", None)
+
+    # Первая граница фиксируется и подтверждается, курсор создается на пустой таблице
+    assert await directory_sync.sync_batch() == 0
+    assert await directory_sync.sync_batch() == 0
+    return batches
+
+
+def _log(endpoint: str, created_at: datetime = None) -> dict:
+    return {"endpoint": endpoint, "method": "GET", "status_code": 200, "created_at": created_at or datetime.utcnow()}
+
+
+async def _begin_writer(conn):
+    """Пачка логов так, как ее пишет api_log_queue: xid до выдачи id"""
+    await conn.begin()
+    await conn.execute(text("SELECT pg_current_xact_id()"))
+
+
+@pytest.mark.asyncio
+async def test_cursor_waits_for_open_writer_with_lower_ids(db_engine, sent):
+    async with db_engine.connect() as slow, db_engine.connect() as fast:
+        # fast получил xid раньше, slow - меньший id; fast коммитится первым
+        await _begin_writer(fast)
+        await _begin_writer(slow)
+        await slow.execute(insert(APICallLog), [_log("/slow")])
+        await fast.execute(insert(APICallLog), [_log("/fast")])
+        await fast.commit()
+
+        for _ in range(3):
+            assert await directory_sync.sync_batch() == 0
+        await slow.commit()
+
+    assert await directory_sync.sync_batch() == 2
+    assert sent == [["/slow", "/fast"]]
+
+
+@pytest.mark.asyncio
+async def test_spilled_rows_with_old_created_at_are_sent(db_engine, sent):
+    async with db_engine.begin() as conn:
+        await conn.execute(insert(APICallLog), [_log("/first")])
+    assert await directory_sync.sync_batch() + await directory_sync.sync_batch() == 1
+
+    # Строка из spill-файла: новый id, created_at на несколько часов раньше курсора
+    async with db_engine.begin() as conn:
+        await conn.execute(insert(APICallLog), [_log("/spilled", datetime.utcnow() - timedelta(hours=3))])
+    assert await directory_sync.sync_batch() + await directory_sync.sync_batch() == 1
+    assert sent == [["/first"], ["/spilled"]]
+
+    async with db_engine.connect() as conn:
+        unsynced = await conn.scalar(select(APICallLog.id).where(APICallLog.synced_to_directory.isnot(True)))
+    assert unsynced is None
@@ -0,0 +1,131 @@
+"""
+Circuit breaker BankClient: пробный запрос half-open не должен "зависать"
+"""
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from services.http_clients import BankClient, CircuitBreaker
+
+
+def _open_breaker_ready_for_trial(breaker: CircuitBreaker):
+    """Breaker открыт, и reset_timeout уже прошел - следующий allow() пропустит пробный запрос"""
+    breaker.state = "open"
+    breaker.consecutive_failures = breaker.failure_threshold
+    breaker.opened_at = time.monotonic() - breaker.reset_timeout - 1
+
+
+def _client(handler) -> BankClient:
+    client = BankClient("http://bank.test", timeout=5.0)
+    client._client = httpx.AsyncClient(base_url="http://bank.test", transport=httpx.MockTransport(handler))
+    return client
+
+
+def test_breaker_opens_after_threshold_and_closes_on_success():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    _open_breaker_ready_for_trial(breaker)
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_cancelled_trial_request_releases_half_open():
+    started = asyncio.Event()
+
+    async def hang(request):
+        started.set()
+        await asyncio.sleep(3600)
+
+    client = _client(hang)
+    _open_breaker_ready_for_trial(client.breaker)
+
+    task = asyncio.create_task(client.get("/accounts"))
+    await started.wait()
+    assert client.breaker.state == "half_open"
+
+    # Так AccountDirectory отменяет проигравшие пробы
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert client.breaker.state != "half_open"
+    assert client.in_flight == 0
+    # Следующий запрос снова может быть пробным
+    assert client.breaker.allow()
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_non_http_error_in_trial_releases_half_open():
+    def broken(request):
+        raise RuntimeError("transport bug")
+
+    client = _client(broken)
+    _open_breaker_ready_for_trial(client.breaker)
+
+    with pytest.raises(RuntimeError):
+        await client.get("/accounts", retries=0)
+
+    assert client.breaker.allow()
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_successful_trial_closes_breaker():
+    client = _client(lambda request: httpx.Response(200, json={"ok": True}))
+    _open_breaker_ready_for_trial(client.breaker)
+
+    response = await client.get("/accounts")
+
+    assert response.status_code == 200
+    assert client.breaker.state == "closed"
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_client_registry_is_bounded(monkeypatch):
+    from config import config
+    from services.http_clients import BankHttpClients
+
+    monkeypatch.setattr(config, "INTERBANK_HTTP_MAX_CLIENTS", 3)
+    clients = BankHttpClients()
+
+    first = clients.for_url("http://bank-0.test/auth/bank-token")
+    for i in range(1, 10):
+        clients.for_url(f"http://bank-{i}.test/accounts")
+    await asyncio.sleep(0)
+
+    assert len(clients._clients) == 3
+    assert clients.evicted == 7
+    assert first._client.is_closed
+    # Недавно использованный клиент переиспользуется
+    assert clients.for_url("http://bank-9.test/other") is clients.for_url("http://bank-9.test")
+    await clients.close()
+
+
+@pytest.mark.asyncio
+async def test_busy_client_is_not_evicted(monkeypatch):
+    from config import config
+    from services.http_clients import BankHttpClients
+
+    monkeypatch.setattr(config, "INTERBANK_HTTP_MAX_CLIENTS", 1)
+    clients = BankHttpClients()
+
+    busy = clients.for_url("http://busy.test")
+    busy.in_flight = 1
+    clients.for_url("http://other.test")
+
+    assert "http://busy.test" in clients._clients
+    busy.in_flight = 0
+    await clients.close()
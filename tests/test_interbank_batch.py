@@ -0,0 +1,144 @@
+"""
+POST /interbank/receive-batch: отклонение отдельных переводов не валит пачку;
+POST /interbank/receive проверяет банк-отправитель и сумму так же
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import IntegrityError
+
+from api import interbank
+from config import config
+from database import get_db
+from services.ledger import LedgerService
+
+
+class _FakeSession:
+    """Ни одного зачисленного перевода и ни одного счета"""
+
+    def __init__(self):
+        self.rollbacks = 0
+
+    async def execute(self, query):
+        class _Result:
+            def all(self):
+                return []
+
+            def scalars(self):
+                return self
+
+        return _Result()
+
+    def add(self, obj):
+        raise AssertionError("nothing should be credited")
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+
+@pytest.fixture
+def session(monkeypatch):
+    monkeypatch.setattr(config, "BANK_CODE", "vbank")
+    monkeypatch.setattr(config, "INTERBANK_PEERS", ["vbank", "abank", "sbank"])
+
+    async def post(db, postings, **kwargs):
+        assert not postings
+        return {}
+
+    monkeypatch.setattr(LedgerService, "post", staticmethod(post))
+    return _FakeSession()
+
+
+@pytest.fixture
+def client(session):
+    app = FastAPI()
+    app.include_router(interbank.router)
+
+    async def fake_db():
+        yield session
+
+    app.dependency_overrides[get_db] = fake_db
+    return TestClient(app)
+
+
+def _transfer(transfer_id: str, amount: str, from_bank: str = "abank") -> dict:
+    return {
+        "transfer_id": transfer_id,
+        "from_bank": from_bank,
+        "to_account_number": "40817810000000000001",
+        "amount": amount
+    }
+
+
+def test_batch_requires_peer_token(client):
+    response = client.post("/interbank/receive-batch", json={"transfers": [_transfer("t1", "10")]})
+    assert response.status_code == 403
+
+
+def test_invalid_amounts_rejected_per_transfer(client):
+    amounts = ["NaN", "sNaN", "Infinity", "-Infinity", "-1", "0", "abc"]
+    response = client.post(
+        "/interbank/receive-batch",
+        json={"transfers": [_transfer(f"t{i}", amount) for i, amount in enumerate(amounts)]},
+        headers={"x-bank-auth-token": "abank"}
+    )
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["status"] for r in results] == ["rejected"] * len(amounts)
+    assert all(r["message"].startswith("Invalid amount") for r in results)
+
+
+def test_transfer_from_other_bank_rejected(client):
+    response = client.post(
+        "/interbank/receive-batch",
+        json={"transfers": [_transfer("t1", "10", from_bank="sbank")]},
+        headers={"x-bank-auth-token": "abank"}
+    )
+
+    assert response.json()["results"][0]["status"] == "rejected"
+
+
+def test_repeated_integrity_error_returns_retryable_status(client, session, monkeypatch):
+    async def conflict(db, transfers, sender):
+        raise IntegrityError("INSERT", {}, Exception("duplicate key"))
+
+    monkeypatch.setattr(interbank, "_credit_batch", conflict)
+    response = client.post(
+        "/interbank/receive-batch",
+        json={"transfers": [_transfer("t1", "10")]},
+        headers={"x-bank-auth-token": "abank"}
+    )
+
+    assert response.status_code == 503
+    assert session.rollbacks == 2
+
+
+@pytest.mark.parametrize("token", [None, "evilbank", "vbank"], ids=["missing", "unknown", "own-code"])
+def test_single_receive_requires_peer_token(client, token):
+    headers = {"x-bank-auth-token": token} if token else {}
+    response = client.post("/interbank/receive", json=_transfer("t1", "10"), headers=headers)
+    assert response.status_code == 403
+
+
+def test_single_receive_rejects_transfer_from_other_bank(client):
+    response = client.post(
+        "/interbank/receive",
+        json=_transfer("t1", "10", from_bank="sbank"),
+        headers={"x-bank-auth-token": "abank"}
+    )
+    assert response.status_code == 403
+
+
+@pytest.mark.parametrize("amount", ["NaN", "Infinity", "-1", "0", "abc"])
+def test_single_receive_rejects_invalid_amount(client, amount):
+    response = client.post(
+        "/interbank/receive",
+        json=_transfer("t1", amount),
+        headers={"x-bank-auth-token": "abank"}
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Invalid amount")
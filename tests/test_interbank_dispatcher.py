@@ -0,0 +1,156 @@
+"""
+InterbankDispatcher: отправка пачек (413, 403) и предел повторов с неизвестным итогом
+(INTERBANK_DISPATCH_MAX_ATTEMPTS, нужен TEST_DATABASE_URL)
+"""
+import json
+import uuid
+from decimal import Decimal
+
+import httpx
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete, select
+
+from config import config
+from database import AsyncSessionLocal
+from models import Account, Client, InterbankOutbox, InterbankTransfer, Payment, Transaction
+from services.account_routing import account_directory
+from services.http_clients import BankClient, bank_http_clients
+from services.interbank_dispatcher import InterbankDispatcher
+from services.payment_service import PaymentService
+
+
+def _entries(count: int) -> list:
+    return [
+        {"id": i, "transfer_id": f"transfer-{i}", "to_bank": "abank",
+         "to_account_number": f"4081781009991000{i:04d}", "amount": Decimal("10.00"), "description": ""}
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def peer(monkeypatch):
+    """Банк-получатель на httpx.MockTransport; requests - пути полученных запросов"""
+    peer = {"handler": None, "requests": []}
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        peer["requests"].append(request.url.path)
+        return peer["handler"](request)
+
+    client = BankClient("http://abank.test", timeout=5.0)
+    client._client = httpx.AsyncClient(base_url="http://abank.test", transport=httpx.MockTransport(handle))
+    monkeypatch.setattr(bank_http_clients, "for_bank", lambda bank_code: client)
+    return peer
+
+
+def _batch_results(request: httpx.Request) -> httpx.Response:
+    transfers = json.loads(request.content)["transfers"]
+    return httpx.Response(200, json={"results": [
+        {"transfer_id": t["transfer_id"], "status": "completed"} for t in transfers
+    ]})
+
+
+@pytest.mark.asyncio
+async def test_oversized_batch_is_split(peer):
+    def handler(request):
+        if len(json.loads(request.content)["transfers"]) > 3:
+            return httpx.Response(413, json={"detail": "Batch too large"})
+        return _batch_results(request)
+
+    peer["handler"] = handler
+    dispatcher = InterbankDispatcher()
+    outcomes = await dispatcher._send_batch("abank", _entries(10))
+
+    assert outcomes == {f"transfer-{i}": ("sent", None) for i in range(10)}
+    assert set(peer["requests"]) == {"/interbank/receive-batch"}  # Без отправки по одному
+    assert "abank" not in dispatcher._batch_unsupported
+
+
+@pytest.mark.asyncio
+async def test_forbidden_batch_is_remembered(peer):
+    def handler(request):
+        if request.url.path == "/interbank/receive-batch":
+            return httpx.Response(403, json={"detail": "Unknown interbank peer"})
+        return httpx.Response(201, json={"status": "completed"})
+
+    peer["handler"] = handler
+    dispatcher = InterbankDispatcher()
+    outcomes = await dispatcher._send_batch("abank", _entries(3))
+
+    assert outcomes == {f"transfer-{i}": ("sent", None) for i in range(3)}
+    assert "abank" in dispatcher._batch_unsupported
+
+
+@pytest_asyncio.fixture
+async def account(db_engine, monkeypatch):
+    async def resolve(account_number):
+        return "abank"
+
+    monkeypatch.setattr(account_directory, "resolve", resolve)
+
+    async with AsyncSessionLocal() as db:
+        client = Client(person_id=f"dispatch-test-{uuid.uuid4().hex[:8]}", full_name="Dispatch Test")
+        db.add(client)
+        await db.flush()
+
+        account = Account(client_id=client.id, account_number=uuid.uuid4().hex[:20], balance=Decimal("1000.00"))
+        db.add(account)
+        await db.commit()
+
+    yield account
+
+    async with AsyncSessionLocal() as db:
+        transfer_ids = select(InterbankTransfer.transfer_id).join(
+            Payment, Payment.payment_id == InterbankTransfer.payment_id
+        ).where(Payment.account_id == account.id)
+        await db.execute(delete(InterbankOutbox).where(InterbankOutbox.transfer_id.in_(transfer_ids)))
+        await db.execute(delete(InterbankTransfer).where(InterbankTransfer.transfer_id.in_(transfer_ids)))
+        await db.execute(delete(Payment).where(Payment.account_id == account.id))
+        await db.execute(delete(Transaction).where(Transaction.account_id == account.id))
+        await db.execute(delete(Account).where(Account.id == account.id))
+        await db.execute(delete(Client).where(Client.id == client.id))
+        await db.commit()
+
+
+async def _outbox_entry(account: Account) -> dict:
+    async with AsyncSessionLocal() as db:
+        payment, transfer = await PaymentService.initiate_payment(
+            db=db,
+            from_account_number=account.account_number,
+            to_account_number="40817810099910009999",
+            amount=Decimal("100.00")
+        )
+        outbox = (await db.execute(
+            select(InterbankOutbox).where(InterbankOutbox.transfer_id == transfer.transfer_id)
+        )).scalar_one()
+        return {"id": outbox.id, "transfer_id": transfer.transfer_id, "payment_id": payment.payment_id}
+
+
+@pytest.mark.asyncio
+async def test_unknown_outcome_goes_to_manual_review_without_refund(account, monkeypatch):
+    monkeypatch.setattr(config, "INTERBANK_DISPATCH_MAX_ATTEMPTS", 3)
+    dispatcher = InterbankDispatcher()
+    entry = await _outbox_entry(account)
+
+    for attempt in range(3):
+        await dispatcher._complete(entry, "retry", "503 - Service Unavailable")
+
+    async with AsyncSessionLocal() as db:
+        outbox = await db.get(InterbankOutbox, entry["id"])
+        transfer = (await db.execute(
+            select(InterbankTransfer).where(InterbankTransfer.transfer_id == entry["transfer_id"])
+        )).scalar_one()
+        payment = (await db.execute(
+            select(Payment).where(Payment.payment_id == entry["payment_id"])
+        )).scalar_one()
+        balance = await db.scalar(select(Account.balance).where(Account.id == account.id))
+
+    assert (outbox.status, outbox.attempts) == ("manual_review", 3)
+    assert transfer.status == "manual_review"
+    assert payment.status == "AcceptedSettlementInProcess"
+    assert balance == Decimal("900.00")  # Без возврата: банк-получатель мог зачислить перевод
+    assert (dispatcher.retried, dispatcher.manual_review) == (2, 1)
+
+    # Запись больше не выбирается для отправки
+    await dispatcher._complete(entry, "retry", "503 - Service Unavailable")
+    assert dispatcher.retried == 2
@@ -0,0 +1,121 @@
+"""
+GET /interbank/accounts/export: только по RS256 токену банка федерации, только
+активные счета, 304 без запроса к БД
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from jose import jwk, jwt
+
+from api import interbank
+from config import config
+from database import get_db
+from services.auth_service import verified_token_cache
+from services.key_ring import key_ring
+
+
+def _private_pem() -> str:
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    return key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+
+
+PEER_KEY = _private_pem()
+OTHER_KEY = _private_pem()
+
+
+def _bank_token(bank_code: str = "abank", private_pem: str = PEER_KEY, **claims) -> str:
+    payload = {"sub": bank_code, "type": "bank", "exp": datetime.utcnow() + timedelta(minutes=5), **claims}
+    return jwt.encode(payload, private_pem, algorithm="RS256", headers={"kid": f"{bank_code}-2025"})
+
+
+def _auth(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+class _FakeSession:
+    def __init__(self, accounts):
+        self.accounts = accounts
+        self.queries = []
+
+    async def execute(self, query):
+        self.queries.append(str(query))
+        accounts = self.accounts
+
+        class _Result:
+            def scalars(self):
+                return self
+
+            def all(self):
+                return accounts
+
+        return _Result()
+
+
+@pytest.fixture
+def session(monkeypatch):
+    monkeypatch.setattr(config, "BANK_CODE", "vbank")
+    monkeypatch.setattr(config, "INTERBANK_PEERS", ["vbank", "abank", "sbank"])
+    interbank._accounts_export_cache.clear()
+    verified_token_cache.clear()
+
+    # Публичные ключи банков федерации, как из shared/keys
+    public_keys = {
+        bank_code: {f"{bank_code}-2025": jwk.construct(PEER_KEY, algorithm="RS256").public_key()}
+        for bank_code in ("abank", "sbank")
+    }
+    monkeypatch.setattr(key_ring, "_local_keys", public_keys)
+    monkeypatch.setattr(key_ring, "_loaded", True)
+
+    async def no_remote(bank_code, force=False):
+        pass
+
+    monkeypatch.setattr(key_ring, "refresh_remote", no_remote)
+    return _FakeSession(["40817810000000000001", "40817810000000000002"])
+
+
+@pytest.fixture
+def client(session):
+    app = FastAPI()
+    app.include_router(interbank.router)
+
+    async def fake_db():
+        yield session
+
+    app.dependency_overrides[get_db] = fake_db
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("headers", [
+    {},
+    {"x-bank-auth-token": "abank"},
+    _auth(jwt.encode({"sub": "abank", "type": "bank"}, "secret", algorithm="HS256")),
+    _auth(_bank_token(private_pem=OTHER_KEY)),
+    _auth(_bank_token(type="team")),
+    _auth(_bank_token("unknown")),
+], ids=["missing", "legacy-header", "hs256", "wrong-key", "team-token", "unknown-bank"])
+def test_export_rejects_non_peers(client, session, headers):
+    response = client.get("/interbank/accounts/export", headers=headers)
+
+    assert response.status_code in (401, 403)
+    assert session.queries == []
+
+
+def test_export_conditional_request_served_from_cache(client, session):
+    response = client.get("/interbank/accounts/export", headers=_auth(_bank_token("abank")))
+    assert response.status_code == 200
+    assert response.json()["accounts"] == session.accounts
+    assert "accounts.status" in session.queries[0]  # Только активные счета
+
+    etag = response.headers["ETag"]
+    response = client.get(
+        "/interbank/accounts/export",
+        headers={**_auth(_bank_token("sbank")), "If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert len(session.queries) == 1
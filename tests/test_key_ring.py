@@ -0,0 +1,54 @@
+"""
+KeyRing: PEM другого банка из shared/keys проверяет его токены с любым kid
+"""
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwt
+
+from config import config
+from services.key_ring import KeyRing
+
+
+@pytest.fixture
+def private_pem(tmp_path, monkeypatch):
+    """Ключ abank: публичная часть - в каталоге ключей, как shared/keys/abank_public.pem"""
+    monkeypatch.setattr(config, "BANK_CODE", "vbank")
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    (tmp_path / "abank_public.pem").write_bytes(key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    ))
+    return key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+
+
+@pytest.fixture
+def ring(tmp_path, monkeypatch):
+    ring = KeyRing(keys_path=tmp_path)
+    ring.remote_refreshes = []
+
+    async def refresh_remote(bank_code, force=False):
+        ring.remote_refreshes.append(bank_code)
+
+    monkeypatch.setattr(ring, "refresh_remote", refresh_remote)
+    return ring
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("kid", ["abank-2025", "abank-2026", None])
+async def test_single_local_key_verifies_any_kid(private_pem, ring, kid):
+    headers = {"kid": kid} if kid else None
+    token = jwt.encode({"sub": "abank", "type": "bank"}, private_pem, algorithm="RS256", headers=headers)
+
+    key = await ring.get_verification_key("abank", kid)
+
+    assert key is not None
+    assert jwt.decode(token, key, algorithms=["RS256"])["sub"] == "abank"
+    assert ring.remote_refreshes == []
+
+
+@pytest.mark.asyncio
+async def test_unknown_bank_falls_back_to_remote_jwks(private_pem, ring):
+    assert await ring.get_verification_key("sbank", "sbank-2025") is None
+    assert ring.remote_refreshes == ["sbank"]
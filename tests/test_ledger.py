@@ -0,0 +1,117 @@
+"""
+LedgerService под конкурентной нагрузкой: параллельные списания и переводы
+не уводят баланс в минус и не теряют проводки (нужен TEST_DATABASE_URL)
+"""
+import asyncio
+import uuid
+from decimal import Decimal
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete, func, select
+
+from database import AsyncSessionLocal
+from models import Account, AccountPendingCredit, Client
+from services.ledger import InsufficientFundsError, LedgerService
+
+PARALLEL = 40
+
+
+@pytest_asyncio.fixture
+async def accounts(db_engine):
+    """Три счета одного клиента: 1000.00, 0, 0"""
+    async with AsyncSessionLocal() as db:
+        client = Client(person_id=f"ledger-test-{uuid.uuid4().hex[:8]}", full_name="Ledger Test")
+        db.add(client)
+        await db.flush()
+
+        created = [
+            Account(client_id=client.id, account_number=uuid.uuid4().hex[:20], balance=balance)
+            for balance in (Decimal("1000.00"), Decimal("0"), Decimal("0"))
+        ]
+        db.add_all(created)
+        await db.commit()
+        ids = [account.id for account in created]
+
+    yield ids
+
+    LedgerService.set_hot_accounts([])
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(AccountPendingCredit).where(AccountPendingCredit.account_id.in_(ids)))
+        await db.execute(delete(Account).where(Account.id.in_(ids)))
+        await db.execute(delete(Client).where(Client.id == client.id))
+        await db.commit()
+
+
+async def _run(operation) -> bool:
+    """Выполнить операцию в отдельной транзакции; False - недостаточно средств"""
+    async with AsyncSessionLocal() as db:
+        try:
+            await operation(db)
+            await db.commit()
+            return True
+        except InsufficientFundsError:
+            await db.rollback()
+            return False
+
+
+async def _balances(ids) -> list:
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(Account.id, Account.balance).where(Account.id.in_(ids)))
+        balances = dict(result.all())
+        pending = await db.execute(
+            select(AccountPendingCredit.account_id, func.sum(AccountPendingCredit.amount))
+            .where(AccountPendingCredit.account_id.in_(ids))
+            .group_by(AccountPendingCredit.account_id)
+        )
+        for account_id, amount in pending.all():
+            balances[account_id] += amount
+    return [balances[account_id] for account_id in ids]
+
+
+@pytest.mark.asyncio
+async def test_parallel_debits_never_overdraw(accounts):
+    source = accounts[0]
+    amount = Decimal("30.00")
+
+    results = await asyncio.gather(*(
+        _run(lambda db: LedgerService.debit(db, source, amount)) for _ in range(PARALLEL)
+    ))
+
+    # 40 * 30 > 1000: ровно 33 списания проходят, остальные отклоняются
+    assert sum(results) == 33
+    assert await _balances([source]) == [Decimal("1000.00") - 33 * amount]
+
+
+@pytest.mark.asyncio
+async def test_parallel_transfers_conserve_money(accounts):
+    a, b, c = accounts
+    routes = [(a, b), (b, c), (c, a), (a, c), (b, a)]
+
+    results = await asyncio.gather(*(
+        _run(lambda db, route=routes[i % len(routes)]: LedgerService.transfer(db, route[0], route[1], Decimal("70.00")))
+        for i in range(PARALLEL)
+    ))
+
+    balances = await _balances(accounts)
+    assert any(results)
+    assert sum(balances) == Decimal("1000.00")
+    assert all(balance >= 0 for balance in balances)
+
+
+@pytest.mark.asyncio
+async def test_hot_account_debits_and_credits(accounts):
+    hot, other = accounts[0], accounts[1]
+    LedgerService.set_hot_accounts([hot])
+
+    debits = [_run(lambda db: LedgerService.debit(db, hot, Decimal("45.00"))) for _ in range(PARALLEL // 2)]
+    credits = [_run(lambda db: LedgerService.credit(db, hot, Decimal("5.00"))) for _ in range(PARALLEL // 2)]
+    results = await asyncio.gather(*debits, *credits)
+
+    succeeded_debits = sum(results[:len(debits)])
+    assert all(results[len(debits):])
+
+    (balance,) = await _balances([hot])
+    assert balance == Decimal("1000.00") + len(credits) * Decimal("5.00") - succeeded_debits * Decimal("45.00")
+    assert balance >= 0
+    assert await _balances([other]) == [Decimal("0")]
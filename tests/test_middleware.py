@@ -0,0 +1,112 @@
+"""
+APILoggingMiddleware: статус и время из http.response.start, тело ответа без буферизации
+"""
+import asyncio
+
+import pytest
+from jose import jwt
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+import middleware
+from middleware import APILoggingMiddleware
+
+
+async def accounts(request):
+    return JSONResponse({"data": []}, status_code=201)
+
+
+async def stream(request):
+    async def chunks():
+        for i in range(3):
+            yield f"chunk-{i}\n".encode()
+
+    return StreamingResponse(chunks(), media_type="text/plain")
+
+
+async def fail(request):
+    raise RuntimeError("boom")
+
+
+async def health(request):
+    return JSONResponse({"status": "ok"})
+
+
+app = Starlette(routes=[
+    Route("/accounts", accounts),
+    Route("/stream", stream),
+    Route("/fail", fail),
+    Route("/health", health),
+])
+
+
+@pytest.fixture
+def logged(monkeypatch):
+    entries = []
+    monkeypatch.setattr(middleware.api_log_queue, "put", entries.append)
+    return entries
+
+
+@pytest.fixture
+def client():
+    return TestClient(APILoggingMiddleware(app), raise_server_exceptions=False)
+
+
+def test_logs_status_and_caller_from_token(client, logged):
+    token = jwt.encode({"sub": "team200-1"}, "secret", algorithm="HS256")
+    response = client.get("/accounts", headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 201
+    (entry,) = logged
+    assert entry["endpoint"] == "/accounts"
+    assert entry["method"] == "GET"
+    assert entry["status_code"] == 201
+    assert entry["response_time_ms"] >= 0
+    assert (entry["caller_id"], entry["caller_type"], entry["person_id"]) == ("team200", "team", "team200-1")
+
+
+def test_streaming_body_passes_through(client, logged):
+    response = client.get("/stream")
+
+    assert response.text == "chunk-0\nchunk-1\nchunk-2\n"
+    assert logged[0]["status_code"] == 200
+
+
+@pytest.mark.asyncio
+async def test_streaming_chunks_are_not_rebuffered(logged):
+    """Каждый кусок тела уходит отдельным сообщением, как его отправило приложение"""
+    messages = []
+    requests = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        # Клиент не отключается: StreamingResponse ждет http.disconnect до конца тела
+        await asyncio.Event().wait()
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http", "method": "GET", "path": "/stream", "raw_path": b"/stream",
+        "query_string": b"", "headers": [], "http_version": "1.1", "scheme": "http",
+        "server": ("test", 80), "client": ("127.0.0.1", 1234), "root_path": ""
+    }
+    await APILoggingMiddleware(app)(scope, receive, send)
+
+    bodies = [m["body"] for m in messages if m["type"] == "http.response.body" and m.get("body")]
+    assert bodies == [b"chunk-0\n", b"chunk-1\n", b"chunk-2\n"]
+
+
+def test_exception_logged_as_500(client, logged):
+    response = client.get("/fail")
+
+    assert response.status_code == 500
+    assert logged[0]["status_code"] == 500
+
+
+def test_skip_paths_not_logged(client, logged):
+    assert client.get("/health").status_code == 200
+    assert logged == []
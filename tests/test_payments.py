@@ -0,0 +1,91 @@
+"""
+POST /payments: межбанковский платеж сразу возвращается в статусе AcceptedSettlementInProcess,
+перевод ждет отправки в outbox (нужен TEST_DATABASE_URL)
+"""
+import uuid
+from decimal import Decimal
+
+import httpx
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI
+from sqlalchemy import delete, select
+
+from api import payments
+from database import AsyncSessionLocal
+from models import Account, Client, InterbankOutbox, InterbankTransfer, Payment, Transaction
+from services.account_routing import account_directory
+from services.auth_service import require_any_token
+
+
+@pytest_asyncio.fixture
+async def account(db_engine):
+    async with AsyncSessionLocal() as db:
+        client = Client(person_id=f"payment-test-{uuid.uuid4().hex[:8]}", full_name="Payment Test")
+        db.add(client)
+        await db.flush()
+
+        account = Account(client_id=client.id, account_number=uuid.uuid4().hex[:20], balance=Decimal("1000.00"))
+        db.add(account)
+        await db.commit()
+
+    yield account
+
+    async with AsyncSessionLocal() as db:
+        transfer_ids = select(InterbankTransfer.transfer_id).join(
+            Payment, Payment.payment_id == InterbankTransfer.payment_id
+        ).where(Payment.account_id == account.id)
+        await db.execute(delete(InterbankOutbox).where(InterbankOutbox.transfer_id.in_(transfer_ids)))
+        await db.execute(delete(InterbankTransfer).where(InterbankTransfer.transfer_id.in_(transfer_ids)))
+        await db.execute(delete(Payment).where(Payment.account_id == account.id))
+        await db.execute(delete(Transaction).where(Transaction.account_id == account.id))
+        await db.execute(delete(Account).where(Account.id == account.id))
+        await db.execute(delete(Client).where(Client.id == client.id))
+        await db.commit()
+
+
+@pytest.fixture
+def app(monkeypatch):
+    async def resolve(account_number):
+        return "abank"
+
+    monkeypatch.setattr(account_directory, "resolve", resolve)
+
+    app = FastAPI()
+    app.include_router(payments.router)
+    app.dependency_overrides[require_any_token] = lambda: {"client_id": "team200-1", "type": "client"}
+    return app
+
+
+@pytest.mark.asyncio
+async def test_interbank_payment_is_accepted_immediately(app, account):
+    creditor = "40817810099910009999"
+    body = {
+        "data": {
+            "initiation": {
+                "instructedAmount": {"amount": "250.00", "currency": "RUB"},
+                "debtorAccount": {"schemeName": "RU.CBR.PAN", "identification": account.account_number},
+                "creditorAccount": {"schemeName": "RU.CBR.PAN", "identification": creditor, "bank_code": "abank"},
+                "comment": "Межбанковский перевод"
+            }
+        }
+    }
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.post("/payments", json=body)
+
+    assert response.status_code == 201, response.text
+    data = response.json()["data"]
+    assert data["status"] == "AcceptedSettlementInProcess"
+    assert data["amount"] == "250.00"
+
+    async with AsyncSessionLocal() as db:
+        balance = await db.scalar(select(Account.balance).where(Account.id == account.id))
+        outbox = (await db.execute(
+            select(InterbankOutbox)
+            .join(InterbankTransfer, InterbankTransfer.transfer_id == InterbankOutbox.transfer_id)
+            .where(InterbankTransfer.payment_id == data["paymentId"])
+        )).scalar_one()
+
+    assert balance == Decimal("750.00")
+    assert (outbox.status, outbox.to_bank, outbox.to_account_number) == ("pending", "abank", creditor)
@@ -0,0 +1,19 @@
+"""
+Планы горячих запросов используют индексы (нужен TEST_DATABASE_URL)
+"""
+import pytest
+
+from services.api_log_maintenance import api_log_maintenance
+from services.query_plans import HOT_QUERIES, check_query_plans
+
+
+@pytest.mark.asyncio
+async def test_hot_queries_use_indexes(db_engine):
+    # Партиции api_calls_log - как после старта приложения
+    await api_log_maintenance.maintain_partitions()
+
+    report = await check_query_plans()
+
+    failed = [query for query in report["queries"] if not query["ok"]]
+    assert report["ok"], f"Seq Scan in hot query plans: {failed}"
+    assert [query["name"] for query in report["queries"]] == [query.name for query in HOT_QUERIES]
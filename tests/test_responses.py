@@ -0,0 +1,156 @@
+"""
+FastJSONResponse (orjson без jsonable_encoder) отдает тот же JSON, что стандартный путь FastAPI;
+потоковая выгрузка транзакций - те же объекты, что страница /transactions
+"""
+import importlib
+import json
+import sys
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+import pytest_asyncio
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy import delete
+
+import responses
+from database import AsyncSessionLocal
+from models import Account, Client, Transaction
+from responses import FastJSONResponse
+
+# api/accounts.py импортирует модули относительно пакета репозитория (как main.py)
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT.parent))
+accounts_api = importlib.import_module(f"{ROOT.name}.api.accounts")
+
+
+class Amount(BaseModel):
+    amount: Decimal
+    currency: str
+
+
+def _transaction(i: int) -> Transaction:
+    moment = datetime(2025, 3, 1, 12, 0) + timedelta(minutes=i, microseconds=i)
+    return Transaction(
+        id=i,
+        account_id=1,
+        transaction_id=f"tx-{i:04d}",
+        amount=Decimal("1234.50") if i % 2 else Decimal("-99.99"),
+        currency="RUB",
+        direction="credit" if i % 2 else "debit",
+        status="completed",
+        description=f"Перевод №{i} «кавычки» \"escaped\"",
+        bank_transaction_code=None,
+        transaction_city="Москва" if i % 3 else None,
+        transaction_country="RU" if i % 3 else None,
+        counterparty=None,
+        transaction_date=moment,
+        booking_date=moment
+    )
+
+
+def _page(rows: int) -> dict:
+    """Страница транзакций в формате /accounts/{id}/transactions"""
+    merchant = {"merchantId": "m-1", "name": "Кофейня", "mccCode": "5814", "category": "restaurants"}
+    card = {"cardId": "card-1", "cardNumber": "4111 **** **** 1111"}
+    return {
+        "data": {
+            "transaction": [
+                accounts_api._serialize_transaction(_transaction(i), 1, merchant if i % 4 else None, card if i % 5 else None)
+                for i in range(rows)
+            ]
+        },
+        "links": {"self": "/accounts/acc-1/transactions?limit=500"},
+        "meta": {"pageSize": rows}
+    }
+
+
+def _standard(content) -> bytes:
+    """Стандартный путь FastAPI: jsonable_encoder -> JSONResponse (stdlib json)"""
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+MIXED = {
+    "integer_decimal": Decimal("100"),
+    "fraction_decimal": Decimal("100.25"),
+    "naive_datetime": datetime(2025, 1, 2, 3, 4, 5, 678901),
+    "aware_datetime": datetime(2025, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+    "date": date(2025, 1, 2),
+    "model": Amount(amount=Decimal("10.50"), currency="RUB"),
+    "nested": [{"text": "Привет", "none": None, "flag": True, "float": 0.1}],
+}
+
+
+@pytest.mark.parametrize("content", [MIXED, _page(500)], ids=["mixed-types", "transactions-page"])
+def test_orjson_matches_standard_response(content):
+    assert json.loads(FastJSONResponse(content).body) == json.loads(_standard(content))
+
+
+@pytest.mark.parametrize("content", [MIXED, _page(50)], ids=["mixed-types", "transactions-page"])
+def test_stdlib_fallback_matches_standard_response(content, monkeypatch):
+    monkeypatch.setattr(responses, "orjson", None)
+    assert json.loads(FastJSONResponse(content).body) == json.loads(_standard(content))
+
+
+# === Выгрузка (нужен TEST_DATABASE_URL) ===
+
+@pytest_asyncio.fixture
+async def account(db_engine):
+    async with AsyncSessionLocal() as db:
+        client = Client(person_id=f"export-test-{uuid.uuid4().hex[:8]}", full_name="Export Test")
+        db.add(client)
+        await db.flush()
+
+        account = Account(client_id=client.id, account_number=uuid.uuid4().hex[:20], balance=Decimal("0"))
+        db.add(account)
+        await db.flush()
+
+        for i in range(12):
+            tx = _transaction(i)
+            tx.id = None
+            tx.account_id = account.id
+            tx.transaction_id = f"tx-export-{uuid.uuid4().hex[:8]}-{i:02d}"
+            db.add(tx)
+        await db.commit()
+
+    yield account.id
+
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(Transaction).where(Transaction.account_id == account.id))
+        await db.execute(delete(Account).where(Account.id == account.id))
+        await db.execute(delete(Client).where(Client.id == client.id))
+        await db.commit()
+
+
+async def _export(account_id: int, format: str) -> str:
+    query = accounts_api._transactions_query(account_id, None, None).order_by(
+        Transaction.booking_date.desc(), Transaction.id.desc()
+    )
+    chunks = [
+        chunk async for chunk in accounts_api._stream_transactions(query, account_id, format, AsyncSessionLocal)
+    ]
+    return "".join(chunks)
+
+
+@pytest.mark.asyncio
+async def test_ndjson_export_matches_transactions_page(account, monkeypatch):
+    monkeypatch.setattr(accounts_api, "TRANSACTIONS_EXPORT_CHUNK", 5)  # Несколько пачек серверного курсора
+
+    async with AsyncSessionLocal() as db:
+        page = await accounts_api.get_transactions(
+            account_id=f"acc-{account}", from_booking_date_time=None, to_booking_date_time=None,
+            cursor=None, page=1, limit=100, include_total=False,
+            x_consent_id=None, x_requesting_bank=None, token_data={"type": "client"}, db=db
+        )
+    expected = json.loads(page.body)["data"]["transaction"]
+
+    lines = (await _export(account, "ndjson")).splitlines()
+    assert [json.loads(line) for line in lines] == expected
+
+    csv_lines = (await _export(account, "csv")).splitlines()
+    assert csv_lines[0].split(",") == accounts_api.CSV_COLUMNS
+    assert len(csv_lines) == len(expected) + 1
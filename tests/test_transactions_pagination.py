@@ -0,0 +1,127 @@
+"""
+Курсорная пагинация GET /accounts/{id}/transactions: обход страниц вперед и назад
+возвращает каждую транзакцию ровно один раз и в порядке (booking_date, id) по убыванию
+(нужен TEST_DATABASE_URL)
+"""
+import importlib
+import json
+import sys
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete
+
+from database import AsyncSessionLocal
+from models import Account, Client, Transaction
+
+# api/accounts.py импортирует модули относительно пакета репозитория (как main.py)
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT.parent))
+accounts_api = importlib.import_module(f"{ROOT.name}.api.accounts")
+
+START = datetime(2025, 3, 1, 12, 0)
+
+
+@pytest_asyncio.fixture
+async def account(db_engine):
+    """Счет с 23 транзакциями; у части транзакций одинаковый booking_date"""
+    async with AsyncSessionLocal() as db:
+        client = Client(person_id=f"paging-test-{uuid.uuid4().hex[:8]}", full_name="Paging Test")
+        db.add(client)
+        await db.flush()
+
+        account = Account(client_id=client.id, account_number=uuid.uuid4().hex[:20], balance=Decimal("0"))
+        db.add(account)
+        await db.flush()
+
+        for i in range(23):
+            booking_date = START + timedelta(days=i // 3)  # По три транзакции на дату
+            db.add(Transaction(
+                account_id=account.id,
+                transaction_id=f"tx-paging-{uuid.uuid4().hex[:8]}-{i:02d}",
+                amount=Decimal("10.00"),
+                direction="credit",
+                transaction_date=booking_date,
+                booking_date=booking_date
+            ))
+        await db.commit()
+
+    yield account.id
+
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(Transaction).where(Transaction.account_id == account.id))
+        await db.execute(delete(Account).where(Account.id == account.id))
+        await db.execute(delete(Client).where(Client.id == client.id))
+        await db.commit()
+
+
+async def _page(account_id: int, cursor=None, limit=5, **filters) -> dict:
+    async with AsyncSessionLocal() as db:
+        response = await accounts_api.get_transactions(
+            account_id=f"acc-{account_id}",
+            from_booking_date_time=filters.get("from_booking_date_time"),
+            to_booking_date_time=filters.get("to_booking_date_time"),
+            cursor=cursor,
+            page=1,
+            limit=limit,
+            include_total=False,
+            x_consent_id=None,
+            x_requesting_bank=None,
+            token_data={"type": "client"},
+            db=db
+        )
+    return json.loads(response.body) if hasattr(response, "body") else response
+
+
+def _cursor(link: str) -> str:
+    return parse_qs(urlsplit(link).query)["cursor"][0]
+
+
+async def _expected(account_id: int, **filters) -> list:
+    """Все транзакции одним запросом в порядке страниц"""
+    page = await _page(account_id, limit=100, **filters)
+    return [tx["transactionId"] for tx in page["data"]["transaction"]]
+
+
+async def _walk(account_id: int, **filters) -> list:
+    """Пройти все страницы по links.next, затем обратно по links.prev"""
+    pages = [await _page(account_id, **filters)]
+    while "next" in pages[-1]["links"]:
+        pages.append(await _page(account_id, cursor=_cursor(pages[-1]["links"]["next"]), **filters))
+
+    back = [pages[-1]]
+    while "prev" in back[-1]["links"]:
+        back.append(await _page(account_id, cursor=_cursor(back[-1]["links"]["prev"]), **filters))
+
+    forward_ids = [[tx["transactionId"] for tx in page["data"]["transaction"]] for page in pages]
+    backward_ids = [[tx["transactionId"] for tx in page["data"]["transaction"]] for page in back]
+    assert backward_ids == list(reversed(forward_ids))
+    return [tx_id for page in forward_ids for tx_id in page]
+
+
+@pytest.mark.asyncio
+async def test_pages_cover_every_transaction_once(account):
+    expected = await _expected(account)
+    assert len(expected) == 23
+    # От новых к старым, при равном booking_date - по id
+    assert expected == sorted(expected, key=lambda tx_id: tx_id[-2:], reverse=True)
+
+    assert await _walk(account) == expected
+
+
+@pytest.mark.asyncio
+async def test_pages_respect_booking_date_filter(account):
+    filters = {
+        "from_booking_date_time": (START + timedelta(days=1)).isoformat() + "Z",
+        "to_booking_date_time": (START + timedelta(days=5)).isoformat() + "Z"
+    }
+    expected = await _expected(account, **filters)
+
+    # Дни 1..5 включительно, по три транзакции
+    assert len(expected) == 15
+    assert await _walk(account, **filters) == expected